@@ -1,14 +1,40 @@
 import os
-import qrcode
-import io
-import base64
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, session, jsonify
-from werkzeug.utils import secure_filename
-from pymongo import MongoClient
+import hashlib
+import hmac
+import json
+import mimetypes
+import threading
+import time
+import click
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import Flask, before_render_template, template_rendered, render_template, get_template_attribute, request, redirect, url_for, flash, send_from_directory, session, jsonify, g, has_request_context, Response, stream_with_context, make_response
+from pymongo import MongoClient, UpdateOne, WriteConcern
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
 from dotenv import load_dotenv
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from markupsafe import Markup
 from functools import wraps
+from search import SearchIndex, search_text
+from fragment_cache import FragmentCache
+from metrics import MetricsRegistry, RequestStats, CommandStats
+from qr import qr_png, qr_svg, qr_sheet, table_url
+from indexes import ensure_indexes, audit_queries
+from order_feed import OrderFeed, format_sse, order_event_data, polled_event
+from carts import MemoryCartStore, MongoCartStore, item_count
+from indexes import CART_TTL_SECONDS
+from images import make_variants, is_variant
+from storage import UploadStorage, is_blob
+from archive import archive_orders, archive_partitions, find_orders, find_order
+from order_status import STATUSES, STATUS_LABELS, KITCHEN_STATUSES, TRANSITIONS, TransitionError, change_status, change_many, new_order_fields, sources_for
+from export import FORMATS, export_orders, export_filename
+from rollups import record_order, move_order, sales_between, sales_for_day, sales_totals, status_sum, top_products, rebuild_rollups, month_start, next_month
+from assets import ASSETS, CDN_FALLBACK, DIST_FOLDER, AssetManifest, build as build_assets, vendor as vendor_assets
+from offline import catalog_snapshot, snapshot_images
+from static_site import VARIANTS, load_state, save_state, write_page, prune_pages, prune_categories
+from pagination import encode_cursor, sort_key, start_after
+from pricing import PriceBook, PricingError, PIZZA_PRICE_FIELDS, ORILLA_QUESO_CENTS, format_price, from_cents, price_value
 
 load_dotenv()
 
@@ -16,32 +42,666 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = "mh"
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "static/uploads")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))  # Hilos para generar variantes de imágenes
+TABLE_COUNT = int(os.getenv("TABLE_COUNT", "13"))  # Mesas numeradas de 1 a TABLE_COUNT
+# URL pública a la que apuntan los QR; por defecto la del request
+QR_BASE_URL = os.getenv("QR_BASE_URL", "")
+UPLOAD_MAX_AGE = 86400  # segundos de caché para imágenes sin nombre por hash
+ASSET_MAX_AGE = 31536000  # CSS/JS de static/dist: el nombre lleva el hash del contenido
+SEARCH_LIMIT = 48  # Resultados máximos en la página de búsqueda
+CATEGORY_PAGE_SIZE = 6  # Productos por página de categoría (2 filas x 3 columnas en móvil)
+SUGGEST_LIMIT = 8  # Sugerencias máximas mientras se escribe
 ADMIN_USER = os.getenv("ADMIN_USER", "Admin")
 ADMIN_PASS = os.getenv("ADMIN_PASS", "123456")
+# Activar cuando corren varios workers: cada proceso invalida su caché al ver cambios de otro
+CATALOG_CHANGE_STREAM = os.getenv("CATALOG_CHANGE_STREAM", "0") == "1"
+# Sin change stream, cada cuántos segundos se compara la versión del catálogo en Mongo (0 = nunca)
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "5"))
+# Igual para los eventos de pedidos que reciben las pantallas de cocina
+ORDERS_CHANGE_STREAM = os.getenv("ORDERS_CHANGE_STREAM", "0") == "1"
+ORDER_STREAM_KEEPALIVE = 15  # segundos entre comentarios keep-alive del SSE
+ORDER_POLL_SECONDS = 2  # sondeo de pedidos con varios workers y sin change stream
+# "memory" (un proceso) o "mongo" (varios workers comparten los carritos)
+CART_STORE = os.getenv("CART_STORE", "memory")
+# Workers del servidor: gunicorn.conf.py exporta el número real; 1 con `flask run`
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Caché de fragmentos HTML del menú (por proceso)
+FRAGMENT_CACHE_ENTRIES = int(os.getenv("FRAGMENT_CACHE_ENTRIES", "512"))
+FRAGMENT_CACHE_BYTES = int(os.getenv("FRAGMENT_CACHE_BYTES", str(16 * 1024 * 1024)))
+# Clave de las cookies de sesión: debe ser la misma en todos los workers
+SECRET_KEY = os.getenv("SECRET_KEY")
+# Pool de conexiones a Mongo por proceso
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))  # selección de servidor y conexión
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))  # espera por una conexión libre
+# Archivo de pedidos: completados con más de estos días salen de `orders`
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "0"))  # 0 = solo con `flask orders-archive`
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# Los pedidos se confirman a la mesa solo cuando están en disco en la mayoría del replica set
+_order_w = os.getenv("ORDER_WRITE_CONCERN", "majority")
+ORDER_WRITE_CONCERN = WriteConcern(w=int(_order_w) if _order_w.isdigit() else _order_w, j=True)
+IDEMPOTENCY_KEY_MAX_LENGTH = 100
+BULK_STATUS_LIMIT = 200  # pedidos por cambio de estado en lote
+# Log de requests lentos: se registra el desglose si pasan de estos límites
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "20"))  # posible N+1
+# Token para que Prometheus lea /admin/metrics sin sesión de admin (opcional)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Carpeta donde se exporta el menú público como HTML estático (vacío = no se exporta)
+STATIC_EXPORT_DIR = os.getenv("STATIC_EXPORT_DIR", "")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# Sin SECRET_KEY solo sirve el servidor de desarrollo (un proceso); ver create_app()
+app.secret_key = SECRET_KEY or os.urandom(24)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", "104857600"))
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", "10485760"))
+
+request_metrics = MetricsRegistry()
+
+def current_request_stats():
+    """RequestStats del request en curso (None fuera de un request)."""
+    return g.get("request_stats") if has_request_context() else None
+
+def make_mongo_client():
+    """Cliente con el pool y los timeouts del entorno.
+
+    connect=False: no abre conexiones ni hilos hasta la primera consulta, así
+    un proceso que hace fork (gunicorn) no hereda sockets abiertos.
+    """
+    return MongoClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        connect=False,
+        event_listeners=[CommandStats(current_request_stats, request_metrics)],
+    )
+
+def init_db(mongo_client, db_name=DB_NAME):
+    """Enlaza la base de datos, las colecciones y el almacén de carritos al cliente dado."""
+    global client, db, categories_col, products_col, orders_col, carts_col, daily_sales_col, meta_col, cart_store
+    client = mongo_client
+    db = client[db_name]
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+    # Colecciones
+    categories_col = db["categories"]
+    products_col = db["products"]
+    orders_col = db["orders"]  # Colección para pedidos
+    carts_col = db["carts"]  # Carritos por mesa (solo con CART_STORE=mongo)
+    daily_sales_col = db["daily_sales"]  # Ventas agregadas por día (ver rollups.py)
+    meta_col = db["meta"]  # Versión del catálogo (ETags del menú)
 
-# Colecciones
-categories_col = db["categories"]
-products_col = db["products"]
-orders_col = db["orders"]  # Colección para pedidos
+    # Carritos por mesa
+    if CART_STORE == "mongo":
+        cart_store = MongoCartStore(carts_col)
+    else:
+        cart_store = MemoryCartStore(ttl=CART_TTL_SECONDS)
+
+init_db(make_mongo_client())
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# ---------------------------------
+# VARIANTES DE IMÁGENES
+# ---------------------------------
+image_pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+
+def image_variants_doc(image_url, variants):
+    """Variantes listas para el documento: urls en la misma carpeta que la imagen."""
+    base_url = image_url.rsplit("/", 1)[0]
+    doc = {"src": image_url}
+    for fmt, items in variants.items():
+        doc[fmt] = [[width, f"{base_url}/{name}"] for width, name in items]
+    return doc
+
+def process_image(collection, doc_id, image_url, save_path):
+    """Genera variantes y las guarda si el documento sigue usando esa imagen."""
+    variants = make_variants(save_path)
+    doc = collection.find_one_and_update(
+        {"_id": doc_id, "image": image_url},
+        {"$set": {"image_variants": image_variants_doc(image_url, variants)}},
+        {"category_id": 1}
+    )
+    # La imagen de un producto solo cambia las páginas de su categoría
+    catalog_changed([doc["category_id"]] if doc and collection == products_col else None)
+
+def schedule_image_variants(collection, doc_id, image_url, save_path):
+    """Encola el procesamiento: el formulario del admin responde sin esperar."""
+    def report(future):
+        if future.exception():
+            app.logger.warning(f"No se pudieron generar variantes de {save_path}: {future.exception()}")
+    image_pool.submit(process_image, collection, doc_id, image_url, save_path).add_done_callback(report)
+
+def srcset(variants):
+    return ", ".join(f"{url} {width}w" for width, url in variants)
+
+app.add_template_filter(srcset)
+
+upload_storage = UploadStorage(UPLOAD_FOLDER)
+
+# Subidas con nombre fijo que usan los templates y el CSS (no se migran ni se borran)
+STATIC_UPLOADS = {"default.jpg", "logo2.png", "fondo.jpg"}
+
+def upload_url(filename):
+    return f"/uploads/{filename}"
+
+def save_upload(file):
+    """Guarda una imagen del formulario; devuelve (url, ruta) o (None, None)."""
+    if not file or not allowed_file(file.filename):
+        return None, None
+    name, save_path = upload_storage.save(file)
+    return upload_url(name), save_path
+
+# ---------------------------------
+# CSS Y JS (ver assets.py)
+# ---------------------------------
+asset_manifest = AssetManifest(app.static_folder)
+
+@app.template_global()
+def asset_url(name):
+    """URL de un asset: la versión construida si hay manifiesto, si no el fuente o el CDN."""
+    path = asset_manifest.path(name)
+    if path is None:
+        return CDN_FALLBACK[name]
+    if path.startswith(f"{DIST_FOLDER}/"):
+        return url_for("asset_file", filename=path[len(DIST_FOLDER) + 1:])
+    return url_for("static", filename=path)
+
+# ---------------------------------
+# CACHÉ DEL CATÁLOGO
+# ---------------------------------
+class CatalogCache:
+    """Categorías ordenadas y productos por categoría en memoria.
+
+    El catálogo cambia muy poco, así que se carga completo (dos consultas) y se
+    sirve desde memoria hasta que alguna ruta del admin o el change stream lo
+    invalida. Sin change stream (Mongo standalone o CATALOG_CHANGE_STREAM=0),
+    cada `check_interval` segundos se compara la versión guardada en Mongo con
+    la cargada: así un worker ve los cambios hechos en otro. Los documentos
+    devueltos son compartidos: no modificarlos.
+    """
+
+    def __init__(self, check_interval=0):
+        self._lock = threading.Lock()
+        self._data = None
+        self._generation = 0
+        self.check_interval = check_interval
+        self._checked_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _load(self):
+        # La versión se lee primero: si el catálogo cambia durante la carga, la
+        # invalidación posterior descarta estos datos (ver _get)
+        meta = meta_col.find_one({"_id": "catalog"}, {"version": 1}) or {}
+        categories = list(categories_col.find().sort("order", 1))
+        products_by_category = {}
+        products_by_id = {}
+        for product in products_col.find().sort([("name", 1), ("_id", 1)]):
+            products_by_category.setdefault(product.get("category_id"), []).append(product)
+            products_by_id[product["_id"]] = product
+        return {
+            "version": meta.get("version", 0),
+            "categories": categories,
+            "categories_by_id": {c["_id"]: c for c in categories},
+            "products_by_category": products_by_category,
+            # Llaves de orden por categoría para buscar el cursor de "Ver más" con bisect
+            "product_keys": {
+                category_id: [sort_key(product) for product in products]
+                for category_id, products in products_by_category.items()
+            },
+            "products_by_id": products_by_id,
+            "search_index": SearchIndex(products_by_id.values()),
+            "price_book": PriceBook(products_by_id.values(), {c["_id"]: c for c in categories}),
+        }
+
+    def _stale(self, data):
+        """True si otro proceso subió la versión del catálogo desde que se cargó `data`."""
+        if not self.check_interval or time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        # Primero la marca: los demás hilos no repiten la consulta mientras esta corre
+        self._checked_at = time.monotonic()
+        try:
+            meta = meta_col.find_one({"_id": "catalog"}, {"version": 1}) or {}
+        except PyMongoError as e:
+            app.logger.warning(f"No se pudo revisar la versión del catálogo: {e}")
+            return False
+        return meta.get("version", 0) != data["version"]
+
+    def _get(self):
+        data = self._data
+        if data is not None and self._stale(data):
+            self.invalidate()
+            data = None
+        if data is not None:
+            self.hits += 1
+            return data
+        with self._lock:
+            if self._data is not None:
+                self.hits += 1
+                return self._data
+            self.misses += 1
+            generation = self._generation
+            data = self._load()
+            # Si hubo una invalidación durante la carga, no guardar datos viejos
+            if generation == self._generation:
+                self._data = data
+                self._checked_at = time.monotonic()
+            return data
+
+    def invalidate(self):
+        self._generation += 1
+        self._data = None
+        self.invalidations += 1
+
+    def version(self):
+        """Versión del catálogo guardada en Mongo, igual en todos los workers."""
+        return self._get()["version"]
+
+    def categories(self):
+        return self._get()["categories"]
+
+    def category(self, category_id):
+        return self._get()["categories_by_id"].get(category_id)
+
+    def category_by_name(self, name):
+        name = name.upper()
+        for category in self.categories():
+            if category.get("name", "").upper() == name:
+                return category
+        return None
+
+    def products(self, category_id):
+        return self._get()["products_by_category"].get(category_id, [])
+
+    def product_keys(self, category_id):
+        return self._get()["product_keys"].get(category_id, [])
+
+    def product(self, product_id):
+        return self._get()["products_by_id"].get(product_id)
+
+    def price_book(self):
+        return self._get()["price_book"]
+
+    def search(self, query, limit=None):
+        return self._get()["search_index"].search(query, limit=limit)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "loaded": self._data is not None,
+        }
+
+catalog_cache = CatalogCache(check_interval=CATALOG_VERSION_CHECK_SECONDS)
+fragment_cache = FragmentCache(max_entries=FRAGMENT_CACHE_ENTRIES, max_bytes=FRAGMENT_CACHE_BYTES)
+
+def catalog_changed(category_ids=None):
+    """Sube la versión del catálogo (cambia el ETag del menú) e invalida la caché.
+
+    Llamar después de escribir en categorías o productos. `category_ids`
+    limita la exportación estática a esas categorías; None la rehace completa.
+    """
+    meta_col.update_one(
+        {"_id": "catalog"},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now()}},
+        upsert=True
+    )
+    catalog_cache.invalidate()
+    fragment_cache.clear()
+    schedule_menu_export(category_ids)
+
+def watch_catalog_changes():
+    """Invalida la caché cuando otro proceso modifica categorías, productos o la versión."""
+    pipeline = [{"$match": {"$or": [
+        {"ns.coll": {"$in": [categories_col.name, products_col.name]}},
+        # En meta también vive el candado del archivo de pedidos: solo importa la versión
+        {"ns.coll": meta_col.name, "documentKey._id": "catalog"},
+    ]}}]
+    while True:
+        try:
+            with db.watch(pipeline) as stream:
+                # Con el stream abierto no hace falta revisar la versión
+                catalog_cache.check_interval = 0
+                # Pudo haber cambios mientras no estábamos escuchando
+                catalog_cache.invalidate()
+                for _change in stream:
+                    catalog_cache.invalidate()
+        except OperationFailure as e:
+            # Mongo standalone: los change streams requieren replica set
+            app.logger.warning(f"Change stream del catálogo no disponible, se revisa la versión cada "
+                               f"{CATALOG_VERSION_CHECK_SECONDS} s: {e}")
+            catalog_cache.check_interval = CATALOG_VERSION_CHECK_SECONDS
+            return
+        except PyMongoError as e:
+            app.logger.warning(f"Change stream del catálogo interrumpido: {e}")
+            catalog_cache.check_interval = CATALOG_VERSION_CHECK_SECONDS
+            time.sleep(5)
+
+def start_catalog_watcher():
+    if not CATALOG_CHANGE_STREAM:
+        return
+    threading.Thread(target=watch_catalog_changes, name="catalog-watcher", daemon=True).start()
+
+# ---------------------------------
+# EVENTOS DE PEDIDOS PARA COCINA
+# ---------------------------------
+order_feed = OrderFeed()
+
+def update_rollups(update, *args):
+    """Aplica un incremento a las ventas agregadas sin tumbar el pedido si falla.
+
+    Si se pierde alguno, `flask rollups-rebuild` los recalcula desde los pedidos.
+    """
+    try:
+        update(daily_sales_col, *args)
+    except PyMongoError as e:
+        app.logger.warning(f"No se actualizaron las ventas agregadas: {e}")
+
+def publish_order_event(event_type, data):
+    """Publica en el canal local salvo que el change stream ya lo alimente."""
+    if not order_feed.external:
+        order_feed.publish(event_type, data)
+
+def watch_order_changes():
+    """Alimenta el canal de cocina con los pedidos creados o actualizados en cualquier worker."""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    while True:
+        try:
+            with orders_col.watch(pipeline, full_document="updateLookup") as stream:
+                order_feed.external = True
+                for change in stream:
+                    order = change.get("fullDocument")
+                    if not order:
+                        continue
+                    if change["operationType"] == "insert":
+                        order_feed.publish("order_created", order_event_data(order))
+                    elif "status" in change.get("updateDescription", {}).get("updatedFields", {}):
+                        order_feed.publish("order_status", order_event_data(order))
+        except OperationFailure as e:
+            order_feed.external = False
+            app.logger.warning(f"Change stream de pedidos no disponible: {e}")
+            if WEB_CONCURRENCY > 1:
+                poll_order_changes()
+            return
+        except PyMongoError as e:
+            order_feed.external = False
+            app.logger.warning(f"Change stream de pedidos interrumpido: {e}")
+            time.sleep(5)
+
+def poll_order_changes():
+    """Sin change stream y con varios workers: publica los pedidos modificados en cualquier worker.
+
+    Cada worker sondea `orders` por `updated_at` (como poll_orders en asgi.py)
+    y deja de publicar solo lo propio: así todas las pantallas ven todo, con
+    hasta ORDER_POLL_SECONDS de retraso.
+    """
+    app.logger.warning(f"Eventos de pedidos por sondeo cada {ORDER_POLL_SECONDS} s")
+    since = datetime.now()
+    order_feed.external = True
+    while True:
+        time.sleep(ORDER_POLL_SECONDS)
+        try:
+            changed = list(orders_col.find({"updated_at": {"$gt": since}}).sort("updated_at", 1))
+        except PyMongoError as e:
+            app.logger.warning(f"No se pudieron sondear los pedidos: {e}")
+            continue
+        for order in changed:
+            order_feed.publish(*polled_event(order))
+            since = max(since, order["updated_at"])
+
+def start_order_watcher():
+    if ORDERS_CHANGE_STREAM:
+        target = watch_order_changes
+    elif WEB_CONCURRENCY > 1:
+        # Cada worker solo ve sus propias escrituras: las pantallas de otro no se enterarían
+        target = poll_order_changes
+    else:
+        return
+    threading.Thread(target=target, name="order-watcher", daemon=True).start()
+
+# ---------------------------------
+# ARCHIVO DE PEDIDOS
+# ---------------------------------
+def order_sources():
+    """`orders` y las particiones del archivo: todas las colecciones con pedidos."""
+    return [orders_col] + [db[name] for name in archive_partitions(db)]
+
+def run_archive(days=ARCHIVE_AFTER_DAYS):
+    before = datetime.now() - timedelta(days=days)
+    return archive_orders(orders_col, db, before, batch_size=ARCHIVE_BATCH_SIZE)
+
+def acquire_archive_lease(seconds):
+    """Solo un worker archiva por intervalo: toma el candado en `meta` si está libre."""
+    now = datetime.now()
+    try:
+        meta_col.update_one(
+            {"_id": "archive", "$or": [{"locked_until": {"$lt": now}}, {"locked_until": {"$exists": False}}]},
+            {"$set": {"locked_until": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Otro worker tiene el candado (el upsert chocó con el documento existente)
+        return False
+
+def archive_periodically():
+    interval = ARCHIVE_INTERVAL_HOURS * 3600
+    while True:
+        time.sleep(interval)
+        try:
+            if acquire_archive_lease(interval * 0.9):
+                moved = run_archive()
+                if moved:
+                    app.logger.info(f"{moved} pedidos archivados")
+        except PyMongoError as e:
+            app.logger.warning(f"No se pudieron archivar pedidos: {e}")
+
+def start_archiver():
+    if ARCHIVE_INTERVAL_HOURS <= 0:
+        return
+    threading.Thread(target=archive_periodically, name="orders-archiver", daemon=True).start()
+
+def on_startup():
+    """Tareas de arranque del proceso: índices, contadores faltantes, watchers y archivo de pedidos."""
+    try:
+        ensure_indexes(db)
+    except PyMongoError as e:
+        app.logger.warning(f"No se pudieron crear los índices: {e}")
+    try:
+        # Categorías de antes del contador: el primer $inc partiría de 0
+        if categories_col.find_one({"product_count": {"$exists": False}}, {"_id": 1}):
+            app.logger.info(f"product_count calculado en {recount_category_products()} categorías")
+    except PyMongoError as e:
+        app.logger.warning(f"No se pudo calcular product_count: {e}")
+    start_catalog_watcher()
+    start_order_watcher()
+    start_archiver()
+
+def create_app():
+    """Punto de entrada para producción (ver wsgi.py y gunicorn.conf.py).
+
+    Se llama una vez en cada worker, después del fork: ahí se crea el cliente
+    de Mongo del proceso y arrancan sus watchers.
+    """
+    if not SECRET_KEY:
+        raise RuntimeError("Define SECRET_KEY: todos los workers deben firmar las sesiones con la misma clave")
+    if CART_STORE != "mongo":
+        if WEB_CONCURRENCY > 1:
+            raise RuntimeError(
+                f"CART_STORE=memory con WEB_CONCURRENCY={WEB_CONCURRENCY}: cada worker tendría sus "
+                "propios carritos. Usa CART_STORE=mongo"
+            )
+        app.logger.warning("CART_STORE=memory: los carritos se pierden cada vez que gunicorn recicla el worker")
+    old_client = client
+    init_db(make_mongo_client())
+    old_client.close()
+    catalog_cache.invalidate()
+    on_startup()
+    return app
+
+# ---------------------------------
+# MÉTRICAS POR RUTA
+# ---------------------------------
+@app.before_request
+def start_request_stats():
+    g.request_stats = RequestStats(time.perf_counter())
+
+def start_render(sender, template, context, **extra):
+    if current_request_stats() is not None:
+        g.render_started = time.perf_counter()
+
+def finish_render(sender, template, context, **extra):
+    stats = current_request_stats()
+    if stats is not None and "render_started" in g:
+        stats.render_time += time.perf_counter() - g.pop("render_started")
+
+before_render_template.connect(start_render, app)
+template_rendered.connect(finish_render, app)
+
+@app.after_request
+def record_request_stats(response):
+    stats = current_request_stats()
+    if stats is None:
+        return response
+    wall_time = time.perf_counter() - stats.start
+    # La regla y no la ruta real: /category/<cat_id> es una sola serie
+    route = request.url_rule.rule if request.url_rule else "<sin ruta>"
+    request_metrics.observe_request(request.method, route, response.status_code, wall_time, stats)
+    if wall_time * 1000 >= SLOW_REQUEST_MS or stats.commands >= SLOW_REQUEST_QUERIES:
+        commands = ", ".join(f"{name} x{count}" for name, count in sorted(stats.by_command.items()))
+        app.logger.warning(
+            f"Request lento: {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+            f"en {wall_time * 1000:.0f} ms (Mongo {stats.db_time * 1000:.0f} ms, "
+            f"{stats.commands} comandos, {stats.documents} documentos; render {stats.render_time * 1000:.0f} ms)"
+            + (f" [{commands}]" if commands else "")
+        )
+    return response
+
+# ---------------------------------
+# RESOLUCIÓN DE PRODUCTOS EN LOTE
+# ---------------------------------
+def with_categories(products):
+    """Une cada producto con su categoría usando la caché (sin consultas extra)."""
+    return [(product, catalog_cache.category(product.get("category_id"))) for product in products]
+
+def resolve_products(product_ids):
+    """Obtiene varios productos con una sola consulta $in.
+
+    Devuelve {str(_id): (producto, categoría)}; los ids inválidos o
+    inexistentes simplemente no aparecen en el resultado.
+    """
+    object_ids = set()
+    for product_id in product_ids:
+        try:
+            object_ids.add(ObjectId(product_id))
+        except (InvalidId, TypeError):
+            continue
+    if not object_ids:
+        return {}
+    products = products_col.find({"_id": {"$in": list(object_ids)}})
+    return {str(product["_id"]): (product, category) for product, category in with_categories(products)}
+
+def cart_product_id(cart_key, item):
+    """Id del producto de una línea del carrito ("product_id" o "product_id_size")."""
+    product_id = item.get('product_id')
+    if not product_id:
+        product_id = cart_key.split('_')[0] if '_' in cart_key else cart_key
+    return str(product_id)
+
+# ---------------------------------
+# CARRITOS POR MESA
+# ---------------------------------
+def current_cart_id():
+    """Id del carrito abierto de la mesa en sesión (la cookie solo guarda mesa e id)."""
+    mesa_num = session.get('mesa_num')
+    if not mesa_num:
+        return None
+    cart_id = cart_store.cart_id_for_table(mesa_num)
+    if session.get('cart_id') != cart_id:
+        session['cart_id'] = cart_id
+    return cart_id
+
+def current_cart():
+    cart_id = current_cart_id()
+    return cart_store.get(cart_id) if cart_id else {}
+
+@app.route("/mesa/estado")
+def table_status():
+    """Mesa y cantidad de líneas del carrito; las páginas del menú lo piden por JS."""
+    mesa_num = session.get('mesa_num')
+    response = jsonify({"mesa_num": mesa_num, "cart_count": item_count(current_cart()) if mesa_num else 0})
+    response.cache_control.no_store = True
+    return response
+
+# ---------------------------------
+# CACHÉ HTTP DEL MENÚ
+# ---------------------------------
+def _templates_version():
+    """Hash de los templates: un despliegue con HTML nuevo cambia los ETags."""
+    digest = hashlib.sha256()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            digest.update(name.encode())
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+TEMPLATES_VERSION = _templates_version()
+
+def menu_version():
+    """Parte del ETag del menú común a todas las mesas: catálogo, templates y assets."""
+    return f"{catalog_cache.version()}-{TEMPLATES_VERSION}-{asset_manifest.version()}"
+
+def menu_etag():
+    """ETag de una página del menú; None si la respuesta no se debe reutilizar.
+
+    El HTML del menú solo depende de la versión del catálogo, de los templates,
+    de los assets construidos (sus URLs llevan hash) y de si hay mesa en
+    sesión (muestra o no los botones del carrito). El número de mesa y el
+    contador del carrito llegan aparte (table_status).
+    """
+    if session.get('_flashes'):
+        # Mensajes pendientes: esta respuesta es única
+        return None
+    table = "m" if session.get('mesa_num') else "n"
+    return f"{menu_version()}-{table}"
+
+def menu_response(render):
+    """GET condicional: 304 si el ETag coincide, sin llamar a `render` (Jinja)."""
+    etag = menu_etag()
+    if etag and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    if etag:
+        response.set_etag(etag)
+        # El navegador guarda la página pero revalida en cada visita (304 barato)
+        response.cache_control.no_cache = True
+    return response
+
+app.add_template_filter(format_price, "price")
+
 # Context processor para hacer categorías disponibles en todos los templates
 @app.context_processor
 def inject_categories():
     try:
-        categories = list(categories_col.find().sort("order", 1))
+        categories = catalog_cache.categories()
         return dict(nav_categories=categories)
     except:
         return dict(nav_categories=[])
@@ -52,9 +712,9 @@ def inject_categories():
 @app.route("/")
 def index():
     try:
-        categories = list(categories_col.find().sort("order", 1))
+        categories = catalog_cache.categories()
         mesa_num = session.get('mesa_num')
-        return render_template("index.html", categories=categories, mesa_num=mesa_num)
+        return menu_response(lambda: render_template("index.html", categories=categories, mesa_num=mesa_num))
     except Exception as e:
         flash(f"Error al cargar categorías: {str(e)}", "danger")
         mesa_num = session.get('mesa_num')
@@ -101,15 +761,14 @@ def admin_dashboard():
     category_filter = {}
     if search_query:
         category_filter["name"] = {"$regex": search_query, "$options": "i"}
-    total_categories = categories_col.count_documents({})
+    all_categories = catalog_cache.categories()
     categories = list(categories_col.find(category_filter).sort("order", 1))
     stats = {
-        "categories": total_categories,
-        "products": products_col.count_documents({}),
-        "active_orders": orders_col.count_documents({"status": {"$in": ["pendiente", "en_preparacion"]}}),
-        "pending_media": categories_col.count_documents({
-            "$or": [{"image": {"$exists": False}}, {"image": ""}]
-        })
+        "categories": len(all_categories),
+        # Conteo por metadatos de la colección, sin recorrerla
+        "products": products_col.estimated_document_count(),
+        "active_orders": status_sum(sales_totals(daily_sales_col), KITCHEN_STATUSES)[0],
+        "pending_media": sum(1 for c in all_categories if not c.get("image"))
     }
     latest_orders = list(orders_col.find().sort("created_at", -1).limit(3))
     latest_products = list(products_col.find().sort("_id", -1).limit(3))
@@ -122,6 +781,25 @@ def admin_dashboard():
         search_query=search_query
     )
 
+@app.route("/admin/cache-stats")
+@admin_required
+def catalog_cache_stats():
+    """Contadores de la caché del catálogo y de fragmentos"""
+    return jsonify({**catalog_cache.stats(), "fragments": fragment_cache.stats()})
+
+@app.route("/admin/metrics")
+def admin_metrics():
+    """Métricas por ruta en formato de texto de Prometheus (sesión de admin o METRICS_TOKEN)"""
+    # Comparación en tiempo constante: no revela cuántos caracteres del token coinciden
+    token_ok = METRICS_TOKEN and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+    )
+    if not token_ok and not session.get('admin_logged_in'):
+        return Response("No autorizado\n", status=401, mimetype="text/plain")
+    response = Response(request_metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
 @app.route("/admin/logout")
 @admin_required
 def admin_logout():
@@ -141,26 +819,13 @@ def new_category():
         description = request.form.get("description", "")
         order = int(request.form.get("order", 0))
 
-        image_path = ""
-        file = request.files.get("image")
-
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-
-            if os.path.exists(save_path):
-                base, ext = os.path.splitext(filename)
-                i = 1
-                while os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], f"{base}_{i}{ext}")):
-                    i += 1
-                filename = f"{base}_{i}{ext}"
-                save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-
-            file.save(save_path)
-            image_path = f"/{save_path.replace(os.path.sep, '/')}"
+        image_path, save_path = save_upload(request.files.get("image"))
 
-        doc = {"name": name, "description": description, "order": order, "image": image_path}
+        doc = {"name": name, "description": description, "order": order, "image": image_path or "", "product_count": 0}
         categories_col.insert_one(doc)
+        catalog_changed()
+        if image_path:
+            schedule_image_variants(categories_col, doc["_id"], image_path, save_path)
 
         flash("Categoría creada", "success")
         return redirect(url_for("admin_dashboard"))
@@ -185,22 +850,14 @@ def edit_category(id):
 
         file = request.files.get("image")
 
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-
-            if os.path.exists(save_path):
-                base, ext = os.path.splitext(filename)
-                i = 1
-                while os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], f"{base}_{i}{ext}")):
-                    i += 1
-                filename = f"{base}_{i}{ext}"
-                save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-
-            file.save(save_path)
-            update["image"] = f"/{save_path.replace(os.path.sep, '/')}"
+        image_url, save_path = save_upload(file)
+        if image_url:
+            update["image"] = image_url
 
         categories_col.update_one({"_id": ObjectId(id)}, {"$set": update})
+        catalog_changed()
+        if "image" in update:
+            schedule_image_variants(categories_col, cat["_id"], update["image"], save_path)
 
         flash("Categoría actualizada", "success")
         return redirect(url_for("admin_dashboard"))
@@ -211,12 +868,17 @@ def edit_category(id):
 @admin_required
 def delete_category(id):
     categories_col.delete_one({"_id": ObjectId(id)})
+    catalog_changed()
     flash("Categoría eliminada", "success")
     return redirect(url_for("admin_dashboard"))
 
 # -------------------------
 # CRUD Productos
 # -------------------------
+def count_products(category_id, delta):
+    """Mantiene `product_count` de la categoría (dashboard); `flask recount-products` lo recalcula."""
+    categories_col.update_one({"_id": category_id}, {"$inc": {"product_count": delta}})
+
 @app.route("/admin/products/<category_id>")
 @admin_required
 def manage_products(category_id):
@@ -231,7 +893,7 @@ def manage_products(category_id):
         flash("Categoría no encontrada", "danger")
         return redirect(url_for("admin_dashboard"))
     
-    products = list(products_col.find({"category_id": cat_id}).sort("name", 1))
+    products = list(products_col.find({"category_id": cat_id}).sort([("name", 1), ("_id", 1)]))
     return render_template("manage_products.html", category=category, products=products)
 
 @app.route("/admin/product/new/<category_id>", methods=["GET", "POST"])
@@ -260,21 +922,18 @@ def new_product(category_id):
         
         # PIZZAS: Precios por tamaño
         if category["name"].upper() == "PIZZAS":
-            doc["price_individual"] = request.form.get("price_individual", "")
-            doc["price_chica"] = request.form.get("price_chica", "")
-            doc["price_mediana"] = request.form.get("price_mediana", "")
-            doc["price_grande"] = request.form.get("price_grande", "")
-            doc["price_h4"] = request.form.get("price_h4", "")
+            for field in PIZZA_PRICE_FIELDS:
+                doc[field] = price_value(request.form.get(field))
             doc["ingredients"] = ingredients
         
         # BEBIDAS: ML
         elif category["name"].upper() == "BEBIDAS":
-            doc["price"] = request.form.get("price", "")
+            doc["price"] = price_value(request.form.get("price"))
             doc["ml"] = request.form.get("ml", "")
         
         # COMPLEMENTOS: Gramos (y ingredientes solo para algunos)
         elif category["name"].upper() == "COMPLEMENTOS":
-            doc["price"] = request.form.get("price", "")
+            doc["price"] = price_value(request.form.get("price"))
             doc["grams"] = request.form.get("grams", "")
             # Ingredientes solo para productos específicos
             productos_con_ingredientes = [
@@ -288,30 +947,19 @@ def new_product(category_id):
         
         # Otras categorías: precio genérico
         else:
-            doc["price"] = request.form.get("price", "")
+            doc["price"] = price_value(request.form.get("price"))
         
-        # Manejo de imagen
-        image_path = ""
-        file = request.files.get("image")
+        doc["search_text"] = search_text(doc)
         
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            
-            if os.path.exists(save_path):
-                base, ext = os.path.splitext(filename)
-                i = 1
-                while os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], f"{base}_{i}{ext}")):
-                    i += 1
-                filename = f"{base}_{i}{ext}"
-                save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            
-            file.save(save_path)
-            image_path = f"/{save_path.replace(os.path.sep, '/')}"
-        
-        doc["image"] = image_path
+        # Manejo de imagen
+        image_path, save_path = save_upload(request.files.get("image"))
+        doc["image"] = image_path or ""
         
         products_col.insert_one(doc)
+        count_products(cat_id, 1)
+        catalog_changed([cat_id])
+        if image_path:
+            schedule_image_variants(products_col, doc["_id"], image_path, save_path)
         flash("Producto creado", "success")
         return redirect(url_for("manage_products", category_id=category_id))
     
@@ -346,21 +994,18 @@ def edit_product(id):
         
         # PIZZAS: Precios por tamaño
         if category["name"].upper() == "PIZZAS":
-            update["price_individual"] = request.form.get("price_individual", "")
-            update["price_chica"] = request.form.get("price_chica", "")
-            update["price_mediana"] = request.form.get("price_mediana", "")
-            update["price_grande"] = request.form.get("price_grande", "")
-            update["price_h4"] = request.form.get("price_h4", "")
+            for field in PIZZA_PRICE_FIELDS:
+                update[field] = price_value(request.form.get(field))
             update["ingredients"] = ingredients
         
         # BEBIDAS: ML
         elif category["name"].upper() == "BEBIDAS":
-            update["price"] = request.form.get("price", "")
+            update["price"] = price_value(request.form.get("price"))
             update["ml"] = request.form.get("ml", "")
         
         # COMPLEMENTOS: Gramos (y ingredientes solo para algunos)
         elif category["name"].upper() == "COMPLEMENTOS":
-            update["price"] = request.form.get("price", "")
+            update["price"] = price_value(request.form.get("price"))
             update["grams"] = request.form.get("grams", "")
             productos_con_ingredientes = [
                 "spaghetti", "al horno", "spaghetti a la boloñesa", 
@@ -373,30 +1018,24 @@ def edit_product(id):
         
         # Otras categorías: precio genérico
         else:
-            update["price"] = request.form.get("price", "")
+            update["price"] = price_value(request.form.get("price"))
+        
+        update["search_text"] = search_text({**product, **update})
         
         # Manejo de imagen
         file = request.files.get("image")
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            
-            if os.path.exists(save_path):
-                base, ext = os.path.splitext(filename)
-                i = 1
-                while os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], f"{base}_{i}{ext}")):
-                    i += 1
-                filename = f"{base}_{i}{ext}"
-                save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            
-            file.save(save_path)
-            update["image"] = f"/{save_path.replace(os.path.sep, '/')}"
+        image_url, save_path = save_upload(file)
+        if image_url:
+            update["image"] = image_url
         
         # Para pizzas, eliminar campo price si existe
         if category["name"].upper() == "PIZZAS":
             products_col.update_one({"_id": product_id}, {"$set": update, "$unset": {"price": ""}})
         else:
             products_col.update_one({"_id": product_id}, {"$set": update})
+        catalog_changed([product["category_id"]])
+        if "image" in update:
+            schedule_image_variants(products_col, product_id, update["image"], save_path)
         
         flash("Producto actualizado", "success")
         return redirect(url_for("manage_products", category_id=product["category_id"]))
@@ -415,7 +1054,9 @@ def delete_product(id):
     product = products_col.find_one({"_id": product_id})
     if product:
         category_id = product["category_id"]
-        products_col.delete_one({"_id": product_id})
+        if products_col.delete_one({"_id": product_id}).deleted_count:
+            count_products(category_id, -1)
+        catalog_changed([category_id])
         flash("Producto eliminado", "success")
         return redirect(url_for("manage_products", category_id=category_id))
     
@@ -428,22 +1069,19 @@ def delete_product(id):
 @app.route("/search")
 def search():
     query = request.args.get("q", "").strip()
+    return menu_response(lambda: render_search_results(query))
+
+def render_search_results(query):
     results = []
     
     if query:
-        # Búsqueda en productos por nombre e ingredientes (case-insensitive)
-        search_regex = {"$regex": query, "$options": "i"}
-        # Buscar por nombre O por ingredientes
-        products = list(products_col.find({
-            "$or": [
-                {"name": search_regex},
-                {"ingredients": search_regex}
-            ]
-        }))
+        # Búsqueda por nombre e ingredientes, sin acentos y por prefijo, en el índice del catálogo
+        products = catalog_cache.search(query, limit=SEARCH_LIMIT)
         
         # Obtener información de categoría para cada producto
-        for product in products:
-            category = categories_col.find_one({"_id": product.get("category_id")})
+        for product, category in with_categories(products):
+            # Copia: los documentos de la caché son compartidos
+            product = dict(product)
             if category:
                 product["category_name"] = category.get("name", "")
                 product["category_id"] = str(category.get("_id", ""))
@@ -451,119 +1089,413 @@ def search():
     
     return render_template("search_results.html", query=query, results=results)
 
+@app.route("/search/suggest")
+def search_suggest():
+    """Sugerencias JSON para la búsqueda mientras se escribe"""
+    query = request.args.get("q", "").strip()
+    suggestions = []
+    if query:
+        products = catalog_cache.search(query, limit=SUGGEST_LIMIT)
+        for product, category in with_categories(products):
+            suggestions.append({
+                "id": str(product["_id"]),
+                "name": product.get("name", ""),
+                "category": category.get("name", "") if category else "",
+                "image": product.get("image", ""),
+                "url": url_for("show_category", id=str(product.get("category_id"))),
+            })
+    return jsonify({"query": query, "results": suggestions})
+
+# ---------------------------------
+# SALUD DEL PROCESO (balanceador / orquestador)
+# ---------------------------------
+@app.route("/healthz")
+def healthz():
+    """Liveness: el proceso responde (no toca la base de datos)."""
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: el worker puede atender pedidos (Mongo responde)."""
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({"status": "ok"})
+
 # ---------------------------------
 # ARCHIVOS ESTÁTICOS
 # ---------------------------------
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # send_from_directory ya responde 304 con If-None-Match / If-Modified-Since
+    if not is_blob(filename):
+        # Nombres tradicionales: no se reescriben, pero tampoco son inmutables
+        response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=UPLOAD_MAX_AGE)
+        response.cache_control.public = True
+        return response
+    # El nombre es el hash del contenido: la URL nunca cambia de contenido
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# Más específica que /static/<path>: Flask la prueba antes
+@app.route('/static/dist/<path:filename>')
+def asset_file(filename):
+    """CSS/JS construido; manda la versión .br o .gz si el navegador la acepta."""
+    folder = os.path.join(app.static_folder, DIST_FOLDER)
+    mimetype = mimetypes.guess_type(filename)[0]
+    response = None
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+            response.headers["Content-Encoding"] = encoding
+            break
+    if response is None:
+        response = send_from_directory(folder, filename, max_age=ASSET_MAX_AGE)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 # ---------------------------------
 # MOSTRAR PRODUCTOS POR CATEGORÍA
 # ---------------------------------
 @app.route("/category/<id>")
-def show_category(id):
+@app.route("/category/<id>/page/<int:page>")
+def show_category(id, page=None):
     try:
         cat_id = ObjectId(id)
     except:
         return "ID inválido", 400
 
-    category = categories_col.find_one({"_id": cat_id})
+    category = catalog_cache.category(cat_id)
 
     if not category:
         return "Categoría no encontrada", 404
 
     # Obtiene categorías para construir el desplegable de navegación
-    categories = list(categories_col.find().sort("order", 1))
+    categories = catalog_cache.categories()
     other_categories = [c for c in categories if c["_id"] != cat_id]
 
-    # Paginación: 6 productos por página (2 filas x 3 columnas en móvil)
-    page = request.args.get('page', 1, type=int)
-    per_page = 6
+    # Paginación (el menú sin conexión usa el mismo tamaño de página). Los links
+    # usan /page/<n>, que se puede exportar a disco; ?page=n se sigue aceptando
+    page = page or request.args.get('page', 1, type=int)
+    per_page = CATEGORY_PAGE_SIZE
     skip = (page - 1) * per_page
 
-    # Obtener total de productos
-    total_products = products_col.count_documents({"category_id": cat_id})
-    
-    # Obtener productos paginados
-    products = list(products_col.find({"category_id": cat_id}).skip(skip).limit(per_page))
-    
-    # Calcular total de páginas
-    total_pages = (total_products + per_page - 1) // per_page if total_products > 0 else 1
+    # Productos de la categoría, ya ordenados en la caché
+    version = catalog_cache.version()
+    category_products = catalog_cache.products(cat_id)
+    total_products = len(category_products)
+    total_pages = category_page_count(cat_id)
 
     # Obtener número de mesa de la sesión
     mesa_num = session.get('mesa_num', None)
-    
-    # Si es la categoría de pizzas, obtener todas las pizzas para el selector de división
-    all_pizzas = []
-    if category.get("name", "").upper() == "PIZZAS":
-        pizza_category = categories_col.find_one({"name": {"$regex": "^PIZZAS$", "$options": "i"}})
-        if pizza_category:
-            all_pizzas = list(products_col.find({"category_id": pizza_category["_id"]}).sort("name", 1))
 
+    def render_page():
+        # La grilla es lo caro del template: se guarda por categoría, página, versión y mesa sí/no
+        grid_key = ("category_grid", cat_id, page, version, bool(mesa_num))
+        grid = fragment_cache.get_or_render(grid_key, lambda: render_product_grid(
+            category, category_products, category_products[skip:skip + per_page], mesa_num, version))
+        return render_template(
+            "category_view.html",
+            category=category,
+            product_grid=Markup(grid),
+            other_categories=other_categories,
+            page=page,
+            total_pages=total_pages,
+            total_products=total_products,
+            # "Ver más" sigue desde la última tarjeta de esta página
+            next_cursor=next_cursor(category_products, skip + per_page),
+            orilla_prices={size: from_cents(cents) for size, cents in ORILLA_QUESO_CENTS.items()}
+        )
+
+    return menu_response(render_page)
+
+@app.route("/category/<id>/more")
+def category_more(id):
+    """Tarjetas que siguen al cursor `after` (botón "Ver más"), en JSON.
+
+    El cursor es la llave (nombre, _id) de la última tarjeta mostrada (ver
+    pagination.py): cada tanda cuesta lo mismo sin importar qué tan abajo
+    vaya el cliente, y los cambios del catálogo no repiten ni saltan tarjetas.
+    """
+    try:
+        cat_id = ObjectId(id)
+    except InvalidId:
+        return jsonify({"success": False, "message": "ID inválido"}), 400
+
+    category = catalog_cache.category(cat_id)
+    if not category:
+        return jsonify({"success": False, "message": "Categoría no encontrada"}), 404
+
+    version = catalog_cache.version()
+    category_products = catalog_cache.products(cat_id)
+    try:
+        start = start_after(catalog_cache.product_keys(cat_id), request.args.get("after", ""))
+    except ValueError:
+        return jsonify({"success": False, "message": "Cursor inválido"}), 400
+    end = start + CATEGORY_PAGE_SIZE
+    mesa_num = session.get('mesa_num', None)
+
+    def render_more():
+        # Por posición y no por cursor: cualquier cursor que caiga en el mismo lugar reutiliza la grilla
+        grid_key = ("category_more", cat_id, start, version, bool(mesa_num))
+        html = fragment_cache.get_or_render(grid_key, lambda: render_product_grid(
+            category, category_products, category_products[start:end], mesa_num, version))
+        return {"success": True, "html": html, "next": next_cursor(category_products, end)}
+
+    return menu_response(render_more)
+
+def render_product_grid(category, category_products, products, mesa_num, version):
+    # Si es la categoría de pizzas, el selector de segunda mitad lista todas las pizzas
+    second_half_options = None
+    if category.get("name", "").upper() == "PIZZAS":
+        second_half_options = pizza_options(category["_id"], version, category_products)
     return render_template(
-        "category_view.html",
+        "_product_grid.html",
         category=category,
         products=products,
-        other_categories=other_categories,
-        page=page,
-        total_pages=total_pages,
-        total_products=total_products,
         mesa_num=mesa_num,
-        all_pizzas=all_pizzas if category.get("name", "").upper() == "PIZZAS" else []
+        second_half_options=second_half_options,
     )
 
+def next_cursor(category_products, end):
+    """Cursor de la tanda que empieza en `end`; None si ya no quedan productos."""
+    if 0 < end < len(category_products):
+        return encode_cursor(category_products[end - 1])
+    return None
+
+def category_page_count(cat_id):
+    return max(1, -(-len(catalog_cache.products(cat_id)) // CATEGORY_PAGE_SIZE))
+
+def pizza_options(cat_id, version, pizzas):
+    """Función producto -> <option> de todas las demás pizzas (selector de segunda mitad)."""
+    pizza_option = get_template_attribute("_pizza_options.html", "pizza_option")
+    options_html = fragment_cache.get_or_render(
+        ("pizza_options", cat_id, version),
+        lambda: "\n".join(str(pizza_option(pizza)) for pizza in pizzas)
+    )
+    by_id = {str(pizza["_id"]): pizza for pizza in pizzas}
+
+    def without(product_id):
+        pizza = by_id.get(product_id)
+        if pizza is None:
+            return Markup(options_html)
+        return Markup(options_html.replace(str(pizza_option(pizza)), "", 1))
+    return without
+
+# ---------------------------------
+# EXPORTACIÓN ESTÁTICA DEL MENÚ (ver static_site.py)
+# ---------------------------------
+# Un hilo: las exportaciones se escriben en el orden de los cambios
+export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="menu-export")
+
+def menu_export_plan(category_ids=None):
+    """Rutas a exportar y [(ruta de categoría, páginas)] para limpiar las que sobran."""
+    categories = [c for c in catalog_cache.categories() if category_ids is None or str(c["_id"]) in category_ids]
+    with app.test_request_context():
+        paths = [url_for("index"), url_for("search")] if category_ids is None else []
+        pruned = []
+        for category in categories:
+            cat_id = category["_id"]
+            total_pages = category_page_count(cat_id)
+            paths.append(url_for("show_category", id=str(cat_id)))
+            paths.extend(url_for("show_category", id=str(cat_id), page=page) for page in range(1, total_pages + 1))
+            pruned.append((url_for("show_category", id=str(cat_id)), total_pages))
+    return paths, pruned
+
+def render_export_page(path, has_table):
+    """Respuesta de la vista de `path` sin pasar por los hooks de request.
+
+    Así la exportación no cuenta en las métricas por ruta ni en el log de
+    requests lentos: la vista se llama directo dentro de un request de prueba.
+    """
+    with app.test_request_context(path):
+        if request.routing_exception is not None:
+            raise request.routing_exception
+        if has_table:
+            # Cualquier mesa: el número y el carrito se cargan por JS
+            session["mesa_num"] = 1
+        return app.make_response(app.view_functions[request.url_rule.endpoint](**request.view_args))
+
+def export_menu(root, category_ids=None):
+    """Escribe en `root` las páginas públicas del menú; devuelve cuántos archivos HTML escribió.
+
+    Con `category_ids` solo rehace esas categorías, salvo que los templates o
+    los assets hayan cambiado desde la última exportación completa. Las
+    páginas salen de las mismas vistas, así que son idénticas a las dinámicas.
+    """
+    state = {"templates": TEMPLATES_VERSION, "assets": asset_manifest.version()}
+    previous = load_state(root)
+    if category_ids is not None:
+        if any(previous.get(key) != value for key, value in state.items()):
+            category_ids = None
+        else:
+            category_ids = {str(category_id) for category_id in category_ids}
+    paths, pruned = menu_export_plan(category_ids)
+    written = 0
+    for variant, has_table in VARIANTS.items():
+        folder = os.path.join(root, variant)
+        for path in paths:
+            response = render_export_page(path, has_table)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} respondió {response.status_code}")
+            write_page(folder, path, response.get_data())
+            written += 1
+        for category_path, total_pages in pruned:
+            prune_pages(folder, category_path, total_pages)
+        if category_ids is None:
+            prune_categories(folder, {str(c["_id"]) for c in catalog_cache.categories()})
+    if category_ids is None:
+        save_state(root, state)
+    return written
+
+def schedule_menu_export(category_ids=None):
+    """Reexporta en segundo plano después de un cambio del catálogo (si STATIC_EXPORT_DIR está configurado)."""
+    if not STATIC_EXPORT_DIR:
+        return
+    def report(future):
+        if future.exception():
+            app.logger.warning(f"No se pudo exportar el menú estático: {future.exception()}")
+    export_pool.submit(export_menu, STATIC_EXPORT_DIR, category_ids).add_done_callback(report)
+
+# ---------------------------------
+# MENÚ SIN CONEXIÓN (ver offline.py)
+# ---------------------------------
+# CSS/JS que usan las páginas del menú; el service worker los precachea
+OFFLINE_SHELL_ASSETS = ["bootstrap.css", "style.css", "category.css", "bootstrap.js", "main.js", "category.js", "offline.js"]
+
+def catalog_snapshot_json(version):
+    """Foto del catálogo serializada; se genera una vez por versión del menú."""
+    def render():
+        categories = catalog_cache.categories()
+        snapshot = catalog_snapshot(
+            categories,
+            {c["_id"]: catalog_cache.products(c["_id"]) for c in categories},
+            version,
+            CATEGORY_PAGE_SIZE,
+            {size: from_cents(cents) for size, cents in ORILLA_QUESO_CENTS.items()},
+            lambda category_id: url_for("show_category", id=category_id),
+        )
+        snapshot["images"] = snapshot_images(snapshot) + [url_for("static", filename="uploads/default.jpg")]
+        snapshot["shell"] = [url_for("offline_page")] + [asset_url(name) for name in OFFLINE_SHELL_ASSETS]
+        return json.dumps(snapshot, ensure_ascii=False)
+    return fragment_cache.get_or_render(("catalog_json", version), render)
+
+@app.route("/menu/catalog.json")
+def catalog_json():
+    """Catálogo completo para el service worker; 304 mientras no cambie."""
+    version = menu_version()
+    etag = f"catalog-{version}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(catalog_snapshot_json(version), mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@app.route("/offline")
+def offline_page():
+    """Página que arma el menú en el navegador cuando no hay red (static/js/offline.js)."""
+    response = make_response(render_template("offline.html"))
+    response.cache_control.no_cache = True
+    return response
+
+@app.route("/sw.js")
+def service_worker():
+    # En la raíz para que su alcance cubra todo el sitio; sin caché larga para que se actualice
+    response = send_from_directory(os.path.join(app.static_folder, "js"), "sw.js", max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
 # ---------------------------------
 # SISTEMA DE MESAS Y QR
 # ---------------------------------
 @app.route("/mesa/<int:mesa_num>")
 def mesa_view(mesa_num):
     """Vista principal cuando se escanea el QR de una mesa"""
-    if mesa_num < 1 or mesa_num > 13:
-        flash("Número de mesa inválido. Debe ser entre 1 y 13.", "danger")
+    if mesa_num < 1 or mesa_num > TABLE_COUNT:
+        flash(f"Número de mesa inválido. Debe ser entre 1 y {TABLE_COUNT}.", "danger")
         return redirect(url_for("index"))
     
-    # Guardar número de mesa en sesión
+    # Guardar número de mesa en sesión (el carrito vive en el servidor)
     session['mesa_num'] = mesa_num
+    session.pop('cart', None)
     session.permanent = True
     
     # Cargar categorías
     try:
-        categories = list(categories_col.find().sort("order", 1))
-        return render_template("index.html", categories=categories, mesa_num=mesa_num)
+        categories = catalog_cache.categories()
+        return menu_response(lambda: render_template("index.html", categories=categories, mesa_num=mesa_num))
     except Exception as e:
         flash(f"Error al cargar categorías: {str(e)}", "danger")
         return render_template("index.html", categories=[], mesa_num=mesa_num)
 
+@app.after_request
+def sync_menu_mesa_cookie(response):
+    """Cookie `menu_mesa` para que el proxy elija la variante "mesa" del menú exportado.
+
+    Sigue a `mesa_num` de la sesión: vence junto con la cookie de sesión (y se
+    renueva cuando ella se renueva) y se borra en cuanto la sesión ya no tiene mesa.
+    """
+    if session.get('mesa_num'):
+        interface = app.session_interface
+        if request.cookies.get("menu_mesa") != "1" or interface.should_set_cookie(app, session):
+            response.set_cookie("menu_mesa", "1", expires=interface.get_expiration_time(app, session), samesite="Lax")
+    elif "menu_mesa" in request.cookies:
+        response.delete_cookie("menu_mesa")
+    return response
+
+def qr_base_url():
+    return QR_BASE_URL or request.host_url
+
 @app.route("/generate_qr/<int:mesa_num>")
 def generate_qr(mesa_num):
-    """Genera un código QR para una mesa específica"""
-    if mesa_num < 1 or mesa_num > 13:
+    """Página con el código QR de una mesa específica"""
+    if mesa_num < 1 or mesa_num > TABLE_COUNT:
         return "Número de mesa inválido", 400
     
-    # URL que apunta a la mesa
-    base_url = request.host_url.rstrip('/')
-    mesa_url = f"{base_url}/mesa/{mesa_num}"
-    
-    # Generar QR
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(mesa_url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convertir a base64 para mostrar en HTML
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    img_str = base64.b64encode(img_buffer.getvalue()).decode()
-    
-    return render_template("qr_display.html", mesa_num=mesa_num, qr_image=img_str, mesa_url=mesa_url)
+    mesa_url = table_url(qr_base_url(), mesa_num)
+    return render_template("qr_display.html", mesa_num=mesa_num, mesa_url=mesa_url)
+
+@app.route("/qr/mesa_<int:mesa_num>.<fmt>")
+def qr_image(mesa_num, fmt):
+    """Imagen del QR (PNG o SVG), generada una vez por URL base y mesa"""
+    if mesa_num < 1 or mesa_num > TABLE_COUNT or fmt not in ("png", "svg"):
+        return "QR no encontrado", 404
+    if fmt == "png":
+        response = Response(qr_png(qr_base_url(), mesa_num), mimetype="image/png")
+    else:
+        response = Response(qr_svg(qr_base_url(), mesa_num), mimetype="image/svg+xml")
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
 
 @app.route("/admin/qr-codes")
 @admin_required
 def admin_qr_codes():
     """Panel para generar y ver todos los códigos QR"""
-    return render_template("admin_qr_codes.html")
+    return render_template("admin_qr_codes.html", tables=range(1, TABLE_COUNT + 1))
+
+@app.route("/admin/qr-codes/hoja.<fmt>")
+@admin_required
+def qr_sheet_download(fmt):
+    """Hoja imprimible con los QR de todas las mesas (PDF o PNG)"""
+    if fmt not in ("pdf", "png"):
+        return "Formato no soportado", 404
+    if TABLE_COUNT < 1:
+        return "No hay mesas configuradas (TABLE_COUNT)", 404
+    data = qr_sheet(qr_base_url(), range(1, TABLE_COUNT + 1), fmt)
+    return Response(
+        data,
+        mimetype="application/pdf" if fmt == "pdf" else "image/png",
+        headers={"Content-Disposition": f"attachment; filename=qr_mesas.{fmt}"}
+    )
 
 # ---------------------------------
 # SISTEMA DE CARRITO
@@ -576,24 +1508,17 @@ def view_cart():
         flash("No hay mesa asignada. Escanea el QR de tu mesa.", "warning")
         return redirect(url_for("index"))
     
-    cart = session.get('cart', {})
+    cart = current_cart()
     cart_items = []
     total = 0
+    resolved = resolve_products(cart_product_id(k, i) for k, i in cart.items())
     
     for cart_key, item in cart.items():
         try:
-            # Extraer product_id del cart_key (puede ser "product_id" o "product_id_size")
-            product_id = item.get('product_id')
-            if not product_id:
-                # Si no está en item, intentar extraer del cart_key
-                product_id = cart_key.split('_')[0] if '_' in cart_key else cart_key
-            
-            product = products_col.find_one({"_id": ObjectId(product_id)})
+            product_id = cart_product_id(cart_key, item)
+            product, category = resolved.get(product_id, (None, None))
             if product:
-                category = categories_col.find_one({"_id": product.get("category_id")})
-                # Convertir ObjectId a string para evitar problemas de serialización
-                # NO guardar el objeto product completo en item (contiene ObjectId)
-                item['product_id'] = str(product_id)  # Asegurar que sea string
+                item['product_id'] = product_id  # Asegurar que sea string
                 item['cart_key'] = cart_key  # Agregar cart_key al item
                 item['category_name'] = category.get("name", "") if category else ""
                 # Asegurar que 'name' esté presente (ya debería estar del add_to_cart)
@@ -607,6 +1532,17 @@ def view_cart():
     
     return render_template("cart.html", cart_items=cart_items, total=total, mesa_num=mesa_num)
 
+def form_quantity(default=None):
+    """Cantidad del formulario: `default` si no viene; None si no es un entero mayor a 0."""
+    raw = request.form.get("quantity", "").strip()
+    if not raw:
+        return default
+    try:
+        quantity = int(raw)
+    except ValueError:
+        return None
+    return quantity if quantity >= 1 else None
+
 @app.route("/cart/add", methods=["POST"])
 def add_to_cart():
     """Agregar producto al carrito"""
@@ -615,121 +1551,48 @@ def add_to_cart():
         return jsonify({"success": False, "message": "No hay mesa asignada"}), 400
     
     product_id = request.form.get("product_id")
-    quantity = int(request.form.get("quantity", 1))
+    quantity = form_quantity(default=1)
+    if quantity is None:
+        return jsonify({"success": False, "message": "La cantidad debe ser un entero mayor a 0"}), 400
     size = request.form.get("size", "")  # Para pizzas: individual, chica, mediana, etc.
     division = request.form.get("division", "") == "1"  # División: +$10
     orilla_queso = request.form.get("orilla_queso", "") == "1"  # Orilla de queso: precio según tamaño
     second_half_id = request.form.get("second_half_id", "")  # ID de la segunda mitad en división
     
     try:
-        product = products_col.find_one({"_id": ObjectId(product_id)})
-        if not product:
-            return jsonify({"success": False, "message": "Producto no encontrado"}), 404
-        
-        category = categories_col.find_one({"_id": product.get("category_id")})
-        category_name = category.get("name", "").upper() if category else ""
-        
-        # Determinar precio base según categoría y tamaño
-        base_price = 0
-        if category_name == "PIZZAS" and size:
-            price_field = f"price_{size.lower()}"
-            base_price = float(product.get(price_field, 0))
-            if not base_price:
-                return jsonify({"success": False, "message": f"Tamaño {size} no disponible"}), 400
-        else:
-            base_price = float(product.get("price", 0))
-            if not base_price:
-                return jsonify({"success": False, "message": "Precio no disponible"}), 400
-        
-        # Si hay división, obtener precio de la segunda mitad
-        second_half_price = 0
-        second_half_name = ""
-        if division and second_half_id:
-            second_product = products_col.find_one({"_id": ObjectId(second_half_id)})
-            if not second_product:
-                return jsonify({"success": False, "message": "Segunda mitad no encontrada"}), 404
-            
-            if category_name == "PIZZAS" and size:
-                price_field = f"price_{size.lower()}"
-                second_half_price = float(second_product.get(price_field, 0))
-                if not second_half_price:
-                    return jsonify({"success": False, "message": f"Tamaño {size} no disponible para segunda mitad"}), 400
-            
-            second_half_name = second_product.get('name', '')
-        
-        # Calcular precio adicional para pizzas
-        additional_price = 0
-        orilla_queso_price = 0
-        if category_name == "PIZZAS":
-            # División: +$10
-            if division:
-                additional_price += 10
-            
-            # Orilla de queso: precio según tamaño
-            if orilla_queso:
-                orilla_prices = {
-                    "individual": 15,
-                    "chica": 20,
-                    "mediana": 25,
-                    "grande": 30,
-                    "h4": 40
-                }
-                if size.lower() in orilla_prices:
-                    orilla_queso_price = orilla_prices[size.lower()]
-                    additional_price += orilla_queso_price
-        
-        # Precio final: primera mitad + adicionales (NO se cobra la segunda mitad, solo el costo de división)
-        price = base_price + additional_price
-        
-        # Inicializar carrito si no existe
-        if 'cart' not in session:
-            session['cart'] = {}
-        
-        cart = session['cart']
-        # Crear cart_key único incluyendo opciones para pizzas
-        if category_name == "PIZZAS":
-            options_key = f"{'D' if division else ''}{'O' if orilla_queso else ''}"
-            if division and second_half_id:
-                # Incluir segundo producto en el key para división
-                cart_key = f"{product_id}_{second_half_id}_{size}_{options_key}"
-            else:
-                cart_key = f"{product_id}_{size}_{options_key}" if options_key else f"{product_id}_{size}"
-        else:
-            cart_key = f"{product_id}_{size}" if size else product_id
-        
-        # Crear nombre para mostrar en el carrito
-        display_name = product.get('name')
-        if division and second_half_name:
-            display_name = f"{product.get('name')} / {second_half_name}"
-        
-        # Agregar o actualizar item en carrito
-        if cart_key in cart:
-            cart[cart_key]['quantity'] += quantity
-        else:
-            cart[cart_key] = {
-                'product_id': product_id,
-                'name': display_name,
-                'quantity': quantity,
-                'price': price,
-                'size': size,
-                'division': division if category_name == "PIZZAS" else False,
-                'orilla_queso': orilla_queso if category_name == "PIZZAS" else False,
-                'orilla_queso_price': orilla_queso_price if category_name == "PIZZAS" else 0,
-                'second_half_id': second_half_id if division else None,
-                'second_half_name': second_half_name if division else None,
-                'subtotal': price * quantity
-            }
-        
-        # Recalcular subtotal
-        cart[cart_key]['subtotal'] = cart[cart_key]['quantity'] * price
-        
-        session['cart'] = cart
-        session.modified = True
+        # Cotización con la tabla de precios del catálogo (sin consultas a Mongo)
+        line = catalog_cache.price_book().quote(
+            product_id,
+            quantity=quantity,
+            size=size,
+            division=division,
+            second_half_id=second_half_id,
+            orilla_queso=orilla_queso
+        )
+    except PricingError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+    
+    try:
+        # Agregar o sumar cantidad (incremento atómico en el store)
+        cart = cart_store.add_line(current_cart_id(), line['cart_key'], {
+            'product_id': line['product_id'],
+            'name': line['name'],
+            'quantity': quantity,
+            'price': from_cents(line['unit_cents']),
+            'size': line['size'],
+            'division': line['division'],
+            'orilla_queso': line['orilla_queso'],
+            'orilla_queso_price': from_cents(line['orilla_queso_cents']),
+            'second_half_id': line['second_half_id'],
+            'second_half_name': line['second_half_name']
+        })
+        if cart is None:
+            return jsonify({"success": False, "message": "El carrito expiró, intenta de nuevo"}), 409
         
         return jsonify({
             "success": True,
             "message": "Producto agregado al carrito",
-            "cart_count": sum(item['quantity'] for item in cart.values())
+            "cart_count": item_count(cart)
         })
     
     except Exception as e:
@@ -739,21 +1602,15 @@ def add_to_cart():
 def update_cart():
     """Actualizar cantidad de un item en el carrito"""
     cart_key = request.form.get("cart_key")
-    quantity = int(request.form.get("quantity", 1))
+    quantity = form_quantity()
     
-    if quantity <= 0:
-        # Si es una petición AJAX, devolver JSON
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return jsonify({"success": False, "message": "La cantidad debe ser mayor a 0"}), 400
-        return redirect(url_for("remove_from_cart", cart_key=cart_key))
-    
-    cart = session.get('cart', {})
-    if cart_key in cart:
-        cart[cart_key]['quantity'] = quantity
-        cart[cart_key]['subtotal'] = cart[cart_key]['quantity'] * cart[cart_key]['price']
-        session['cart'] = cart
-        session.modified = True
-        
+    if quantity is None:
+        # Para quitar una línea está /cart/remove
+        return jsonify({"success": False, "message": "La cantidad debe ser un entero mayor a 0"}), 400
+    
+    cart_id = current_cart_id()
+    cart = cart_store.set_quantity(cart_id, cart_key, quantity) if cart_id else None
+    if cart is not None:
         # Calcular total
         total = sum(float(item.get('subtotal', 0)) for item in cart.values())
         
@@ -772,24 +1629,47 @@ def update_cart():
 @app.route("/cart/remove/<cart_key>")
 def remove_from_cart(cart_key):
     """Eliminar item del carrito"""
-    cart = session.get('cart', {})
-    if cart_key in cart:
-        del cart[cart_key]
-        session['cart'] = cart
-        session.modified = True
+    cart_id = current_cart_id()
+    if cart_id:
+        cart_store.remove(cart_id, cart_key)
     
     return redirect(url_for("view_cart"))
 
 @app.route("/cart/clear")
 def clear_cart():
     """Vaciar carrito"""
-    session['cart'] = {}
-    session.modified = True
+    cart_id = current_cart_id()
+    if cart_id:
+        cart_store.clear(cart_id)
     return redirect(url_for("view_cart"))
 
 # ---------------------------------
 # SISTEMA DE PEDIDOS
 # ---------------------------------
+def order_items(lines):
+    """Líneas cotizadas -> items del pedido (precios en pesos, como se guardan)."""
+    return [{
+        'product_id': line['product_id'],
+        'product_name': line['name'],
+        'category_name': line['category_name'],
+        'quantity': line['quantity'],
+        'price': from_cents(line['unit_cents']),
+        'size': line['size'],
+        'division': line['division'],
+        'orilla_queso': line['orilla_queso'],
+        'orilla_queso_price': from_cents(line['orilla_queso_cents']),
+        'second_half_id': line['second_half_id'],
+        'second_half_name': line['second_half_name'] or '',
+        'subtotal': from_cents(line['subtotal_cents'])
+    } for line in lines]
+
+def line_errors(cart, errors):
+    """Reporte por línea de lo que no se pudo cotizar: [{line, product_name, message}]."""
+    return [
+        {"line": cart_key, "product_name": cart[cart_key].get("name", ""), "message": message}
+        for cart_key, message in errors.items()
+    ]
+
 @app.route("/order/checkout")
 def checkout():
     """Pantalla de confirmación del pedido"""
@@ -798,89 +1678,117 @@ def checkout():
         flash("No hay mesa asignada", "warning")
         return redirect(url_for("index"))
     
-    cart = session.get('cart', {})
+    cart = current_cart()
     if not cart:
         flash("El carrito está vacío", "warning")
         return redirect(url_for("view_cart"))
     
-    cart_items = []
-    total = 0
-    
-    for cart_key, item in cart.items():
-        try:
-            product = products_col.find_one({"_id": ObjectId(item['product_id'])})
-            if product:
-                category = categories_col.find_one({"_id": product.get("category_id")})
-                # NO guardar el objeto product completo (contiene ObjectId)
-                # Solo agregar los datos necesarios como strings
-                item['product_name'] = product.get('name', '')
-                item['product_image'] = product.get('image', '')
-                item['category_name'] = category.get("name", "") if category else ""
-                cart_items.append(item)
-                total += float(item.get('subtotal', 0))
-        except Exception as e:
-            print(f"Error en checkout: {e}")
-            continue
-    
-    return render_template("checkout.html", cart_items=cart_items, total=total, mesa_num=mesa_num)
+    # Misma cotización que hará submit_order: lo que se ve es lo que se cobra
+    lines, errors, total_cents = catalog_cache.price_book().price_cart(cart)
+    return render_template(
+        "checkout.html",
+        cart_items=order_items(lines),
+        errors=line_errors(cart, errors),
+        total=from_cents(total_cents),
+        mesa_num=mesa_num
+    )
+
+def order_submitted(order, replayed):
+    """Respuesta de un pedido ya guardado; la misma para el envío original y sus reintentos."""
+    # El carrito se cierra también al repetir: el primer intento pudo caerse justo después de insertar
+    cart_store.close(order['cart_id'])
+    if session.get('cart_id') == order['cart_id']:
+        session.pop('cart_id', None)
+    # Un reintento que llega con la sesión ya actualizada (carrito nuevo) sigue siendo de este pedido
+    session['last_order_id'] = str(order['_id'])
+    if not replayed:
+        flash("¡Pedido enviado exitosamente! Tu pedido está siendo preparado.", "success")
+    return jsonify({
+        "success": True,
+        "message": "Pedido enviado exitosamente",
+        "order_id": str(order['_id']),
+        "replayed": replayed
+    })
+
+def replayed_order(previous, mesa_num, cart_ids):
+    """Reintento de un pedido ya guardado; 409 si la llave es de otra mesa u otro carrito."""
+    own_order = previous.get('cart_id') in cart_ids or session.get('last_order_id') == str(previous['_id'])
+    if previous.get('mesa_num') != mesa_num or not own_order:
+        return jsonify({
+            "success": False,
+            "message": "La llave de idempotencia ya se usó para otro pedido"
+        }), 409
+    return order_submitted(previous, replayed=True)
 
 @app.route("/order/submit", methods=["POST"])
 def submit_order():
-    """Enviar pedido a cocina/administración"""
+    """Enviar pedido a cocina/administración.
+
+    El cliente manda una llave de idempotencia (header Idempotency-Key) que se
+    guarda en el pedido con índice único: un reintento o un doble toque con
+    la misma llave devuelve el pedido ya creado en lugar de duplicarlo. La
+    llave se guarda con el número de mesa: la de otra mesa nunca coincide.
+    """
     mesa_num = session.get('mesa_num')
     if not mesa_num:
         return jsonify({"success": False, "message": "No hay mesa asignada"}), 400
     
-    cart = session.get('cart', {})
+    # Carrito con el que se hizo el primer intento: si ese intento alcanzó a
+    # cerrarlo, current_cart_id() ya abre uno nuevo para la mesa
+    session_cart_id = session.get('cart_id')
+    cart_id = current_cart_id()
+    # Sin llave del cliente, el carrito mismo: un carrito produce un solo pedido
+    client_key = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key") or f"cart:{cart_id}"
+    if len(client_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return jsonify({"success": False, "message": "Llave de idempotencia inválida"}), 400
+    idempotency_key = f"{mesa_num}:{client_key}"
+
+    previous = orders_col.find_one({"idempotency_key": idempotency_key}, {"cart_id": 1, "mesa_num": 1})
+    if previous:
+        return replayed_order(previous, mesa_num, (session_cart_id, cart_id))
+
+    cart = cart_store.get(cart_id)
     if not cart:
         return jsonify({"success": False, "message": "El carrito está vacío"}), 400
     
-    # Preparar items del pedido
-    order_items = []
-    total = 0
-    
+    # Recotizar en el servidor con los precios del catálogo: no se confía en lo guardado en el carrito
+    lines, errors, total_cents = catalog_cache.price_book().price_cart(cart)
+    # Una cantidad menor a 1 nunca llega a cocina ni a los rollups, venga de donde venga el carrito
     for cart_key, item in cart.items():
-        try:
-            product = products_col.find_one({"_id": ObjectId(item['product_id'])})
-            if product:
-                category = categories_col.find_one({"_id": product.get("category_id")})
-                order_item = {
-                    'product_id': str(item['product_id']),
-                    'product_name': item['name'],
-                    'category_name': category.get("name", "") if category else "",
-                    'quantity': item['quantity'],
-                    'price': item['price'],
-                    'size': item.get('size', ''),
-                    'division': item.get('division', False),
-                    'orilla_queso': item.get('orilla_queso', False),
-                    'orilla_queso_price': item.get('orilla_queso_price', 0),
-                    'second_half_id': str(item.get('second_half_id', '')) if item.get('second_half_id') else None,
-                    'second_half_name': item.get('second_half_name', ''),
-                    'subtotal': item['subtotal']
-                }
-                order_items.append(order_item)
-                total += float(item['subtotal'])
-        except:
-            continue
+        if not isinstance(item.get("quantity"), int) or item["quantity"] < 1:
+            errors[cart_key] = "La cantidad debe ser un entero mayor a 0"
+    if errors:
+        # Nada se descarta en silencio: la mesa corrige el carrito y vuelve a enviar
+        return jsonify({
+            "success": False,
+            "message": "Algunos productos del carrito ya no están disponibles",
+            "errors": line_errors(cart, errors)
+        }), 409
     
     # Crear pedido en la base de datos
+    now = datetime.now()
     order = {
         'mesa_num': mesa_num,
-        'items': order_items,
-        'total': total,
-        'status': 'pendiente',  # pendiente, en_preparacion, listo, completado
-        'created_at': datetime.now(),
-        'updated_at': datetime.now()
+        'items': order_items(lines),
+        'total': from_cents(total_cents),
+        **new_order_fields(now),  # status pendiente, version y status_times (ver order_status.py)
+        'idempotency_key': idempotency_key,
+        'cart_id': cart_id,
+        'created_at': now,
+        'updated_at': now
     }
     
-    orders_col.insert_one(order)
-    
-    # Limpiar carrito
-    session['cart'] = {}
-    session.modified = True
+    try:
+        orders_col.with_options(write_concern=ORDER_WRITE_CONCERN).insert_one(order)
+    except DuplicateKeyError:
+        # Otro intento con la misma llave ganó la carrera
+        previous = orders_col.find_one({"idempotency_key": idempotency_key}, {"cart_id": 1, "mesa_num": 1})
+        return replayed_order(previous, mesa_num, (session_cart_id, cart_id))
+    publish_order_event("order_created", order_event_data(order))
+    update_rollups(record_order, order)
     
-    flash("¡Pedido enviado exitosamente! Tu pedido está siendo preparado.", "success")
-    return jsonify({"success": True, "message": "Pedido enviado exitosamente"})
+    # Cerrar carrito: la mesa empieza uno nuevo
+    return order_submitted(order, replayed=False)
 
 @app.route("/order/confirmation")
 def order_confirmation():
@@ -895,13 +1803,15 @@ def order_confirmation():
 @admin_required
 def admin_orders():
     """Panel de administración para ver pedidos activos"""
-    # Obtener pedidos pendientes y en preparación
+    # Id del último evento antes de consultar: la pantalla recibe por SSE lo que llegue después
+    last_event_id = order_feed.event_id(order_feed.last_id)
+    
+    # Pedidos que la cocina todavía no entrega (pendientes, en preparación y listos)
     active_orders = list(orders_col.find({
-        "status": {"$in": ["pendiente", "en_preparacion"]}
+        "status": {"$in": list(KITCHEN_STATUSES)}
     }).sort("created_at", -1))
     
     # Obtener pedidos completados recientes (últimas 24 horas)
-    from datetime import timedelta
     yesterday = datetime.now() - timedelta(days=1)
     completed_orders = list(orders_col.find({
         "status": "completado",
@@ -910,38 +1820,133 @@ def admin_orders():
     
     return render_template("admin_orders.html", 
                          active_orders=active_orders, 
-                         completed_orders=completed_orders)
+                         completed_orders=completed_orders,
+                         last_event_id=last_event_id,
+                         transitions=TRANSITIONS,
+                         status_labels=STATUS_LABELS)
+
+@app.route("/admin/orders/stream")
+@admin_required
+def admin_orders_stream():
+    """Server-Sent Events con los pedidos nuevos y cambios de estado"""
+    last_id = order_feed.resume_point(request.headers.get("Last-Event-ID") or request.args.get("since"))
+
+    def events(last_id):
+        yield "retry: 3000\n\n"
+        if last_id is None:
+            # El cliente perdió eventos o viene de otro worker: que recargue la página completa
+            yield format_sse(order_feed.event_id(order_feed.last_id), "reset", {})
+            last_id = order_feed.last_id
+        while True:
+            pending = order_feed.wait(last_id, ORDER_STREAM_KEEPALIVE)
+            if not pending:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event_type, data in pending:
+                yield format_sse(order_feed.event_id(event_id), event_type, data)
+                last_id = event_id
+
+    return Response(
+        stream_with_context(events(last_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def status_changed(order):
+    """Avisa a las pantallas y mueve los contadores de ventas tras un cambio de estado."""
+    publish_order_event("order_status", order_event_data(order))
+    update_rollups(move_order, order, order["previous_status"], order["status"])
+
+def parse_version(value):
+    """Versión que vio la pantalla (compare-and-set); None si no la mandó."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
 
 @app.route("/admin/order/<order_id>/update-status", methods=["POST"])
 @admin_required
 def update_order_status(order_id):
-    """Actualizar estado de un pedido"""
-    new_status = request.form.get("status")
-    valid_statuses = ["pendiente", "en_preparacion", "listo", "completado"]
-    
-    if new_status not in valid_statuses:
-        flash("Estado inválido", "danger")
-        return redirect(url_for("admin_orders"))
-    
-    orders_col.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {"status": new_status, "updated_at": datetime.now()}}
-    )
-    
-    flash(f"Estado del pedido actualizado a: {new_status}", "success")
-    return redirect(url_for("admin_orders"))
+    """Cambiar el estado de un pedido.
+
+    Solo se permite avanzar (ver order_status.py). Con `version` el cambio
+    falla si otra pantalla modificó el pedido antes. Las pantallas con JS
+    reciben el pedido actualizado en JSON; los formularios, un redirect.
+    """
+    wants_json = request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json
+    data = request.get_json(silent=True) or request.form
+    new_status = data.get("status")
+    try:
+        order = change_status(orders_col, ObjectId(order_id), new_status, parse_version(data.get("version")))
+    except InvalidId:
+        error = TransitionError("ID de pedido inválido", 400)
+    except TransitionError as e:
+        error = e
+    else:
+        status_changed(order)
+        if wants_json:
+            return jsonify({"success": True, "order": order_event_data(order)})
+        flash(f"Estado del pedido actualizado a: {new_status}", "success")
+        return redirect(request.referrer or url_for("admin_orders"))
+
+    if wants_json:
+        current = order_event_data(error.current) if error.current else None
+        return jsonify({"success": False, "message": error.message, "order": current}), error.status
+    flash(error.message, "danger")
+    return redirect(request.referrer or url_for("admin_orders"))
+
+@app.route("/admin/orders/status", methods=["POST"])
+@admin_required
+def bulk_update_order_status():
+    """Cambia el estado de varios pedidos en un solo request (JSON).
+
+    {"status": "listo", "orders": [{"id": "...", "version": 3}, ...]}
+    o {"status": "listo", "mesa_num": 7} para todos los pedidos de la mesa que
+    puedan pasar a ese estado.
+    """
+    data = request.get_json(silent=True) or {}
+    new_status = data.get("status")
+    if new_status not in STATUSES:
+        return jsonify({"success": False, "message": "Estado inválido"}), 400
+
+    try:
+        if data.get("mesa_num") is not None:
+            mesa_num = int(data["mesa_num"])
+            targets = [(order["_id"], None) for order in orders_col.find(
+                {"mesa_num": mesa_num, "status": {"$in": sources_for(new_status)}}, {"_id": 1}
+            )]
+        else:
+            targets = [(ObjectId(o["id"]), parse_version(o.get("version"))) for o in data.get("orders", [])]
+    except (InvalidId, KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "message": "Pedidos inválidos"}), 400
+    if len(targets) > BULK_STATUS_LIMIT:
+        return jsonify({"success": False, "message": f"Máximo {BULK_STATUS_LIMIT} pedidos por cambio"}), 400
+
+    updated, rejected = change_many(orders_col, targets, new_status)
+    for order in updated:
+        status_changed(order)
+    return jsonify({
+        "success": not rejected,
+        "updated": [order_event_data(order) for order in updated],
+        "rejected": [str(order_id) for order_id in rejected],
+    })
 
 @app.route("/admin/order/<order_id>")
 @admin_required
 def view_order(order_id):
     """Ver detalles de un pedido específico"""
     try:
-        order = orders_col.find_one({"_id": ObjectId(order_id)})
+        order = find_order(orders_col, db, ObjectId(order_id))
         if not order:
             flash("Pedido no encontrado", "danger")
             return redirect(url_for("admin_orders"))
         
-        return render_template("view_order.html", order=order)
+        return render_template(
+            "view_order.html",
+            order=order,
+            next_statuses=TRANSITIONS.get(order.get("status"), ()),
+            status_labels=STATUS_LABELS
+        )
     except:
         flash("ID de pedido inválido", "danger")
         return redirect(url_for("admin_orders"))
@@ -950,7 +1955,6 @@ def view_order(order_id):
 @admin_required
 def admin_cash():
     """Vista de corte de caja por día."""
-    from datetime import timedelta
     # Fecha seleccionada (formato YYYY-MM-DD)
     fecha_str = request.args.get("fecha")
     today = datetime.now().date()
@@ -975,22 +1979,318 @@ def admin_cash():
     if status_filter == "completado":
         query["status"] = "completado"
 
-    orders = list(orders_col.find(query).sort("created_at", 1))
-
-    total_ventas = sum(float(o.get("total", 0) or 0) for o in orders)
-    total_pedidos = len(orders)
+    # Totales desde las ventas agregadas; del detalle solo se leen los campos de la tabla
+    statuses = ["completado"] if status_filter == "completado" else None
+    total_pedidos, total_cents = status_sum(sales_for_day(daily_sales_col, selected_date), statuses)
+    # Días viejos pueden estar en el archivo de pedidos
+    orders = list(find_orders(
+        orders_col, db, query, {"mesa_num": 1, "status": 1, "total": 1, "created_at": 1, "items.quantity": 1},
+        start=start_dt, end=end_dt
+    ))
 
     return render_template(
         "admin_cash.html",
         orders=orders,
-        total_ventas=total_ventas,
+        total_ventas=from_cents(total_cents),
         total_pedidos=total_pedidos,
         selected_date=selected_date.strftime("%Y-%m-%d"),
         status_filter=status_filter,
     )
 
+def export_range(desde, hasta, status, fmt):
+    """Valida los filtros de exportación: (inicio, último día, fin exclusivo, estados).
+
+    Lanza ValueError con el mensaje para el usuario.
+    """
+    try:
+        start = datetime.strptime(desde, "%Y-%m-%d")
+        last_day = datetime.strptime(hasta, "%Y-%m-%d") if hasta else start
+    except (TypeError, ValueError):
+        raise ValueError("Fechas inválidas (usa AAAA-MM-DD)")
+    if last_day < start:
+        raise ValueError("La fecha final es anterior a la inicial")
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato inválido: {', '.join(FORMATS)}")
+    if status == "todos":
+        statuses = None
+    elif status in STATUSES:
+        statuses = [status]
+    else:
+        raise ValueError("Estado inválido")
+    return start, last_day, last_day + timedelta(days=1), statuses
+
+@app.route("/admin/orders/export")
+@admin_required
+def export_orders_download():
+    """Descarga los pedidos de un rango de fechas en CSV o JSONL (opcionalmente gzip)."""
+    fmt = request.args.get("formato", "csv")
+    gzip = request.args.get("gzip") == "1"
+    try:
+        start, last_day, end, statuses = export_range(
+            request.args.get("desde"), request.args.get("hasta"), request.args.get("status", "completado"), fmt
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("admin_cash"))
+
+    response = Response(
+        stream_with_context(export_orders(orders_col, db, start, end, statuses, fmt, gzip)),
+        mimetype="application/gzip" if gzip else FORMATS[fmt],
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{export_filename(start, last_day, fmt, gzip)}"'
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/admin/sales")
+@admin_required
+def admin_sales():
+    """Reporte de ventas por semana o mes, desde las ventas agregadas."""
+    period = request.args.get("periodo", "semana")
+    if period not in ("semana", "mes"):
+        period = "semana"
+    fecha_str = request.args.get("fecha")
+    today = datetime.now().date()
+    try:
+        selected_date = datetime.strptime(fecha_str, "%Y-%m-%d").date() if fecha_str else today
+    except ValueError:
+        selected_date = today
+
+    if period == "mes":
+        start = month_start(selected_date)
+        end = next_month(start)
+    else:
+        start = selected_date - timedelta(days=selected_date.weekday())
+        end = start + timedelta(days=7)
+
+    days = sales_between(daily_sales_col, start, end)
+    rows = []
+    for doc in days:
+        completed_orders, completed_cents = status_sum(doc, ["completado"])
+        all_orders, _all_cents = status_sum(doc)
+        rows.append({
+            "date": doc["_id"],
+            "orders": all_orders,
+            "completed_orders": completed_orders,
+            "sales": from_cents(completed_cents),
+        })
+
+    return render_template(
+        "admin_sales.html",
+        period=period,
+        selected_date=selected_date.strftime("%Y-%m-%d"),
+        start=start,
+        end=end - timedelta(days=1),
+        rows=rows,
+        total_ventas=sum(r["sales"] for r in rows),
+        total_pedidos=sum(r["completed_orders"] for r in rows),
+        products=[(name, quantity, from_cents(cents)) for name, quantity, cents in top_products(days)],
+    )
+
+# ---------------------------------
+# COMANDOS DE MANTENIMIENTO
+# ---------------------------------
+@app.cli.command("reindex-search")
+def reindex_search():
+    """Recalcula el campo search_text de todos los productos."""
+    ops = [
+        UpdateOne({"_id": p["_id"]}, {"$set": {"search_text": search_text(p)}})
+        for p in products_col.find({}, {"name": 1, "ingredients": 1})
+    ]
+    if ops:
+        products_col.bulk_write(ops, ordered=False)
+    print(f"search_text actualizado en {len(ops)} productos")
+
+def recount_category_products():
+    """Recalcula product_count de cada categoría desde los productos; devuelve cuántas tocó."""
+    counts = {row["_id"]: row["count"] for row in products_col.aggregate([
+        {"$group": {"_id": "$category_id", "count": {"$sum": 1}}}
+    ])}
+    ops = [
+        UpdateOne({"_id": c["_id"]}, {"$set": {"product_count": counts.get(c["_id"], 0)}})
+        for c in categories_col.find({}, {"_id": 1})
+    ]
+    if ops:
+        # Solo lo lee el dashboard, directo de Mongo: el menú no cambia
+        categories_col.bulk_write(ops, ordered=False)
+    return len(ops)
+
+@app.cli.command("recount-products")
+def recount_products():
+    """Recalcula el contador product_count de cada categoría desde los productos."""
+    print(f"product_count actualizado en {recount_category_products()} categorías")
+
+@app.cli.command("migrate-prices")
+def migrate_prices():
+    """Convierte a número los precios guardados como texto por versiones anteriores."""
+    fields = ["price"] + PIZZA_PRICE_FIELDS
+    ops = []
+    for product in products_col.find({"$or": [{f: {"$type": "string"}} for f in fields]}, {f: 1 for f in fields}):
+        update = {f: price_value(product[f]) for f in fields if isinstance(product.get(f), str)}
+        ops.append(UpdateOne({"_id": product["_id"]}, {"$set": update}))
+    if ops:
+        products_col.bulk_write(ops, ordered=False)
+        catalog_changed()
+    print(f"Precios convertidos en {len(ops)} productos")
+
+@app.cli.command("images-backfill")
+def images_backfill():
+    """Genera variantes para las imágenes que ya están en la carpeta de uploads."""
+    folder = app.config["UPLOAD_FOLDER"]
+    filenames = [f for f in sorted(os.listdir(folder)) if allowed_file(f) and not is_variant(f)]
+    paths = [os.path.join(folder, f) for f in filenames]
+    results = image_pool.map(make_variants, paths)
+    updated = 0
+    for save_path, variants in zip(paths, results):
+        # Subidas antiguas se sirven desde /static/uploads, las nuevas desde /uploads
+        for image_url in (f"/{save_path.replace(os.path.sep, '/')}", upload_url(os.path.basename(save_path))):
+            variants_doc = image_variants_doc(image_url, variants)
+            for collection in (categories_col, products_col):
+                result = collection.update_many({"image": image_url}, {"$set": {"image_variants": variants_doc}})
+                updated += result.modified_count
+        print(f"✓ {save_path}")
+    catalog_changed()
+    print(f"{len(paths)} imágenes procesadas, {updated} documentos actualizados")
+
+def referenced_uploads():
+    """Nombres de archivo que usan las categorías y productos."""
+    referenced = set()
+    for collection in (categories_col, products_col):
+        for doc in collection.find({"image": {"$nin": ["", None]}}, {"image": 1}):
+            referenced.add(doc["image"].rsplit("/", 1)[-1])
+    return referenced
+
+def print_removed(removed, dry_run):
+    for name in removed:
+        print(f"{'(dry-run) ' if dry_run else ''}✗ {name}")
+    print(f"{len(removed)} archivos {'por borrar' if dry_run else 'borrados'}")
+
+@app.cli.command("uploads-gc")
+@click.option("--dry-run", is_flag=True, help="Solo lista lo que se borraría.")
+def uploads_gc(dry_run):
+    """Borra las imágenes subidas que ya no usa ninguna categoría ni producto."""
+    print_removed(upload_storage.gc(referenced_uploads(), dry_run=dry_run), dry_run)
+
+@app.cli.command("uploads-migrate")
+@click.option("--keep-old", is_flag=True, help="No borra los archivos con nombre viejo.")
+def uploads_migrate(keep_old):
+    """Pasa las subidas con nombre tradicional al almacenamiento por hash.
+
+    Copias idénticas (IMG-...-WA0016.jpg, _1, _2) quedan en un solo blob; los
+    documentos pasan a la URL nueva con sus variantes y los nombres viejos
+    se borran como cualquier blob sin uso.
+    """
+    folder = app.config["UPLOAD_FOLDER"]
+    legacy = {}  # url vieja -> ruta en disco
+    for collection in (categories_col, products_col):
+        for doc in collection.find({"image": {"$nin": ["", None]}}, {"image": 1}):
+            name = doc["image"].rsplit("/", 1)[-1]
+            path = os.path.join(folder, name)
+            if is_blob(name) or not allowed_file(name) or not os.path.isfile(path):
+                continue
+            # Subidas antiguas se sirven desde /static/uploads, las de antes del hash también desde /uploads
+            if doc["image"] in (f"/{path.replace(os.path.sep, '/')}", upload_url(name)):
+                legacy[doc["image"]] = path
+    stored = {image_url: upload_storage.save_path(path) for image_url, path in legacy.items()}
+    paths = sorted({path for _name, path in stored.values()})
+    variants_by_path = dict(zip(paths, image_pool.map(make_variants, paths)))
+    for image_url, (name, path) in stored.items():
+        new_url = upload_url(name)
+        for collection in (categories_col, products_col):
+            collection.update_many({"image": image_url}, {"$set": {
+                "image": new_url,
+                "image_variants": image_variants_doc(new_url, variants_by_path[path]),
+            }})
+        print(f"{image_url} -> {new_url}")
+    print(f"{len(stored)} imágenes en {len({name for name, _path in stored.values()})} blobs")
+    if stored:
+        catalog_changed()
+    if not keep_old:
+        # Los que usan los templates y el CSS directamente se quedan
+        retired = {path.rsplit(os.path.sep, 1)[-1] for path in legacy.values()} - STATIC_UPLOADS
+        print_removed(upload_storage.gc(referenced_uploads(), retired_names=retired), False)
+
+@app.cli.command("rollups-rebuild")
+@click.option("--since", help="Solo desde esta fecha (YYYY-MM-DD); por defecto todo el historial.")
+def rollups_rebuild(since):
+    """Recalcula las ventas agregadas por día desde los pedidos (incluido el archivo)."""
+    since_dt = datetime.strptime(since, "%Y-%m-%d") if since else None
+    count = rebuild_rollups(order_sources(), daily_sales_col, since_dt)
+    print(f"Ventas agregadas recalculadas para {count} días")
+
+@app.cli.command("orders-archive")
+@click.option("--days", type=int, default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help="Archiva los completados creados hace más de estos días.")
+def orders_archive(days):
+    """Mueve los pedidos completados viejos a las colecciones del archivo."""
+    moved = run_archive(days)
+    print(f"{moved} pedidos archivados; particiones: {', '.join(archive_partitions(db)) or 'ninguna'}")
+
+@app.cli.command("orders-export")
+@click.option("--desde", required=True, help="Primer día (YYYY-MM-DD).")
+@click.option("--hasta", help="Último día, incluido (YYYY-MM-DD); por defecto el mismo que --desde.")
+@click.option("--status", default="completado", show_default=True, help="Estado del pedido o 'todos'.")
+@click.option("--formato", type=click.Choice(list(FORMATS)), default="csv", show_default=True)
+@click.option("--gzip", "gzip", is_flag=True, help="Comprime la salida con gzip.")
+@click.option("--salida", type=click.File("wb"), default="-", help="Archivo de salida; por defecto stdout.")
+def orders_export(desde, hasta, status, formato, gzip, salida):
+    """Exporta pedidos de un rango de fechas (incluye los archivados)."""
+    try:
+        start, _last_day, end, statuses = export_range(desde, hasta, status, formato)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for chunk in export_orders(orders_col, db, start, end, statuses, formato, gzip):
+        salida.write(chunk)
+
+@app.cli.command("assets-build")
+def assets_build():
+    """Minifica, versiona y precomprime el CSS/JS en static/dist."""
+    try:
+        manifest = build_assets(app.static_folder)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    asset_manifest.load()
+    for name in ASSETS:
+        print(f"✓ {name} -> {manifest[name]}")
+
+@app.cli.command("assets-vendor")
+def assets_vendor():
+    """Descarga Bootstrap a static/vendor para no depender del CDN."""
+    for path in vendor_assets(app.static_folder):
+        print(f"✓ {path}")
+    print("Corre `flask assets-build` para incluirlo en static/dist")
+
+@app.cli.command("menu-export")
+@click.option("--salida", default=STATIC_EXPORT_DIR or None, required=not STATIC_EXPORT_DIR,
+              help="Carpeta destino; por defecto STATIC_EXPORT_DIR.")
+def menu_export(salida):
+    """Exporta el menú público (inicio, categorías y sus páginas) a HTML estático precomprimido."""
+    written = export_menu(salida)
+    print(f"{written} páginas exportadas en {salida}")
+
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Crea los índices de MongoDB."""
+    ensure_indexes(db)
+    print("Índices creados")
+
+@app.cli.command("audit-queries")
+def audit_queries_command():
+    """Corre explain() sobre las consultas de la app y falla si alguna hace COLLSCAN."""
+    ensure_indexes(db)
+    now = datetime.now()
+    sample_values = {"category_id": ObjectId(), "$gte": now - timedelta(days=1), "$lt": now}
+    failures = 0
+    for name, stages, ok in audit_queries(db, sample_values):
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: {' > '.join(stages)}")
+        failures += not ok
+    if failures:
+        print(f"{failures} consultas sin índice")
+        raise SystemExit(1)
+
 # ---------------------------------
 # MAIN
 # ---------------------------------
 if __name__ == "__main__":
+    on_startup()
     app.run(debug=True, host="0.0.0.0", port=5000, use_reloader=False)
@@ -0,0 +1,119 @@
+"""
+Archivo de pedidos viejos.
+
+La colección `orders` solo guarda los pedidos "calientes": los abiertos y
+los cerrados recientes. Los completados con más de N días se mueven en lotes
+a una colección por mes (`orders_archive_2026_10`, según `created_at`), así
+las consultas de cocina no crecen con el historial.
+
+Las ventas agregadas (rollups.py) no cambian al archivar; el corte de caja y
+el detalle de un pedido leen de `orders` y de las particiones que cubren las
+fechas pedidas.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne
+
+from indexes import INDEXES
+
+ARCHIVE_PREFIX = "orders_archive_"
+ARCHIVE_STATUSES = ("completado",)
+
+
+def partition_name(moment):
+    return f"{ARCHIVE_PREFIX}{moment:%Y_%m}"
+
+
+def archive_partitions(db):
+    """Nombres de las particiones existentes, de la más vieja a la más nueva."""
+    return sorted(name for name in db.list_collection_names() if name.startswith(ARCHIVE_PREFIX))
+
+
+def _months(start, end):
+    month = datetime(start.year, start.month, 1)
+    while month < end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def partitions_between(db, start=None, end=None):
+    """Particiones existentes con pedidos creados en [start, end); todas si no hay rango."""
+    existing = archive_partitions(db)
+    if start is None or end is None:
+        return existing
+    wanted = {partition_name(month) for month in _months(start, end)}
+    return [name for name in existing if name in wanted]
+
+
+def archive_orders(orders_col, db, before, batch_size=1000):
+    """Mueve a su partición los pedidos completados creados antes de `before`.
+
+    Cada lote se copia (upsert por _id) y después se borra de `orders`; si el
+    proceso se corta entre los dos pasos, la siguiente corrida vuelve a copiar
+    el lote sin duplicarlo. Devuelve cuántos pedidos se movieron.
+    """
+    query = {"status": {"$in": list(ARCHIVE_STATUSES)}, "created_at": {"$lt": before}}
+    indexed = set()
+    moved = 0
+    while True:
+        batch = list(orders_col.find(query).sort("created_at", 1).limit(batch_size))
+        if not batch:
+            return moved
+        by_partition = {}
+        for order in batch:
+            by_partition.setdefault(partition_name(order["created_at"]), []).append(order)
+        for name, orders in by_partition.items():
+            if name not in indexed:
+                db[name].create_indexes(INDEXES["orders"])
+                indexed.add(name)
+            db[name].bulk_write([ReplaceOne({"_id": o["_id"]}, o, upsert=True) for o in orders], ordered=False)
+        # El filtro de estado evita borrar un pedido reabierto mientras se copiaba
+        ids = [o["_id"] for o in batch]
+        result = orders_col.delete_many({**query, "_id": {"$in": ids}})
+        moved += result.deleted_count
+        if result.deleted_count < len(batch):
+            # Los reabiertos siguen vivos en `orders`: se quita su copia del archivo
+            # para que find_orders y rebuild_rollups no los cuenten dos veces. Ya
+            # no cumplen `query`, así que el siguiente lote sigue con los demás.
+            kept = [o["_id"] for o in orders_col.find({"_id": {"$in": ids}}, {"_id": 1})]
+            for name, orders in by_partition.items():
+                stale = [o["_id"] for o in orders if o["_id"] in kept]
+                if stale:
+                    db[name].delete_many({"_id": {"$in": stale}})
+
+
+def find_orders(orders_col, db, query, projection=None, start=None, end=None, batch_size=None):
+    """Pedidos de `orders` y del archivo que cumplen `query`, por `created_at` ascendente.
+
+    `start`/`end` limitan las particiones que se consultan; deben cubrir el
+    rango de fechas de `query`. Cada colección se lee ordenada y se mezclan
+    sin cargar todo en memoria.
+    """
+    collections = [orders_col] + [db[name] for name in partitions_between(db, start, end)]
+    if projection is not None:
+        projection = {**projection, "created_at": 1}
+    cursors = [col.find(query, projection).sort("created_at", 1) for col in collections]
+    if batch_size:
+        cursors = [cursor.batch_size(batch_size) for cursor in cursors]
+    return heapq.merge(*cursors, key=lambda order: order["created_at"])
+
+
+def find_order(orders_col, db, order_id):
+    """Un pedido por _id, esté en `orders` o archivado.
+
+    Primero se busca en las particiones del mes en que se generó el _id (con
+    un día de margen por la diferencia entre UTC y la hora local); si no está
+    ahí (pedidos importados), en las demás.
+    """
+    order = orders_col.find_one({"_id": order_id})
+    if order:
+        return order
+    created = order_id.generation_time.replace(tzinfo=None)
+    likely = partitions_between(db, created - timedelta(days=1), created + timedelta(days=1))
+    others = [name for name in reversed(archive_partitions(db)) if name not in likely]
+    for name in likely + others:
+        order = db[name].find_one({"_id": order_id})
+        if order:
+            return order
+    return None
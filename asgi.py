@@ -0,0 +1,341 @@
+"""
+Modo async (ASGI) para los endpoints que pasan el tiempo esperando I/O:
+
+    uvicorn asgi:app --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+Corre junto a la app WSGI (wsgi.py), que sigue sirviendo todo lo demás; el
+proxy manda a este proceso solo las rutas de `routes()`. Aquí no hay un hilo
+por request: cada pantalla de cocina conectada por SSE es una tarea de
+asyncio que espera eventos, y las consultas independientes de una página
+salen a Mongo al mismo tiempo (asyncio.gather) con el cliente async de
+PyMongo.
+
+Los templates, url_for y la sesión son los de la app Flask: cada página se
+renderiza dentro de un request context armado con los headers del request
+ASGI, así que la cookie de sesión sirve igual en los dos modos.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import render_template, request, session, url_for, flash
+from pymongo import AsyncMongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+import app as sync_app
+from carts import expand_line, item_count
+from order_feed import AsyncOrderFeed, format_sse, order_event_data, polled_event
+from order_status import KITCHEN_STATUSES, STATUS_LABELS, TRANSITIONS
+from rollups import TOTAL_ID, status_sum
+
+flask_app = sync_app.app
+logger = logging.getLogger("asgi")
+
+
+class State:
+    """Cliente async, colecciones y canal de cocina del proceso; se crean dentro del event loop."""
+
+    def __init__(self):
+        self.client = None
+        self.db = None
+        self.order_feed = None
+        self.watcher = None
+
+    def start(self):
+        if self.client is not None:
+            return
+        if not sync_app.SECRET_KEY:
+            raise RuntimeError("Define SECRET_KEY: el modo async lee la misma cookie de sesión que los workers WSGI")
+        self.client = AsyncMongoClient(
+            sync_app.MONGO_URI,
+            maxPoolSize=sync_app.MONGO_MAX_POOL_SIZE,
+            minPoolSize=sync_app.MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=sync_app.MONGO_TIMEOUT_MS,
+            connectTimeoutMS=sync_app.MONGO_TIMEOUT_MS,
+            socketTimeoutMS=sync_app.MONGO_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=sync_app.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        )
+        self.db = self.client[sync_app.DB_NAME]
+        self.order_feed = AsyncOrderFeed()
+        self.watcher = asyncio.create_task(watch_orders(self.db["orders"], self.order_feed))
+
+    async def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+        if self.client is not None:
+            await self.client.close()
+        self.__init__()
+
+
+state = State()
+
+# ---------------------------------
+# EVENTOS DE PEDIDOS
+# ---------------------------------
+async def watch_orders(orders, feed):
+    """Alimenta el canal con el change stream de `orders`; sin replica set, sondea."""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    while True:
+        try:
+            async with await orders.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    order = change.get("fullDocument")
+                    if not order:
+                        continue
+                    if change["operationType"] == "insert":
+                        feed.publish("order_created", order_event_data(order))
+                    elif "status" in change.get("updateDescription", {}).get("updatedFields", {}):
+                        feed.publish("order_status", order_event_data(order))
+        except OperationFailure as e:
+            logger.warning(f"Change stream de pedidos no disponible, se sondea cada {sync_app.ORDER_POLL_SECONDS} s: {e}")
+            await poll_orders(orders, feed)
+            return
+        except PyMongoError as e:
+            logger.warning(f"Change stream de pedidos interrumpido: {e}")
+            await asyncio.sleep(5)
+
+
+async def poll_orders(orders, feed):
+    """Publica los pedidos creados o modificados desde el último sondeo (índice updated_at)."""
+    since = datetime.now()
+    while True:
+        await asyncio.sleep(sync_app.ORDER_POLL_SECONDS)
+        try:
+            changed = await orders.find({"updated_at": {"$gt": since}}).sort("updated_at", 1).to_list()
+        except PyMongoError as e:
+            logger.warning(f"No se pudieron sondear los pedidos: {e}")
+            continue
+        for order in changed:
+            feed.publish(*polled_event(order))
+            since = max(since, order["updated_at"])
+
+
+# ---------------------------------
+# REQUEST CONTEXT DE FLASK Y RESPUESTAS
+# ---------------------------------
+@contextmanager
+def flask_request(scope):
+    """Request context de la app Flask con la ruta y los headers del request ASGI."""
+    headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in scope["headers"]]
+    with flask_app.test_request_context(
+        scope["path"],
+        method=scope["method"],
+        query_string=scope.get("query_string", b"").decode("latin-1"),
+        headers=headers,
+    ):
+        yield
+
+
+def session_headers():
+    """Set-Cookie de la sesión si cambió (p. ej. se leyeron o agregaron mensajes flash)."""
+    response = flask_app.response_class()
+    flask_app.session_interface.save_session(flask_app, session, response)
+    return [("set-cookie", cookie) for cookie in response.headers.getlist("Set-Cookie")]
+
+
+async def render(template, **context):
+    """render_template en un hilo: el context processor del menú puede consultar Mongo (driver sync).
+
+    Lo mismo que asyncio.to_thread (Python 3.9+): el hilo corre con una copia
+    del contexto, que es donde vive el request context de Flask.
+    """
+    call = functools.partial(contextvars.copy_context().run, render_template, template, **context)
+    return await asyncio.get_running_loop().run_in_executor(None, call)
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            *[(name.encode(), value.encode("latin-1")) for name, value in headers],
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_html(send, html):
+    await send_response(send, 200, html, "text/html; charset=utf-8", [("cache-control", "no-store"), *session_headers()])
+
+
+async def login_redirect(send):
+    """Lo mismo que admin_required en app.py."""
+    flash("Debes iniciar sesión como administrador", "warning")
+    await send_response(send, 302, b"", "text/plain", [("location", url_for("admin")), *session_headers()])
+
+
+# ---------------------------------
+# RUTAS
+# ---------------------------------
+async def admin_dashboard(scope, receive, send):
+    """Como admin_dashboard en app.py, con las seis consultas en paralelo."""
+    with flask_request(scope):
+        if not session.get("admin_logged_in"):
+            return await login_redirect(send)
+        search_query = request.args.get("q", "").strip()
+        category_filter = {"name": {"$regex": search_query, "$options": "i"}} if search_query else {}
+        db = state.db
+        categories, category_count, pending_media, product_count, totals, latest_orders, latest_products = await asyncio.gather(
+            db["categories"].find(category_filter).sort("order", 1).to_list(),
+            db["categories"].count_documents({}),
+            db["categories"].count_documents({"image": {"$in": ["", None]}}),
+            db["products"].estimated_document_count(),
+            db["daily_sales"].find_one({"_id": TOTAL_ID}),
+            db["orders"].find().sort("created_at", -1).limit(3).to_list(),
+            db["products"].find().sort("_id", -1).limit(3).to_list(),
+        )
+        stats = {
+            "categories": category_count,
+            "products": product_count,
+            "active_orders": status_sum(totals or {}, KITCHEN_STATUSES)[0],
+            "pending_media": pending_media,
+        }
+        html = await render(
+            "admin.html",
+            categories=categories,
+            stats=stats,
+            latest_orders=latest_orders,
+            latest_products=latest_products,
+            search_query=search_query,
+        )
+        await send_html(send, html)
+
+
+async def admin_orders(scope, receive, send):
+    """Como admin_orders en app.py: activos y completados del día, en paralelo."""
+    with flask_request(scope):
+        if not session.get("admin_logged_in"):
+            return await login_redirect(send)
+        # Id del último evento antes de consultar: lo que llegue después sale por el SSE
+        last_event_id = state.order_feed.event_id(state.order_feed.last_id)
+        orders = state.db["orders"]
+        yesterday = datetime.now() - timedelta(days=1)
+        active_orders, completed_orders = await asyncio.gather(
+            orders.find({"status": {"$in": list(KITCHEN_STATUSES)}}).sort("created_at", -1).to_list(),
+            orders.find({"status": "completado", "created_at": {"$gte": yesterday}}).sort("created_at", -1).to_list(),
+        )
+        html = await render(
+            "admin_orders.html",
+            active_orders=active_orders,
+            completed_orders=completed_orders,
+            last_event_id=last_event_id,
+            transitions=TRANSITIONS,
+            status_labels=STATUS_LABELS,
+        )
+        await send_html(send, html)
+
+
+async def admin_orders_stream(scope, receive, send):
+    """SSE de cocina: cada pantalla es una tarea que espera en el canal, no un hilo."""
+    feed = state.order_feed
+    with flask_request(scope):
+        if not session.get("admin_logged_in"):
+            return await login_redirect(send)
+        last_id = feed.resume_point(request.headers.get("Last-Event-ID") or request.args.get("since"))
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    disconnected = asyncio.create_task(wait_disconnect())
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")],
+    })
+
+    async def emit(text):
+        await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+
+    try:
+        await emit("retry: 3000\n\n")
+        if last_id is None:
+            # El cliente perdió eventos o viene de otro proceso: que recargue la página completa
+            await emit(format_sse(feed.event_id(feed.last_id), "reset", {}))
+            last_id = feed.last_id
+        while True:
+            waiting = asyncio.create_task(feed.wait_async(last_id, sync_app.ORDER_STREAM_KEEPALIVE))
+            await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                # La pantalla se cerró: se libera la tarea sin esperar al keep-alive
+                waiting.cancel()
+                return
+            pending = waiting.result()
+            if not pending:
+                await emit(": keep-alive\n\n")
+                continue
+            for event_id, event_type, data in pending:
+                await emit(format_sse(feed.event_id(event_id), event_type, data))
+                last_id = event_id
+    finally:
+        disconnected.cancel()
+
+
+async def table_status(scope, receive, send):
+    """Como table_status en app.py (solo con CART_STORE=mongo: los carritos viven en Mongo)."""
+    with flask_request(scope):
+        mesa_num = session.get("mesa_num")
+    cart_count = 0
+    if mesa_num:
+        cart = await state.db["carts"].find_one({"mesa_num": mesa_num, "open": True}, {"lines": 1})
+        lines = cart.get("lines", {}) if cart else {}
+        cart_count = item_count({key: expand_line(line) for key, line in lines.items()})
+    body = sync_app.json.dumps({"mesa_num": mesa_num, "cart_count": cart_count})
+    await send_response(send, 200, body, "application/json", [("cache-control", "no-store")])
+
+
+def routes():
+    """Ruta -> handler; mismas URLs que la app WSGI."""
+    with flask_app.test_request_context():
+        table = {
+            url_for("admin_dashboard"): admin_dashboard,
+            url_for("admin_orders"): admin_orders,
+            url_for("admin_orders_stream"): admin_orders_stream,
+        }
+        if sync_app.CART_STORE == "mongo":
+            table[url_for("table_status")] = table_status
+    return table
+
+
+ROUTES = routes()
+
+
+# ---------------------------------
+# APLICACIÓN ASGI
+# ---------------------------------
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            state.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await state.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    handler = ROUTES.get(scope["path"])
+    if handler is None:
+        return await send_response(send, 404, "No encontrado", "text/plain; charset=utf-8")
+    # Un HEAD al SSE nunca terminaría: el stream no tiene fin
+    methods = ("GET",) if handler is admin_orders_stream else ("GET", "HEAD")
+    if scope["method"] not in methods:
+        return await send_response(send, 405, "Método no permitido", "text/plain; charset=utf-8",
+                                   [("allow", ", ".join(methods))])
+    # Servidores sin lifespan: se inicia con el primer request
+    state.start()
+    await handler(scope, receive, send)
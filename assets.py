@@ -0,0 +1,202 @@
+"""
+CSS y JS del sitio: minificados, con hash en el nombre y precomprimidos.
+
+`flask assets-build` lee los archivos de ASSETS (dentro de static/), los
+minifica y escribe en static/dist/ `nombre.<hash>.ext` más sus versiones
+.gz y .br, junto con manifest.json (nombre lógico -> archivo). Como el hash
+cambia con el contenido, se sirven con caché "immutable" de un año.
+
+Sin manifiesto (desarrollo, antes del primer build) `AssetManifest.path`
+devuelve el archivo fuente. Bootstrap se copia a static/vendor/ con
+`flask assets-vendor`; mientras no esté, el sitio usa el CDN, pero el build
+falla: producción no debe depender del CDN ni de una copia alterada.
+
+La minificación de JS usa `rjsmin` y la compresión brotli el paquete `brotli`.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import urllib.request
+
+import brotli
+import rjsmin
+
+DIST_FOLDER = "dist"
+MANIFEST_NAME = "manifest.json"
+
+BOOTSTRAP_VERSION = "5.3.2"
+_BOOTSTRAP_CDN = f"https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist"
+
+# Nombre lógico -> archivo fuente dentro de static/
+ASSETS = {
+    "bootstrap.css": "vendor/bootstrap/bootstrap.min.css",
+    "bootstrap.js": "vendor/bootstrap/bootstrap.bundle.min.js",
+    "style.css": "styles/style.css",
+    "category.css": "styles/category.css",
+    "search.css": "styles/search.css",
+    "main.js": "js/main.js",
+    "category.js": "js/category.js",
+    "cart.js": "js/cart.js",
+    "checkout.js": "js/checkout.js",
+    "offline.js": "js/offline.js",
+}
+
+# Archivos de Bootstrap que se copian a static/vendor: fuente -> (URL, SHA-384 en base64)
+VENDOR_FILES = {
+    "vendor/bootstrap/bootstrap.min.css": (
+        f"{_BOOTSTRAP_CDN}/css/bootstrap.min.css",
+        "T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN",
+    ),
+    "vendor/bootstrap/bootstrap.bundle.min.js": (
+        f"{_BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js",
+        "C6RzsynM9kWDrMNeT87bh95OGNyZPhcTNXj1NW7RuBCsyN/o0jlpcV8Qyq46cDfL",
+    ),
+}
+
+# Mientras Bootstrap no esté copiado localmente
+CDN_FALLBACK = {
+    "bootstrap.css": VENDOR_FILES[ASSETS["bootstrap.css"]][0],
+    "bootstrap.js": VENDOR_FILES[ASSETS["bootstrap.js"]][0],
+}
+
+_CSS_COMMENT_OR_STRING = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', re.S)
+_CSS_SPACES = re.compile(r"\s+")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,])\s*")
+
+
+def minify_css(text):
+    """Quita comentarios y espacios sobrantes sin tocar el contenido de los strings.
+
+    Es conservador a propósito: no quita espacios alrededor de `:`, `+` o
+    `>` porque cambian el significado en selectores y en calc().
+    """
+    strings = []
+
+    def keep(match):
+        token = match.group(0)
+        if token.startswith("/*"):
+            return " "
+        strings.append(token)
+        return f"\0{len(strings) - 1}\0"
+
+    text = _CSS_COMMENT_OR_STRING.sub(keep, text)
+    text = _CSS_SPACES.sub(" ", text)
+    text = _CSS_PUNCTUATION.sub(r"\1", text)
+    text = text.replace(";}", "}").strip()
+    return re.sub(r"\0(\d+)\0", lambda m: strings[int(m.group(1))], text)
+
+
+def minify_js(text):
+    return rjsmin.jsmin(text)
+
+
+def precompressed(data):
+    """Versiones comprimidas de `data`: sufijo (.gz, .br) -> bytes."""
+    return {
+        # mtime=0: el mismo contenido produce exactamente el mismo .gz
+        ".gz": gzip.compress(data, compresslevel=9, mtime=0),
+        ".br": brotli.compress(data, quality=11),
+    }
+
+
+def _sri(data):
+    return base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+def check_vendor(static_folder):
+    """ValueError si falta algún archivo de VENDOR_FILES o no coincide con su SHA-384."""
+    for source, (url, sri) in VENDOR_FILES.items():
+        path = os.path.join(static_folder, source)
+        if not os.path.exists(path):
+            raise ValueError(f"Falta {path}: corre `flask assets-vendor`")
+        with open(path, "rb") as f:
+            if _sri(f.read()) != sri:
+                raise ValueError(f"{path} no coincide con el hash de {url}: corre `flask assets-vendor`")
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build(static_folder):
+    """Genera static/dist y su manifiesto; devuelve el manifiesto.
+
+    Los archivos de builds anteriores se dejan: páginas ya cacheadas pueden
+    seguir pidiéndolos durante un despliegue. ValueError si Bootstrap no está
+    copiado y verificado (ver check_vendor).
+    """
+    check_vendor(static_folder)
+    dist = os.path.join(static_folder, DIST_FOLDER)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name, source in ASSETS.items():
+        path = os.path.join(static_folder, source)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        if source.endswith(".min.css") or source.endswith(".min.js"):
+            minified = text
+        elif name.endswith(".css"):
+            minified = minify_css(text)
+        else:
+            minified = minify_js(text)
+        data = minified.encode("utf-8")
+        stem, ext = os.path.splitext(name)
+        filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        target = os.path.join(dist, filename)
+        _write(target, data)
+        for suffix, compressed in precompressed(data).items():
+            _write(target + suffix, compressed)
+        manifest[name] = filename
+    with open(os.path.join(dist, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def vendor(static_folder):
+    """Descarga Bootstrap a static/vendor verificando su SHA-384; devuelve las rutas escritas."""
+    written = []
+    for source, (url, sri) in VENDOR_FILES.items():
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        if _sri(data) != sri:
+            raise ValueError(f"{url} no coincide con el hash esperado")
+        path = os.path.join(static_folder, source)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write(path, data)
+        written.append(path)
+    return written
+
+
+class AssetManifest:
+    """Resuelve el nombre lógico de un asset a su ruta dentro de static/."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.files = {}
+        self.load()
+
+    def load(self):
+        path = os.path.join(self.static_folder, DIST_FOLDER, MANIFEST_NAME)
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.files = json.load(f)
+        except FileNotFoundError:
+            self.files = {}
+        return self.files
+
+    def version(self):
+        """Hash del manifiesto: cambia cuando cambia cualquier asset construido."""
+        return hashlib.sha256(json.dumps(self.files, sort_keys=True).encode()).hexdigest()[:12]
+
+    def path(self, name):
+        """Ruta relativa a static/, o None si el archivo no existe (se usa el CDN)."""
+        if name in self.files:
+            return f"{DIST_FOLDER}/{self.files[name]}"
+        source = ASSETS[name]
+        if os.path.exists(os.path.join(self.static_folder, source)):
+            return source
+        return None
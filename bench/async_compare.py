@@ -0,0 +1,138 @@
+"""
+Compara el modo sync (gunicorn wsgi:app) con el modo async (uvicorn asgi:app)
+sobre servidores ya levantados contra la misma base:
+
+    gunicorn -c gunicorn.conf.py -b :8000 wsgi:app
+    uvicorn asgi:app --port 8001
+    python -m bench.async_compare --sync http://localhost:8000 --async http://localhost:8001
+
+Mientras N pantallas de cocina mantienen abierto el SSE, M clientes piden
+en paralelo las rutas que sirve el modo async (/admin/orders, /admin/dashboard
+y, con CART_STORE=mongo, /mesa/estado). Con el modo sync
+cada pantalla ocupa un hilo del worker y las páginas esperan turno; con el
+modo async las pantallas son tareas y las consultas de cada página salen en
+paralelo. Se reportan p50/p95 y errores por ruta en cada modo.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlencode, urlsplit
+
+import asgi
+from app import ADMIN_PASS, ADMIN_USER
+from bench.run import percentile
+
+# Las mismas rutas en los dos modos: solo las que existen en asgi (sin el SSE, que usan las pantallas)
+ROUTES = sorted(path for path, handler in asgi.ROUTES.items() if handler is not asgi.admin_orders_stream)
+
+
+async def http_request(base_url, path, cookie=None, method="GET", body=b"", timeout=30):
+    """Un request HTTP/1.1 con Connection: close; devuelve (status, headers, body)."""
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(url.hostname, url.port or 80), timeout)
+    headers = [f"{method} {path} HTTP/1.1", f"Host: {url.netloc}", "Connection: close"]
+    if cookie:
+        headers.append(f"Cookie: {cookie}")
+    if body:
+        headers += ["Content-Type: application/x-www-form-urlencoded", f"Content-Length: {len(body)}"]
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    try:
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    response_headers = [tuple(part.strip() for part in line.split(":", 1)) for line in lines[1:] if ":" in line]
+    return status, response_headers, payload
+
+
+async def login(base_url):
+    """Cookie de sesión de admin (sirve en los dos modos: misma SECRET_KEY)."""
+    body = urlencode({"username": ADMIN_USER, "password": ADMIN_PASS}).encode()
+    status, headers, _ = await http_request(base_url, "/admin", method="POST", body=body)
+    cookie = session_cookie(headers)
+    if status != 302 or not cookie:
+        raise SystemExit(f"No se pudo iniciar sesión en {base_url} (HTTP {status})")
+    return cookie
+
+
+def session_cookie(headers, default=None):
+    cookies = [value.split(";", 1)[0] for name, value in headers if name.lower() == "set-cookie"]
+    return cookies[-1] if cookies else default
+
+
+async def kitchen_screen(base_url, cookie, stop):
+    """Una pantalla de cocina con el SSE abierto hasta el final de la prueba."""
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    writer.write((f"GET /admin/orders/stream HTTP/1.1\r\nHost: {url.netloc}\r\nCookie: {cookie}\r\n"
+                  "Accept: text/event-stream\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+    try:
+        while not stop.is_set():
+            try:
+                if not await asyncio.wait_for(reader.read(4096), 1):
+                    return
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        writer.close()
+
+
+async def client(base_url, cookie, requests, samples):
+    for i in range(requests):
+        path = ROUTES[i % len(ROUTES)]
+        started = time.perf_counter()
+        try:
+            status, _, _ = await http_request(base_url, path, cookie)
+        except (OSError, asyncio.TimeoutError):
+            status = None
+        samples.setdefault(path, []).append((time.perf_counter() - started, status))
+
+
+async def run_mode(base_url, cookie, screens, clients, requests):
+    stop = asyncio.Event()
+    kitchen = [asyncio.create_task(kitchen_screen(base_url, cookie, stop)) for _ in range(screens)]
+    # Que las pantallas terminen de conectarse antes de medir
+    await asyncio.sleep(1)
+    samples = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(client(base_url, cookie, requests, samples) for _ in range(clients)))
+    wall_time = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*kitchen, return_exceptions=True)
+    return samples, wall_time
+
+
+def print_report(name, samples, wall_time):
+    total = sum(len(route) for route in samples.values())
+    print(f"\n{name}: {total} requests en {wall_time:.2f} s ({total / wall_time:.1f} req/s)")
+    print(f"{'ruta':<24}{'n':>6}{'p50':>9}{'p95':>9}{'errores':>9}")
+    for path, route in sorted(samples.items()):
+        durations = sorted(s[0] * 1000 for s in route)
+        errors = sum(1 for s in route if s[1] != 200)
+        print(f"{path:<24}{len(route):>6}{percentile(durations, 0.50):>9.1f}{percentile(durations, 0.95):>9.1f}{errors:>9}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Modo sync contra modo async")
+    parser.add_argument("--sync", dest="sync_url", default="http://localhost:8000", help="Servidor WSGI")
+    parser.add_argument("--async", dest="async_url", default="http://localhost:8001", help="Servidor ASGI")
+    parser.add_argument("--screens", type=int, default=20, help="Pantallas de cocina con SSE abierto")
+    parser.add_argument("--clients", type=int, default=50, help="Clientes simultáneos")
+    parser.add_argument("--requests", type=int, default=30, help="Requests por cliente")
+    args = parser.parse_args()
+
+    cookie = await login(args.sync_url)
+    # La mesa en sesión hace que /mesa/estado consulte el carrito
+    _, headers, _ = await http_request(args.sync_url, "/mesa/1", cookie)
+    cookie = session_cookie(headers, cookie)
+    for name, base_url in (("sync", args.sync_url), ("async", args.async_url)):
+        samples, wall_time = await run_mode(base_url, cookie, args.screens, args.clients, args.requests)
+        print_report(name, samples, wall_time)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+Catálogo e historial de pedidos sintéticos para las pruebas de carga.
+
+Todo sale de un `random.Random(seed)`: con la misma semilla se genera
+exactamente la misma base, así dos corridas del benchmark son comparables.
+"""
+import random
+from datetime import datetime, timedelta
+
+from pricing import PIZZA_PRICE_FIELDS, PriceBook, SIZES, from_cents
+from rollups import rebuild_rollups
+from search import search_text
+
+BATCH_SIZE = 1000
+
+_FLAVORS = ["Hawaiana", "Pepperoni", "Mexicana", "Boloñesa", "Vegetariana", "Carnes frías",
+            "Cuatro quesos", "Margarita", "Suprema", "Champiñones", "Pollo BBQ", "Napolitana"]
+_INGREDIENTS = ["queso", "jamón", "piña", "pepperoni", "jalapeño", "chorizo", "champiñón",
+                "pimiento", "cebolla", "aceitunas", "tocino", "pollo", "salsa bbq", "albahaca"]
+_DRINKS = ["Coca", "Sprite", "Fanta", "Agua", "Limonada", "Té helado", "Jamaica", "Horchata"]
+_SIDES = ["Papas", "Alitas", "Dedos de queso", "Pan de ajo", "Ensalada", "Boneless"]
+_STATUSES = [("completado", 80), ("listo", 5), ("en_preparacion", 5), ("pendiente", 10)]
+
+
+def _name(rng, words, index):
+    return f"{rng.choice(words)} {index}"
+
+
+def generate_catalog(db, products=60, extra_categories=2, seed=1):
+    """Inserta categorías y `products` productos repartidos entre ellas.
+
+    La mitad son pizzas (la categoría más pesada del menú); el resto se
+    reparte entre bebidas, complementos y `extra_categories` categorías más.
+    """
+    rng = random.Random(seed)
+    names = ["PIZZAS", "BEBIDAS", "COMPLEMENTOS"] + [f"ESPECIALES {i + 1}" for i in range(extra_categories)]
+    categories = [
+        {"name": name, "description": f"Categoría {name.lower()}", "order": order, "image": ""}
+        for order, name in enumerate(names, start=1)
+    ]
+    db.categories.insert_many(categories)
+    pizzas, others = categories[0], categories[1:]
+
+    docs = []
+    for index in range(products):
+        if index % 2 == 0:
+            base = rng.randint(8, 14) * 10
+            doc = {"category_id": pizzas["_id"], "name": _name(rng, _FLAVORS, index),
+                   "ingredients": ", ".join(rng.sample(_INGREDIENTS, 4))}
+            for step, field in enumerate(PIZZA_PRICE_FIELDS):
+                doc[field] = base + step * 40
+        else:
+            category = others[index % len(others)]
+            words = _DRINKS if category["name"] == "BEBIDAS" else _SIDES
+            doc = {"category_id": category["_id"], "name": _name(rng, words, index),
+                   "price": rng.randint(3, 12) * 10}
+            if category["name"] == "BEBIDAS":
+                doc["ml"] = rng.choice(["355", "600", "1000"])
+            else:
+                doc["grams"] = rng.choice(["150", "250", "400"])
+                doc["ingredients"] = ", ".join(rng.sample(_INGREDIENTS, 2))
+        doc["image"] = ""
+        doc["search_text"] = search_text(doc)
+        docs.append(doc)
+    for start in range(0, len(docs), BATCH_SIZE):
+        db.products.insert_many(docs[start:start + BATCH_SIZE])
+    # Lo que mantiene el CRUD de productos en app.py (dashboard)
+    for category in categories:
+        category["product_count"] = sum(1 for doc in docs if doc["category_id"] == category["_id"])
+        db.categories.update_one({"_id": category["_id"]}, {"$set": {"product_count": category["product_count"]}})
+    return categories, docs
+
+
+def _random_line(rng, book, pizza_ids, other_ids):
+    if pizza_ids and rng.random() < 0.6:
+        product_id = rng.choice(pizza_ids)
+        division = rng.random() < 0.3
+        return book.quote(
+            product_id,
+            quantity=rng.randint(1, 2),
+            size=rng.choice(SIZES),
+            division=division,
+            second_half_id=rng.choice(pizza_ids) if division else "",
+            orilla_queso=rng.random() < 0.3,
+        )
+    return book.quote(rng.choice(other_ids), quantity=rng.randint(1, 4))
+
+
+def generate_orders(db, categories, products, orders=1000, days=90, tables=13, seed=1, now=None):
+    """Inserta `orders` pedidos repartidos en los últimos `days` días y recalcula las ventas agregadas."""
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    book = PriceBook(products, {c["_id"]: c for c in categories})
+    pizza_category = categories[0]["_id"]
+    pizza_ids = [str(p["_id"]) for p in products if p["category_id"] == pizza_category]
+    other_ids = [str(p["_id"]) for p in products if p["category_id"] != pizza_category]
+    statuses, weights = zip(*_STATUSES)
+
+    batch = []
+    for _ in range(orders):
+        lines = [_random_line(rng, book, pizza_ids, other_ids) for _ in range(rng.randint(1, 5))]
+        created_at = now - timedelta(days=rng.random() * days)
+        batch.append({
+            "mesa_num": rng.randint(1, tables),
+            "items": [{
+                "product_id": line["product_id"],
+                "product_name": line["name"],
+                "category_name": line["category_name"],
+                "quantity": line["quantity"],
+                "price": from_cents(line["unit_cents"]),
+                "size": line["size"],
+                "division": line["division"],
+                "orilla_queso": line["orilla_queso"],
+                "orilla_queso_price": from_cents(line["orilla_queso_cents"]),
+                "second_half_id": line["second_half_id"],
+                "second_half_name": line["second_half_name"] or "",
+                "subtotal": from_cents(line["subtotal_cents"]),
+            } for line in lines],
+            "total": from_cents(sum(line["subtotal_cents"] for line in lines)),
+            "status": rng.choices(statuses, weights)[0],
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        if len(batch) == BATCH_SIZE:
+            db.orders.insert_many(batch)
+            batch = []
+    if batch:
+        db.orders.insert_many(batch)
+    rebuild_rollups([db.orders], db.daily_sales)
+
+
+def generate(db, products=60, orders=1000, days=90, tables=13, seed=1):
+    """Base completa: catálogo + historial. Borra lo que hubiera en `db`."""
+    for name in ("categories", "products", "orders", "carts", "daily_sales", "meta"):
+        db[name].drop()
+    categories, docs = generate_catalog(db, products=products, seed=seed)
+    generate_orders(db, categories, docs, orders=orders, days=days, tables=tables, seed=seed)
+    return categories, docs
@@ -0,0 +1,262 @@
+"""
+Prueba de carga: simula un servicio completo del restaurante sobre las rutas reales.
+
+    python -m bench.run --memory                      # base en memoria (requiere mongomock)
+    python -m bench.run --mongo-uri mongodb://localhost:27017/ --products 2000 --orders 200000
+    python -m bench.run --memory --out bench/baseline.json
+    python -m bench.run --memory --compare bench/baseline.json
+
+Cada mesa escanea su QR, navega categorías, agrega pizzas con opciones y
+bebidas, revisa el carrito y envía el pedido; mientras tanto una pantalla de
+cocina consulta /admin/orders. Se reportan p50/p95/p99, throughput y
+consultas a Mongo por ruta. Termina con error si alguna respuesta no fue 2xx
+(una ruta que falla rápido no es una mejora) y, con --compare, si el p95 de
+alguna ruta empeoró más que --tolerance.
+"""
+import argparse
+import json
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import g, request
+from pymongo import MongoClient
+
+import app as menu_app
+from bench.datagen import generate
+from indexes import ensure_indexes
+from metrics import CommandStats
+
+DEFAULT_DB = "mh_bench"
+
+
+class Recorder:
+    """Duración, consultas a Mongo y status de cada request, agrupados por ruta."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # "GET /category/<id>" -> [(segundos, consultas, status)]
+
+    def install(self, flask_app):
+        @flask_app.before_request
+        def _bench_start():
+            g.bench_start = time.perf_counter()
+
+        @flask_app.after_request
+        def _bench_record(response):
+            elapsed = time.perf_counter() - g.bench_start
+            rule = request.url_rule.rule if request.url_rule else request.path
+            key = f"{request.method} {rule}"
+            with self._lock:
+                self.samples.setdefault(key, []).append((elapsed, g.request_stats.commands, response.status_code))
+            return response
+
+    def total(self):
+        return sum(len(samples) for samples in self.samples.values())
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, wall_time, counts_queries):
+    routes = {}
+    for key, samples in sorted(recorder.samples.items()):
+        durations = sorted(s[0] * 1000 for s in samples)
+        routes[key] = {
+            "count": len(samples),
+            "p50_ms": round(percentile(durations, 0.50), 3),
+            "p95_ms": round(percentile(durations, 0.95), 3),
+            "p99_ms": round(percentile(durations, 0.99), 3),
+            "mean_ms": round(sum(durations) / len(durations), 3),
+            # mongomock no emite eventos de monitoreo: sin conteo en modo memoria
+            "mongo_ops": round(sum(s[1] for s in samples) / len(samples), 2) if counts_queries else None,
+            "errors": sum(1 for s in samples if not 200 <= s[2] < 300),
+        }
+    return {
+        "requests": recorder.total(),
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(recorder.total() / wall_time, 1) if wall_time else 0,
+        "routes": routes,
+    }
+
+
+def table_visit(flask_app, mesa_num, catalog, rng):
+    """Una visita completa de una mesa, del QR al pedido enviado."""
+    client = flask_app.test_client()
+    client.get(f"/mesa/{mesa_num}")
+    client.get("/mesa/estado")
+
+    pizzas = catalog["pizzas"]
+    client.get(f"/category/{catalog['pizza_category']}")
+    client.get(f"/category/{catalog['pizza_category']}/page/2")
+    for category_id in rng.sample(catalog["other_categories"], min(2, len(catalog["other_categories"]))):
+        client.get(f"/category/{category_id}")
+    client.get("/search", query_string={"q": rng.choice(["queso", "pollo", "coca", "hawai"])})
+
+    first, second = rng.sample(pizzas, 2)
+    client.post("/cart/add", data={
+        "product_id": first, "size": rng.choice(["chica", "mediana", "grande"]),
+        "division": "1", "second_half_id": second, "orilla_queso": "1",
+    })
+    client.post("/cart/add", data={"product_id": rng.choice(pizzas), "size": "individual"})
+    client.post("/cart/add", data={"product_id": rng.choice(catalog["others"]), "quantity": "2"})
+    client.get("/mesa/estado")
+    client.get("/cart")
+    client.get("/order/checkout")
+    client.post("/order/submit")
+
+
+def kitchen_screen(flask_app, stop, interval):
+    """Pantalla de cocina recargando la lista de pedidos."""
+    client = flask_app.test_client()
+    # Sesión de admin directa: el login responde 302 y contaría como error
+    with client.session_transaction() as sess:
+        sess["admin_logged_in"] = True
+    while not stop.is_set():
+        client.get("/admin/orders")
+        stop.wait(interval)
+
+
+def load_catalog(db):
+    pizza_category = db.categories.find_one({"name": "PIZZAS"})["_id"]
+    others = db.categories.find({"_id": {"$ne": pizza_category}}, {"_id": 1})
+    return {
+        "pizza_category": str(pizza_category),
+        "other_categories": [str(c["_id"]) for c in others],
+        "pizzas": [str(p["_id"]) for p in db.products.find({"category_id": pizza_category}, {"_id": 1})],
+        "others": [str(p["_id"]) for p in db.products.find({"category_id": {"$ne": pizza_category}}, {"_id": 1})],
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Rutas cuyo p95 empeoró más que `tolerance` (fracción) respecto a la línea base."""
+    regressions = []
+    for key, current in result["routes"].items():
+        previous = baseline["routes"].get(key)
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"]
+        # Menos de 1 ms de diferencia es ruido
+        if change > tolerance and current["p95_ms"] - previous["p95_ms"] > 1:
+            regressions.append((key, previous["p95_ms"], current["p95_ms"], change))
+    return regressions
+
+
+def print_report(result):
+    print(f"\n{result['requests']} requests en {result['wall_time_s']} s "
+          f"({result['throughput_rps']} req/s)\n")
+    print(f"{'ruta':<42}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'mongo':>7}{'errores':>9}")
+    for key, route in result["routes"].items():
+        ops = "-" if route["mongo_ops"] is None else route["mongo_ops"]
+        print(f"{key:<42}{route['count']:>6}{route['p50_ms']:>9}{route['p95_ms']:>9}{route['p99_ms']:>9}{ops:>7}"
+              f"{route['errors']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del menú")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--mongo-uri", default="mongodb://localhost:27017/", help="mongod local")
+    source.add_argument("--memory", action="store_true", help="Base en memoria (mongomock)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Base de datos de la prueba (se borra)")
+    parser.add_argument("--keep-data", action="store_true", help="No regenerar la base")
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--orders", type=int, default=2000, help="Pedidos históricos")
+    parser.add_argument("--days", type=int, default=90, help="Días de historial")
+    parser.add_argument("--tables", type=int, default=13, help="Mesas simultáneas")
+    parser.add_argument("--rounds", type=int, default=3, help="Visitas por mesa")
+    parser.add_argument("--kitchen-interval", type=float, default=0.5, help="Segundos entre recargas de cocina")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Guarda el resultado en JSON (línea base)")
+    parser.add_argument("--compare", help="JSON de línea base contra el cual comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento permitido del p95")
+    args = parser.parse_args()
+
+    if args.memory:
+        try:
+            import mongomock
+        except ImportError:
+            parser.error("--memory requiere mongomock: pip install -r bench/requirements.txt")
+        mongo_client = mongomock.MongoClient()
+    else:
+        mongo_client = MongoClient(args.mongo_uri, event_listeners=[
+            CommandStats(menu_app.current_request_stats, menu_app.request_metrics)])
+
+    db = mongo_client[args.db]
+    if not args.keep_data:
+        started = time.perf_counter()
+        generate(db, products=args.products, orders=args.orders, days=args.days,
+                 tables=args.tables, seed=args.seed)
+        print(f"Datos generados en {time.perf_counter() - started:.1f} s")
+    if not args.memory:
+        ensure_indexes(db)
+
+    menu_app.init_db(mongo_client, args.db)
+    menu_app.catalog_cache.invalidate()
+    menu_app.fragment_cache.clear()
+    flask_app = menu_app.app
+    flask_app.config["TESTING"] = True
+    recorder = Recorder()
+    recorder.install(flask_app)
+
+    catalog = load_catalog(db)
+    rng = random.Random(args.seed)
+    table_rngs = {mesa: random.Random(rng.random()) for mesa in range(1, args.tables + 1)}
+
+    def table_service(mesa):
+        # Las visitas de una mesa van en orden; las mesas corren en paralelo
+        for _round in range(args.rounds):
+            table_visit(flask_app, mesa, catalog, table_rngs[mesa])
+
+    stop = threading.Event()
+    kitchen = threading.Thread(target=kitchen_screen, args=(flask_app, stop, args.kitchen_interval), daemon=True)
+    started = time.perf_counter()
+    kitchen.start()
+    with ThreadPoolExecutor(max_workers=args.tables) as pool:
+        for _result in pool.map(table_service, table_rngs):
+            pass
+    stop.set()
+    kitchen.join()
+    wall_time = time.perf_counter() - started
+
+    result = summarize(recorder, wall_time, counts_queries=not args.memory)
+    result["meta"] = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "mongo": "memory" if args.memory else "mongod",
+        **{k: getattr(args, k) for k in ("products", "orders", "days", "tables", "rounds", "seed")},
+    }
+    print_report(result)
+
+    # Una corrida con errores no sirve de línea base ni de comparación
+    failed = {key: route["errors"] for key, route in result["routes"].items() if route["errors"]}
+    for key, errors in failed.items():
+        print(f"ERROR {key}: {errors} respuestas fuera de 2xx")
+    if failed:
+        raise SystemExit(1)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nResultado guardado en {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for key, before, after, change in regressions:
+            print(f"REGRESIÓN {key}: p95 {before} -> {after} ms (+{change:.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print(f"Sin regresiones contra {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
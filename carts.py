@@ -0,0 +1,247 @@
+"""
+Carritos del lado del servidor, uno por mesa.
+
+La cookie de sesión solo lleva la mesa y el id del carrito; las líneas viven
+aquí. Todas las personas de una misma mesa comparten el carrito. Al enviar el
+pedido el carrito se cierra y la mesa recibe un id nuevo.
+
+Hay dos implementaciones con la misma interfaz:
+- MemoryCartStore: en memoria con expiración (un solo proceso).
+- MongoCartStore: colección `carts`, para varios workers.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Nombres cortos con los que se guarda cada línea: campo -> (clave, valor por defecto)
+_LINE_FIELDS = {
+    "product_id": ("p", ""),
+    "name": ("n", ""),
+    "price": ("u", 0),
+    "size": ("s", ""),
+    "division": ("d", False),
+    "orilla_queso": ("o", False),
+    "orilla_queso_price": ("op", 0),
+    "second_half_id": ("h", None),
+    "second_half_name": ("hn", None),
+    "quantity": ("q", 0),
+}
+
+
+def compact_line(item):
+    """Línea del carrito en su forma compacta (sin valores por defecto)."""
+    line = {}
+    for field, (key, default) in _LINE_FIELDS.items():
+        value = item.get(field, default)
+        if value != default or field == "quantity":
+            line[key] = value
+    return line
+
+
+def expand_line(line):
+    """Línea compacta -> dict con los nombres que usan las rutas y templates."""
+    item = {field: line.get(key, default) for field, (key, default) in _LINE_FIELDS.items()}
+    item["subtotal"] = item["price"] * item["quantity"]
+    return item
+
+
+def item_count(cart):
+    """Piezas del carrito (suma de cantidades): lo que muestra el contador de la mesa."""
+    return sum(item["quantity"] for item in cart.values())
+
+
+def _new_cart_id():
+    return uuid.uuid4().hex[:16]
+
+
+def _line_field(cart_key):
+    """Ruta del campo de una línea; None si la clave no es segura para Mongo."""
+    if not cart_key or "." in cart_key or cart_key.startswith("$"):
+        return None
+    return f"lines.{cart_key}"
+
+
+class MemoryCartStore:
+    """Carritos en memoria; los que no se tocan en `ttl` segundos se descartan."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables = {}  # mesa -> cart_id abierto
+        self._carts = {}  # cart_id -> {"mesa_num", "lines", "expires"}
+        self._next_sweep = time.monotonic() + ttl
+
+    def _sweep(self, now):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.ttl
+        for cart_id in [cid for cid, cart in self._carts.items() if cart["expires"] <= now]:
+            self._drop(cart_id)
+
+    def _drop(self, cart_id):
+        cart = self._carts.pop(cart_id, None)
+        if cart and self._tables.get(cart["mesa_num"]) == cart_id:
+            del self._tables[cart["mesa_num"]]
+
+    def _cart(self, cart_id):
+        """Carrito vivo (renovando su expiración) o None. Llamar con el lock tomado."""
+        now = time.monotonic()
+        self._sweep(now)
+        cart = self._carts.get(cart_id)
+        if cart is None:
+            return None
+        if cart["expires"] <= now:
+            self._drop(cart_id)
+            return None
+        cart["expires"] = now + self.ttl
+        return cart
+
+    def cart_id_for_table(self, mesa_num):
+        with self._lock:
+            cart_id = self._tables.get(mesa_num)
+            if cart_id and self._cart(cart_id):
+                return cart_id
+            cart_id = _new_cart_id()
+            self._tables[mesa_num] = cart_id
+            self._carts[cart_id] = {
+                "mesa_num": mesa_num,
+                "lines": OrderedDict(),
+                "expires": time.monotonic() + self.ttl,
+            }
+            return cart_id
+
+    def get(self, cart_id):
+        with self._lock:
+            cart = self._cart(cart_id)
+            lines = dict(cart["lines"]) if cart else {}
+        return {key: expand_line(line) for key, line in lines.items()}
+
+    def add_line(self, cart_id, cart_key, item):
+        """Suma la cantidad si la línea existe; si no, la agrega."""
+        with self._lock:
+            cart = self._cart(cart_id)
+            if cart is None:
+                return None
+            line = cart["lines"].get(cart_key)
+            if line:
+                cart["lines"][cart_key] = dict(line, q=line["q"] + item["quantity"])
+            else:
+                cart["lines"][cart_key] = compact_line(item)
+        return self.get(cart_id)
+
+    def set_quantity(self, cart_id, cart_key, quantity):
+        with self._lock:
+            cart = self._cart(cart_id)
+            if cart is None or cart_key not in cart["lines"]:
+                return None
+            cart["lines"][cart_key] = dict(cart["lines"][cart_key], q=quantity)
+        return self.get(cart_id)
+
+    def remove(self, cart_id, cart_key):
+        with self._lock:
+            cart = self._cart(cart_id)
+            if cart:
+                cart["lines"].pop(cart_key, None)
+
+    def clear(self, cart_id):
+        with self._lock:
+            cart = self._cart(cart_id)
+            if cart:
+                cart["lines"].clear()
+
+    def close(self, cart_id):
+        """Cierra el carrito tras enviar el pedido; la mesa recibirá uno nuevo."""
+        with self._lock:
+            self._drop(cart_id)
+
+
+class MongoCartStore:
+    """Carritos en la colección `carts`; los cambios de cantidad son $inc atómicos.
+
+    Los carritos abandonados los borra el índice TTL sobre `updated_at`
+    (ver indexes.py).
+    """
+
+    def __init__(self, collection):
+        self.col = collection
+
+    def cart_id_for_table(self, mesa_num):
+        for _attempt in range(2):
+            try:
+                cart = self.col.find_one_and_update(
+                    {"mesa_num": mesa_num, "open": True},
+                    {
+                        "$set": {"updated_at": datetime.now()},
+                        "$setOnInsert": {"_id": _new_cart_id(), "lines": {}},
+                    },
+                    upsert=True,
+                    projection={"_id": 1},
+                    return_document=ReturnDocument.AFTER,
+                )
+                return cart["_id"]
+            except DuplicateKeyError:
+                # Otra petición de la misma mesa creó el carrito al mismo tiempo
+                continue
+        raise RuntimeError(f"No se pudo abrir el carrito de la mesa {mesa_num}")
+
+    def get(self, cart_id):
+        cart = self.col.find_one({"_id": cart_id, "open": True}, {"lines": 1})
+        lines = cart.get("lines", {}) if cart else {}
+        return {key: expand_line(line) for key, line in lines.items()}
+
+    def add_line(self, cart_id, cart_key, item):
+        field = _line_field(cart_key)
+        if field is None:
+            return None
+        now = datetime.now()
+        while True:
+            # La línea ya existe: incremento atómico de la cantidad
+            result = self.col.update_one(
+                {"_id": cart_id, "open": True, field: {"$exists": True}},
+                {"$inc": {f"{field}.q": item["quantity"]}, "$set": {"updated_at": now}},
+            )
+            if result.matched_count:
+                break
+            # Línea nueva; si otra petición la creó primero, se reintenta el $inc
+            result = self.col.update_one(
+                {"_id": cart_id, "open": True, field: {"$exists": False}},
+                {"$set": {field: compact_line(item), "updated_at": now}},
+            )
+            if result.matched_count:
+                break
+            if not self.col.count_documents({"_id": cart_id, "open": True}, limit=1):
+                return None
+        return self.get(cart_id)
+
+    def set_quantity(self, cart_id, cart_key, quantity):
+        field = _line_field(cart_key)
+        if field is None:
+            return None
+        result = self.col.update_one(
+            {"_id": cart_id, "open": True, field: {"$exists": True}},
+            {"$set": {f"{field}.q": quantity, "updated_at": datetime.now()}},
+        )
+        return self.get(cart_id) if result.matched_count else None
+
+    def remove(self, cart_id, cart_key):
+        field = _line_field(cart_key)
+        if field is None:
+            return
+        self.col.update_one(
+            {"_id": cart_id, "open": True},
+            {"$unset": {field: ""}, "$set": {"updated_at": datetime.now()}},
+        )
+
+    def clear(self, cart_id):
+        self.col.update_one(
+            {"_id": cart_id, "open": True},
+            {"$set": {"lines": {}, "updated_at": datetime.now()}},
+        )
+
+    def close(self, cart_id):
+        self.col.update_one({"_id": cart_id}, {"$set": {"open": False, "updated_at": datetime.now()}})
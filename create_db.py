@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 import os
+from indexes import ensure_indexes
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 client = MongoClient(MONGO_URI)
@@ -11,11 +12,14 @@ cats.delete_many({})
 
 # Asegúrate de tener imágenes de muestra en static/uploads
 sample = [
-    {"name": "BEBIDAS", "description": "Refresca tu paladar.", "order": 1, "image": "/static/uploads/bebidas.jpg"},
-    {"name": "PIZZAS", "description": "Nuestras mejores pizzas.", "order": 2, "image": "/static/uploads/pizzas.jpg"},
-    {"name": "COMPLEMENTOS", "description": "Papas, alitas y más.", "order": 3, "image": "/static/uploads/complementos.jpg"},
-    {"name": "ESPECIALIDADES", "description": "Creaciones únicas del chef.", "order": 4, "image": "/static/uploads/especialidades.jpg"},
+    {"name": "BEBIDAS", "description": "Refresca tu paladar.", "order": 1, "image": "/static/uploads/bebidas.jpg", "product_count": 0},
+    {"name": "PIZZAS", "description": "Nuestras mejores pizzas.", "order": 2, "image": "/static/uploads/pizzas.jpg", "product_count": 0},
+    {"name": "COMPLEMENTOS", "description": "Papas, alitas y más.", "order": 3, "image": "/static/uploads/complementos.jpg", "product_count": 0},
+    {"name": "ESPECIALIDADES", "description": "Creaciones únicas del chef.", "order": 4, "image": "/static/uploads/especialidades.jpg", "product_count": 0},
 ]
 
 cats.insert_many(sample)
 print("Datos iniciales insertados en mh.categories")
+
+ensure_indexes(db)
+print("Índices creados")
@@ -0,0 +1,116 @@
+"""
+Exportación de pedidos en CSV o JSONL, en streaming.
+
+Todo son generadores: los pedidos salen de los cursores de Mongo (ver
+archive.find_orders) en lotes de `EXPORT_BATCH_SIZE`, se escriben en bloques
+de texto y, si se pide, se comprimen con gzip sobre la marcha. La memoria no
+depende del rango exportado y la descarga empieza con el primer bloque.
+"""
+import csv
+import io
+import json
+import zlib
+
+from archive import find_orders
+
+EXPORT_BATCH_SIZE = 1000
+CHUNK_ROWS = 500  # filas por bloque enviado
+
+CSV_COLUMNS = ["id", "fecha", "mesa", "estado", "productos", "piezas", "total", "detalle"]
+
+# Solo lo que se exporta; los campos internos (llave de idempotencia, carrito) se quedan
+EXPORT_PROJECTION = {
+    "mesa_num": 1, "status": 1, "total": 1, "created_at": 1, "updated_at": 1, "status_times": 1,
+    "items.product_id": 1, "items.product_name": 1, "items.category_name": 1, "items.quantity": 1,
+    "items.size": 1, "items.price": 1, "items.subtotal": 1, "items.orilla_queso": 1,
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def export_query(start, end, statuses=None):
+    query = {"created_at": {"$gte": start, "$lt": end}}
+    if statuses:
+        query["status"] = {"$in": list(statuses)}
+    return query
+
+
+def iter_orders(orders_col, db, start, end, statuses=None):
+    """Pedidos de `orders` y del archivo creados en [start, end), en orden."""
+    return find_orders(orders_col, db, export_query(start, end, statuses), EXPORT_PROJECTION,
+                       start=start, end=end, batch_size=EXPORT_BATCH_SIZE)
+
+
+def _item_label(item):
+    size = f" ({item['size']})" if item.get("size") else ""
+    return f"{item.get('quantity', 0)}x {item.get('product_name', '')}{size}"
+
+
+def csv_chunks(orders):
+    """Una fila por pedido; `detalle` resume los productos."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for count, order in enumerate(orders, start=1):
+        items = order.get("items", [])
+        writer.writerow([
+            str(order["_id"]),
+            order["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
+            order.get("mesa_num", ""),
+            order.get("status", ""),
+            len(items),
+            sum(item.get("quantity", 0) for item in items),
+            f"{float(order.get('total') or 0):.2f}",
+            "; ".join(_item_label(item) for item in items),
+        ])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat(timespec="seconds")
+    return str(value)  # ObjectId
+
+
+def jsonl_chunks(orders):
+    """Un pedido completo (con sus productos) por línea."""
+    lines = []
+    for order in orders:
+        lines.append(json.dumps(order, default=_json_default, ensure_ascii=False))
+        if len(lines) == CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def encode_chunks(chunks, gzip=False):
+    """Texto -> bytes UTF-8, comprimidos con gzip bloque a bloque si se pide."""
+    if not gzip:
+        for chunk in chunks:
+            yield chunk.encode("utf-8")
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_orders(orders_col, db, start, end, statuses=None, fmt="csv", gzip=False):
+    """Generador de bytes con los pedidos de [start, end) en `fmt`."""
+    orders = iter_orders(orders_col, db, start, end, statuses)
+    chunks = csv_chunks(orders) if fmt == "csv" else jsonl_chunks(orders)
+    return encode_chunks(chunks, gzip)
+
+
+def export_filename(start, last_day, fmt, gzip=False):
+    return f"pedidos_{start:%Y-%m-%d}_{last_day:%Y-%m-%d}.{fmt}{'.gz' if gzip else ''}"
@@ -1,40 +1,48 @@
 """
-Script para generar todos los códigos QR de las 13 mesas
-Ejecutar: python generate_all_qr.py
+Script para generar los códigos QR de todas las mesas
+Ejecutar: python generate_all_qr.py [--base-url URL] [--mesas N] [--hoja]
+
+Usa el mismo generador que la app (qr.py) y reparte las mesas en varios
+procesos. Con --hoja además escribe qr_mesas.pdf para imprimir.
 """
-import qrcode
+import argparse
 import os
-from flask import Flask
-
-app = Flask(__name__)
-app.config['SERVER_NAME'] = 'localhost:5000'  # Ajustar según tu configuración
-
-# Crear directorio para QR codes si no existe
-qr_dir = "static/qr_codes"
-os.makedirs(qr_dir, exist_ok=True)
-
-# URL base (ajustar según tu configuración)
-base_url = "http://localhost:5000"  # Cambiar por tu URL de producción
-
-print("Generando códigos QR para las 13 mesas...")
-
-for mesa_num in range(1, 14):
-    mesa_url = f"{base_url}/mesa/{mesa_num}"
-    
-    # Generar QR
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(mesa_url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Guardar imagen
-    filename = f"{qr_dir}/mesa_{mesa_num}.png"
-    img.save(filename)
-    
-    print(f"✓ QR generado para Mesa {mesa_num}: {filename}")
-    print(f"  URL: {mesa_url}")
-
-print("\n¡Todos los códigos QR han sido generados!")
-print(f"Los archivos están en: {qr_dir}/")
 
+from dotenv import load_dotenv
+
+from qr import generate_all, qr_sheet, table_url
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera los códigos QR de las mesas")
+    parser.add_argument("--base-url", default=os.getenv("QR_BASE_URL") or "http://localhost:5000",
+                        help="URL pública del menú (por defecto QR_BASE_URL)")
+    parser.add_argument("--mesas", type=int, default=int(os.getenv("TABLE_COUNT", "13")),
+                        help="Número de mesas (por defecto TABLE_COUNT)")
+    parser.add_argument("--salida", default="static/qr_codes", help="Carpeta de salida")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo")
+    parser.add_argument("--hoja", action="store_true", help="Genera también la hoja PDF para imprimir")
+    args = parser.parse_args()
+    if args.mesas < 1:
+        parser.error("--mesas debe ser al menos 1")
+
+    tables = range(1, args.mesas + 1)
+    print(f"Generando códigos QR para las {args.mesas} mesas...")
+    for mesa_num, path in generate_all(args.base_url, tables, args.salida, workers=args.procesos):
+        print(f"✓ QR generado para Mesa {mesa_num}: {path}")
+        print(f"  URL: {table_url(args.base_url, mesa_num)}")
+
+    if args.hoja:
+        sheet_path = os.path.join(args.salida, "qr_mesas.pdf")
+        with open(sheet_path, "wb") as f:
+            f.write(qr_sheet(args.base_url, tables, "pdf"))
+        print(f"✓ Hoja para imprimir: {sheet_path}")
+
+    print("\n¡Todos los códigos QR han sido generados!")
+    print(f"Los archivos están en: {args.salida}/")
+
+
+if __name__ == "__main__":
+    main()
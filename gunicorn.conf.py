@@ -0,0 +1,38 @@
+"""
+Configuración de gunicorn para producción (`gunicorn -c gunicorn.conf.py wsgi:app`).
+
+Cada worker importa la app después del fork (sin preload) y crea su propio
+cliente de Mongo y sus watchers en create_app().
+
+Límite del SSE: cada pantalla de cocina conectada a /admin/orders/stream
+ocupa un hilo del worker mientras está abierta. Por eso cada worker tiene
+GUNICORN_THREADS hilos para los requests normales (menú, carrito, el sondeo
+de /mesa/estado) más KITCHEN_SCREENS hilos para pantallas. El balanceador
+puede mandar todas las pantallas al mismo worker, así que KITCHEN_SCREENS es
+el total de pantallas del restaurante, no por worker. Con más pantallas que
+eso, las sobrantes ocupan los hilos de los requests normales. Si el stream lo
+sirve el modo async (asgi.py, ver README), usa KITCHEN_SCREENS=0.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# create_app() valida con el número real que la configuración sirve para varios workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "gthread"
+kitchen_screens = int(os.getenv("KITCHEN_SCREENS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "8")) + kitchen_screens
+preload_app = False
+
+# Un request normal no debería tardar más; los SSE mandan keep-alive cada 15 s
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 20
+keepalive = 5
+
+# Recicla workers de vez en cuando para acotar el crecimiento de memoria
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
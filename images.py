@@ -0,0 +1,79 @@
+"""
+Variantes responsivas de las imágenes subidas desde el admin.
+
+Por cada imagen se generan varios anchos en WebP y en JPEG (respaldo para
+navegadores sin WebP), sin metadatos EXIF. Los templates las usan con
+`srcset` para que los teléfonos descarguen solo el tamaño que van a mostrar.
+"""
+import os
+import re
+
+from PIL import Image, ImageOps
+
+VARIANT_WIDTHS = [320, 640, 1024]
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Archivos generados por este módulo: foto_w320.webp, foto_w640.jpg, ...
+VARIANT_RE = re.compile(r"_w\d+\.(webp|jpg)$")
+
+
+def is_variant(filename):
+    return bool(VARIANT_RE.search(filename))
+
+
+def variant_filename(filename, width, ext):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_w{width}.{ext}"
+
+
+def _variant_widths(width):
+    """Anchos menores al original (sin repetir uno casi igual) más el mayor posible."""
+    widths = [w for w in VARIANT_WIDTHS if w < width * 0.9]
+    return sorted(set(widths) | {min(width, VARIANT_WIDTHS[-1])})
+
+
+def _display_width(image):
+    """Ancho ya aplicada la rotación del EXIF, leyendo solo la cabecera."""
+    orientation = image.getexif().get(0x0112)
+    return image.height if orientation in (5, 6, 7, 8) else image.width
+
+
+def make_variants(source_path):
+    """Genera las variantes junto al archivo original.
+
+    Devuelve {"webp": [[ancho, archivo], ...], "jpeg": [...]} con los nombres
+    de archivo (sin carpeta), de menor a mayor ancho. Si todas las variantes
+    ya existen (misma imagen subida otra vez) no se vuelve a procesar.
+    """
+    directory, filename = os.path.split(source_path)
+    with Image.open(source_path) as original:
+        widths = _variant_widths(_display_width(original))
+        variants = {
+            "webp": [[width, variant_filename(filename, width, "webp")] for width in widths],
+            "jpeg": [[width, variant_filename(filename, width, "jpg")] for width in widths],
+        }
+        names = [name for items in variants.values() for _width, name in items]
+        if all(os.path.exists(os.path.join(directory, name)) for name in names):
+            return variants
+
+        # Aplica la rotación del EXIF antes de descartarlo
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        for (width, webp_name), (_width, jpeg_name) in zip(variants["webp"], variants["jpeg"]):
+            resized = image
+            if width < image.width:
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.LANCZOS)
+
+            resized.save(os.path.join(directory, webp_name), "WEBP", quality=WEBP_QUALITY, method=4)
+
+            # JPEG no tiene transparencia: se aplana sobre fondo blanco
+            if resized.mode == "RGBA":
+                flat = Image.new("RGB", resized.size, (255, 255, 255))
+                flat.paste(resized, mask=resized.split()[-1])
+                resized = flat
+            resized.save(os.path.join(directory, jpeg_name), "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return variants
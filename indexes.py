@@ -0,0 +1,105 @@
+"""
+Índices de MongoDB y auditoría de consultas.
+
+Cada índice está pensado para una forma de consulta concreta de app.py. Si
+agregas una consulta nueva, declárala en QUERY_SHAPES para que
+`flask audit-queries` la revise con explain().
+"""
+import os
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Tiempo que un carrito sin cambios sobrevive (también lo usa MongoCartStore)
+CART_TTL_SECONDS = int(os.getenv("CART_TTL_SECONDS", "14400"))
+
+INDEXES = {
+    "categories": [
+        # Menú y navbar: find().sort("order")
+        IndexModel([("order", ASCENDING)], name="order"),
+    ],
+    "products": [
+        # manage_products: find({"category_id"}).sort("name", "_id"), el mismo orden
+        # estable que usan el catálogo y el cursor de "Ver más" (pagination.py)
+        IndexModel([("category_id", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="category_name"),
+    ],
+    "orders": [
+        # admin_orders / admin_dashboard / admin_cash: por estado y fecha
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        # admin_cash con todos los estados y últimos pedidos del dashboard
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        # Modo async sin change streams: pedidos modificados desde el último sondeo
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        # submit_order: una llave de idempotencia ("<mesa>:<llave>") crea un solo pedido
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key", unique=True,
+                   partialFilterExpression={"idempotency_key": {"$exists": True}}),
+    ],
+    "carts": [
+        # Un solo carrito abierto por mesa (cart_id_for_table)
+        IndexModel([("mesa_num", ASCENDING)], name="open_table", unique=True,
+                   partialFilterExpression={"open": True}),
+        # Carritos abandonados o cerrados se borran solos
+        IndexModel([("updated_at", ASCENDING)], name="ttl", expireAfterSeconds=CART_TTL_SECONDS),
+    ],
+}
+
+# (nombre, colección, filtro, orden, recorrido completo esperado)
+QUERY_SHAPES = [
+    ("catalogo: categorías", "categories", {}, [("order", 1)], False),
+    ("catalogo: productos", "products", {}, [("name", 1), ("_id", 1)], True),
+    ("dashboard: buscar categorías", "categories", {"name": {"$regex": "pizza", "$options": "i"}}, [("order", 1)], False),
+    ("manage_products", "products", {"category_id": None}, [("name", 1), ("_id", 1)], False),
+    ("resolve_products", "products", {"_id": {"$in": []}}, None, False),
+    ("dashboard: últimos productos", "products", {}, [("_id", -1)], False),
+    ("dashboard: últimos pedidos", "orders", {}, [("created_at", -1)], False),
+    ("admin_orders: activos", "orders", {"status": {"$in": ["pendiente", "en_preparacion", "listo"]}}, [("created_at", -1)], False),
+    ("admin_orders: completados", "orders", {"status": "completado", "created_at": {"$gte": None}}, [("created_at", -1)], False),
+    ("admin_cash: completados", "orders", {"status": "completado", "created_at": {"$gte": None, "$lt": None}}, [("created_at", 1)], False),
+    ("submit_order: reintento", "orders", {"idempotency_key": "1:cart:0"}, None, False),
+    ("cambio de estado por mesa", "orders", {"mesa_num": 1, "status": {"$in": ["pendiente"]}}, None, False),
+    ("carrito de la mesa", "carts", {"mesa_num": 1, "open": True}, None, False),
+    ("admin_cash: todos", "orders", {"created_at": {"$gte": None, "$lt": None}}, [("created_at", 1)], False),
+    ("modo async: pedidos modificados", "orders", {"updated_at": {"$gt": None}}, [("updated_at", 1)], False),
+    ("modo async: categorías sin imagen", "categories", {"image": {"$in": ["", None]}}, None, True),
+    ("reportes de ventas", "daily_sales", {"_id": {"$gte": "2026-01-01", "$lt": "2026-02-01"}}, [("_id", 1)], False),
+]
+
+
+def ensure_indexes(db):
+    """Crea los índices declarados; es idempotente."""
+    for collection, models in INDEXES.items():
+        db[collection].create_indexes(models)
+
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [s for s in stages if s]
+
+
+def audit_queries(db, sample_values):
+    """Corre explain() sobre cada forma de consulta.
+
+    `sample_values` reemplaza los None de los filtros (ids y fechas de
+    ejemplo). Devuelve [(nombre, etapas, ok)].
+    """
+    report = []
+    for name, collection, query_filter, sort, full_scan in QUERY_SHAPES:
+        command = {"find": collection, "filter": _fill(query_filter, sample_values)}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        report.append((name, stages, full_scan or "COLLSCAN" not in stages))
+    return report
+
+
+def _fill(value, sample_values, key=None):
+    if isinstance(value, dict):
+        return {k: _fill(v, sample_values, k) for k, v in value.items()}
+    if value is None:
+        return sample_values[key]
+    return value
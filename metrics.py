@@ -0,0 +1,170 @@
+"""
+Métricas por ruta: tiempo total, tiempo en Mongo, tiempo de render y
+comandos enviados a Mongo por request.
+
+Todo se acumula en histogramas en memoria del proceso y se exporta en el
+formato de texto de Prometheus (ver /admin/metrics en app.py).
+"""
+import threading
+
+from pymongo import monitoring
+
+# Límites de los buckets (segundos) de los histogramas de tiempo
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Límites de los buckets de comandos a Mongo por request
+COMMAND_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """Lo que le pasó a un request; vive en `flask.g` mientras se atiende."""
+
+    __slots__ = ("start", "db_time", "render_time", "commands", "documents", "by_command")
+
+    def __init__(self, start):
+        self.start = start
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.commands = 0
+        self.documents = 0
+        self.by_command = {}  # nombre -> cantidad
+
+
+def _documents_returned(command_name, reply):
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "findAndModify" and reply.get("value") is not None:
+        return 1
+    return 0
+
+
+class CommandStats(monitoring.CommandListener):
+    """Atribuye cada comando de Mongo al request en curso.
+
+    `current` es una función que devuelve el RequestStats del request actual
+    (o None fuera de un request). pymongo llama a los listeners en el mismo
+    hilo que ejecuta la consulta.
+    """
+
+    def __init__(self, current, registry):
+        self.current = current
+        self.registry = registry
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, _documents_returned(event.command_name, event.reply))
+
+    def failed(self, event):
+        self._record(event, 0)
+
+    def _record(self, event, documents):
+        seconds = event.duration_micros / 1e6
+        self.registry.observe_command(event.command_name, seconds)
+        stats = self.current()
+        if stats is None:
+            return
+        stats.db_time += seconds
+        stats.commands += 1
+        stats.documents += documents
+        stats.by_command[event.command_name] = stats.by_command.get(event.command_name, 0) + 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Histogramas por ruta y contadores por comando de Mongo."""
+
+    _ROUTE_HISTOGRAMS = (
+        ("http_request_duration_seconds", "Tiempo total del request", TIME_BUCKETS),
+        ("http_request_db_seconds", "Tiempo en comandos de Mongo por request", TIME_BUCKETS),
+        ("http_request_render_seconds", "Tiempo renderizando templates por request", TIME_BUCKETS),
+        ("http_request_mongo_commands", "Comandos de Mongo por request", COMMAND_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}  # (método, ruta) -> {nombre: Histogram}
+        self._responses = {}  # (método, ruta, status) -> cantidad
+        self._documents = {}  # (método, ruta) -> documentos devueltos por Mongo
+        self._commands = {}  # comando -> [cantidad, segundos]
+
+    def observe_request(self, method, route, status, wall_time, stats):
+        key = (method, route)
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = {
+                    name: Histogram(buckets) for name, _help, buckets in self._ROUTE_HISTOGRAMS
+                }
+            histograms["http_request_duration_seconds"].observe(wall_time)
+            histograms["http_request_db_seconds"].observe(stats.db_time)
+            histograms["http_request_render_seconds"].observe(stats.render_time)
+            histograms["http_request_mongo_commands"].observe(stats.commands)
+            self._responses[(method, route, status)] = self._responses.get((method, route, status), 0) + 1
+            self._documents[key] = self._documents.get(key, 0) + stats.documents
+
+    def observe_command(self, command_name, seconds):
+        with self._lock:
+            counters = self._commands.setdefault(command_name, [0, 0.0])
+            counters[0] += 1
+            counters[1] += seconds
+
+    def prometheus(self):
+        """Todas las métricas en formato de texto de Prometheus."""
+        with self._lock:
+            out = []
+            for name, help_text, _buckets in self._ROUTE_HISTOGRAMS:
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} histogram")
+                for (method, route), histograms in sorted(self._routes.items()):
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    out.extend(histograms[name].lines(name, labels))
+
+            out.append("# HELP http_requests_total Requests atendidos por ruta y status")
+            out.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self._responses.items()):
+                out.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+            out.append("# HELP mongo_documents_returned_total Documentos devueltos por Mongo por ruta")
+            out.append("# TYPE mongo_documents_returned_total counter")
+            for (method, route), count in sorted(self._documents.items()):
+                out.append(f'mongo_documents_returned_total{{method="{method}",route="{_escape(route)}"}} {count}')
+
+            out.append("# HELP mongo_commands_total Comandos enviados a Mongo")
+            out.append("# TYPE mongo_commands_total counter")
+            for command, (count, _seconds) in sorted(self._commands.items()):
+                out.append(f'mongo_commands_total{{command="{command}"}} {count}')
+            out.append("# HELP mongo_command_seconds_total Tiempo acumulado por comando de Mongo")
+            out.append("# TYPE mongo_command_seconds_total counter")
+            for command, (_count, seconds) in sorted(self._commands.items()):
+                out.append(f'mongo_command_seconds_total{{command="{command}"}} {seconds:.6f}')
+        return "\n".join(out) + "\n"
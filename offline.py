@@ -0,0 +1,75 @@
+"""
+Menú sin conexión: la foto del catálogo que usa el service worker.
+
+El service worker (static/js/sw.js) descarga una vez `/menu/catalog.json`
+con las categorías, los productos, sus precios y sus imágenes, y precachea
+el shell (CSS/JS), la página /offline y las miniaturas. Cuando una página
+del menú no está en su caché y no hay red, /offline arma la categoría y su
+paginación en el navegador con esta misma foto (static/js/offline.js).
+
+La foto solo cambia con la versión del catálogo, así que se genera una vez
+por versión y se guarda serializada en la caché de fragmentos.
+"""
+from pricing import PIZZA_PRICE_FIELDS, SIZES, format_price
+
+PIZZA_CATEGORY = "PIZZAS"
+
+
+def thumbnail(item):
+    """La variante JPEG más chica de la imagen, o la imagen original."""
+    variants = item.get("image_variants")
+    if variants and variants.get("src") == item.get("image") and variants.get("jpeg"):
+        return min(variants["jpeg"])[1]
+    return item.get("image") or None
+
+
+def _product_doc(product, is_pizza):
+    doc = {
+        "id": str(product["_id"]),
+        "name": product.get("name", ""),
+        "image": thumbnail(product),
+    }
+    for field in ("ingredients", "ml", "grams"):
+        if product.get(field):
+            doc[field] = product[field]
+    if is_pizza:
+        # Tamaño -> precio para mostrar, en el orden de SIZES
+        doc["prices"] = {
+            size: format_price(product[field])
+            for size, field in zip(SIZES, PIZZA_PRICE_FIELDS)
+            if product.get(field)
+        }
+    else:
+        doc["price"] = format_price(product.get("price"))
+    return doc
+
+
+def catalog_snapshot(categories, products_by_category, version, per_page, orilla_prices, category_url):
+    """Documento JSON del catálogo completo, en el orden en que lo muestra el menú.
+
+    `version` es el prefijo del ETag de las páginas del menú: el service
+    worker reutiliza una página guardada mientras su ETag empiece igual.
+    `category_url(id)` da la URL de cada categoría.
+    """
+    snapshot = {"version": version, "per_page": per_page, "orilla_prices": orilla_prices, "categories": []}
+    for category in categories:
+        is_pizza = category.get("name", "").upper() == PIZZA_CATEGORY
+        products = products_by_category.get(category["_id"], [])
+        snapshot["categories"].append({
+            "id": str(category["_id"]),
+            "name": category.get("name", ""),
+            "url": category_url(str(category["_id"])),
+            "image": thumbnail(category),
+            "pizza": is_pizza,
+            "products": [_product_doc(product, is_pizza) for product in products],
+        })
+    return snapshot
+
+
+def snapshot_images(snapshot):
+    """Miniaturas que el service worker precachea junto con la foto."""
+    images = []
+    for category in snapshot["categories"]:
+        images.append(category["image"])
+        images.extend(product["image"] for product in category["products"])
+    return sorted({image for image in images if image})
@@ -0,0 +1,135 @@
+"""
+Canal de eventos de pedidos para las pantallas de cocina (Server-Sent Events).
+
+Los eventos se publican en un bus en proceso con historial corto. Cada
+pantalla conectada solo espera sobre la misma Condition hasta que llega algo
+nuevo, así que no hace falta un hilo de fondo por cliente.
+
+Los ids de los eventos llevan el prefijo del proceso (`3f9a1c2e-41`): una
+pantalla que reconecta a otro worker no puede reanudar con números que allá
+significan otros eventos, recibe `reset` y recarga.
+"""
+import asyncio
+import collections
+import json
+import threading
+import uuid
+
+
+class OrderFeed:
+    """Pub/sub en proceso con ids crecientes para reanudar con Last-Event-ID."""
+
+    def __init__(self, history=256):
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=history)
+        self._last_id = 0
+        # True mientras un change stream de Mongo (o el sondeo) alimenta el canal
+        self.external = False
+        self.instance = uuid.uuid4().hex[:8]
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data):
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._cond.notify_all()
+            return self._last_id
+
+    def event_id(self, local_id):
+        """Id que ve la pantalla: prefijo del proceso y número local."""
+        return f"{self.instance}-{local_id}"
+
+    def resume_point(self, event_id):
+        """Número local desde donde seguir a una pantalla; None si debe recargar.
+
+        Sin id, desde el último evento. Un id de otro proceso, inválido o que ya
+        salió del historial devuelve None.
+        """
+        if not event_id:
+            return self._last_id
+        instance, _, local_id = event_id.partition("-")
+        if instance != self.instance or not local_id.isdigit():
+            return None
+        local_id = int(local_id)
+        return local_id if self.can_resume(local_id) else None
+
+    def can_resume(self, last_id):
+        """False si el cliente se perdió eventos que ya salieron del historial."""
+        if last_id > self._last_id:
+            return False
+        oldest = self._events[0][0] if self._events else self._last_id + 1
+        return last_id >= oldest - 1
+
+    def wait(self, last_id, timeout):
+        """Eventos posteriores a `last_id`; bloquea hasta `timeout` si no hay."""
+        with self._cond:
+            if self._last_id <= last_id:
+                self._cond.wait(timeout)
+            return [event for event in self._events if event[0] > last_id]
+
+
+class AsyncOrderFeed(OrderFeed):
+    """El mismo canal para el modo ASGI (asgi.py): las pantallas esperan con asyncio.
+
+    Hay que publicar desde el event loop que atiende a las pantallas.
+    """
+
+    def __init__(self, history=256):
+        super().__init__(history)
+        self._changed = asyncio.Event()
+
+    def publish(self, event_type, data):
+        event_id = super().publish(event_type, data)
+        # Despierta a todos los que esperan; la siguiente espera usa un Event nuevo
+        self._changed.set()
+        self._changed = asyncio.Event()
+        return event_id
+
+    async def wait_async(self, last_id, timeout):
+        """Como wait(), sin bloquear el hilo del event loop."""
+        if self._last_id <= last_id:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return [event for event in self._events if event[0] > last_id]
+
+
+def format_sse(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def polled_event(order):
+    """(tipo, datos) de un pedido encontrado al sondear por `updated_at`."""
+    # Un pedido recién creado tiene updated_at == created_at
+    created = order.get("updated_at") == order.get("created_at")
+    return "order_created" if created else "order_status", order_event_data(order)
+
+
+def order_event_data(order):
+    """Datos de un pedido que necesita la pantalla de cocina para dibujarlo."""
+    created_at = order.get("created_at")
+    return {
+        "id": str(order["_id"]),
+        "mesa_num": order.get("mesa_num"),
+        "status": order.get("status"),
+        "total": float(order.get("total", 0) or 0),
+        "items": [
+            {
+                "quantity": item.get("quantity"),
+                "product_name": item.get("product_name", ""),
+                "size": item.get("size", ""),
+            }
+            for item in order.get("items", [])
+        ],
+        "created_at": created_at.strftime("%H:%M") if created_at else "",
+        # La pantalla manda la versión de vuelta al cambiar el estado (compare-and-set)
+        "version": order.get("version", 0),
+        "status_times": {
+            status: moment.isoformat(timespec="seconds")
+            for status, moment in order.get("status_times", {}).items()
+        },
+    }
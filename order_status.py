@@ -0,0 +1,128 @@
+"""
+Estados de un pedido y sus transiciones.
+
+Los pedidos solo avanzan: pendiente -> en_preparacion -> listo -> completado
+(se puede saltar pasos, p. ej. una bebida pasa directo a listo). Cada cambio
+es un compare-and-set en Mongo: el filtro exige que el pedido siga en un
+estado desde el que se permite la transición (y en la versión que vio la
+pantalla, si la manda), así dos pantallas de cocina no pueden regresar un
+pedido. El update sube `version`, guarda en `previous_status` de qué estado
+salió y la hora de cada estado en `status_times`.
+"""
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+STATUSES = ("pendiente", "en_preparacion", "listo", "completado")
+STATUS_LABELS = {
+    "pendiente": "Pendiente",
+    "en_preparacion": "En Preparación",
+    "listo": "Listo",
+    "completado": "Completado",
+}
+# Estados que se ven en la pantalla de cocina
+KITCHEN_STATUSES = ("pendiente", "en_preparacion", "listo")
+
+TRANSITIONS = {
+    "pendiente": ("en_preparacion", "listo", "completado"),
+    "en_preparacion": ("listo", "completado"),
+    "listo": ("completado",),
+    "completado": (),
+}
+
+
+class TransitionError(ValueError):
+    """No se pudo cambiar el estado; `current` es el pedido como está ahora (o None)."""
+
+    def __init__(self, message, status=409, current=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.current = current
+
+
+def sources_for(new_status):
+    """Estados desde los que se puede pasar a `new_status`."""
+    return [status for status, targets in TRANSITIONS.items() if new_status in targets]
+
+
+def new_order_fields(now):
+    """Campos de control de un pedido recién creado."""
+    return {"status": "pendiente", "version": 1, "status_times": {"pendiente": now}}
+
+
+def _version_filter(version):
+    # Pedidos anteriores a este esquema no tienen `version`: cuentan como 0
+    return {"$in": [0, None]} if version == 0 else version
+
+
+def _transition(new_status, now, transition_id=None):
+    """Update por pipeline: lee el estado anterior del propio documento."""
+    fields = {
+        "previous_status": "$status",
+        "status": new_status,
+        "updated_at": now,
+        f"status_times.{new_status}": now,
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+    }
+    if transition_id is not None:
+        fields["transition_id"] = transition_id
+    return [{"$set": fields}]
+
+
+def _check_target(new_status):
+    if new_status not in STATUSES:
+        raise TransitionError("Estado inválido", 400)
+
+
+def change_status(col, order_id, new_status, version=None, now=None):
+    """Pasa un pedido a `new_status`; devuelve el documento ya actualizado.
+
+    Lanza TransitionError si el pedido no existe, si la transición no está
+    permitida desde su estado actual o si `version` ya no es la vigente.
+    """
+    _check_target(new_status)
+    now = now or datetime.now()
+    query = {"_id": order_id, "status": {"$in": sources_for(new_status)}}
+    if version is not None:
+        query["version"] = _version_filter(version)
+    order = col.find_one_and_update(query, _transition(new_status, now), return_document=ReturnDocument.AFTER)
+    if order:
+        return order
+
+    current = col.find_one({"_id": order_id})
+    if current is None:
+        raise TransitionError("Pedido no encontrado", 404)
+    if new_status not in TRANSITIONS.get(current.get("status"), ()):
+        raise TransitionError(f"Un pedido {current.get('status')} no puede pasar a {new_status}", current=current)
+    raise TransitionError("Otra pantalla modificó el pedido; recarga para ver su estado", current=current)
+
+
+def change_many(col, targets, new_status, now=None):
+    """Avanza varios pedidos en un solo update.
+
+    `targets` es [(order_id, version o None)]. Devuelve (actualizados,
+    rechazados): los documentos ya actualizados y los ids que no cumplieron
+    la transición o la versión. Se marcan con un `transition_id` propio para
+    leer después exactamente los que cambió este update.
+    """
+    _check_target(new_status)
+    if not targets:
+        return [], []
+    now = now or datetime.now()
+    transition_id = ObjectId()
+    ids = [order_id for order_id, _version in targets]
+    col.update_many(
+        {
+            "$or": [
+                {"_id": order_id} if version is None else {"_id": order_id, "version": _version_filter(version)}
+                for order_id, version in targets
+            ],
+            "status": {"$in": sources_for(new_status)},
+        },
+        _transition(new_status, now, transition_id),
+    )
+    updated = list(col.find({"_id": {"$in": ids}, "transition_id": transition_id}))
+    changed = {order["_id"] for order in updated}
+    return updated, [order_id for order_id in ids if order_id not in changed]
@@ -0,0 +1,49 @@
+"""
+Paginación por cursor (keyset) de los productos de una categoría.
+
+Los productos de cada categoría ya vienen ordenados por (name, _id) (ver
+CatalogCache._load y el índice category_name), así que "Ver más" pide lo que
+sigue después de la última tarjeta mostrada en lugar de un número de página:
+encontrar el punto de partida es una búsqueda binaria y agregar o borrar
+productos mientras el cliente baja no repite ni salta tarjetas.
+"""
+import base64
+import json
+from bisect import bisect_right
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def sort_key(product):
+    """Mismo orden que la consulta del catálogo: nombre y, en empate, _id."""
+    return (product.get("name", ""), product["_id"])
+
+
+def encode_cursor(product):
+    """Cursor opaco con la llave del último producto de una página."""
+    raw = json.dumps([product.get("name", ""), str(product["_id"])], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(name, _id) de un cursor; ValueError si no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, product_id = json.loads(raw)
+        if not isinstance(name, str):
+            raise ValueError(name)
+        return name, ObjectId(product_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise ValueError(f"Cursor inválido: {cursor!r}") from e
+
+
+def start_after(keys, cursor):
+    """Índice del primer producto posterior al cursor.
+
+    `keys` son las sort_key de los productos en orden (ver
+    CatalogCache.product_keys); se calculan una vez por carga del catálogo.
+    """
+    if not cursor:
+        return 0
+    return bisect_right(keys, decode_cursor(cursor))
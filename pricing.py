@@ -0,0 +1,181 @@
+"""
+Precios del menú.
+
+Internamente todo se calcula en centavos enteros para no arrastrar errores de
+punto flotante. Al cargar el catálogo se arma una tabla por producto
+(tamaño -> centavos) y con ella se cotiza una línea o un carrito completo sin
+consultar la base de datos.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+SIZES = ["individual", "chica", "mediana", "grande", "h4"]
+PIZZA_PRICE_FIELDS = [f"price_{size}" for size in SIZES]
+
+# Extras de pizza
+DIVISION_CENTS = 1000
+ORILLA_QUESO_CENTS = {
+    "individual": 1500,
+    "chica": 2000,
+    "mediana": 2500,
+    "grande": 3000,
+    "h4": 4000,
+}
+
+
+class PricingError(ValueError):
+    """Una línea no se puede cotizar; `status` es el código HTTP sugerido."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def to_cents(value):
+    """"120", "120.5", 120 o 120.5 -> centavos; None si está vacío o no es número."""
+    if value is None or value == "":
+        return None
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or amount < 0:
+        return None
+    return int((amount * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Centavos -> pesos como float (lo que guardan los pedidos y usan los templates)."""
+    return cents / 100
+
+
+def price_value(value):
+    """Precio capturado en el admin -> número para guardar en Mongo (None si vacío)."""
+    cents = to_cents(value)
+    if cents is None:
+        return None
+    return cents // 100 if cents % 100 == 0 else from_cents(cents)
+
+
+def format_price(value):
+    """Para mostrar: 120 -> "120", 120.5 -> "120.50"."""
+    cents = to_cents(value)
+    if cents is None:
+        return ""
+    if cents % 100 == 0:
+        return str(cents // 100)
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def price_table(product, is_pizza):
+    """Tabla tamaño -> centavos de un producto ("" es el precio sin tamaño)."""
+    table = {}
+    if is_pizza:
+        for size in SIZES:
+            cents = to_cents(product.get(f"price_{size}"))
+            if cents:
+                table[size] = cents
+    cents = to_cents(product.get("price"))
+    if cents:
+        table[""] = cents
+    return table
+
+
+class PriceBook:
+    """Tablas de precio de todo el catálogo, armadas una vez por carga."""
+
+    def __init__(self, products, categories_by_id):
+        self._entries = {}
+        for product in products:
+            category = categories_by_id.get(product.get("category_id"))
+            category_name = category.get("name", "") if category else ""
+            is_pizza = category_name.upper() == "PIZZAS"
+            self._entries[str(product["_id"])] = (product, category_name, is_pizza, price_table(product, is_pizza))
+
+    def quote(self, product_id, quantity=1, size="", division=False, second_half_id="", orilla_queso=False):
+        """Cotiza una línea del carrito; lanza PricingError si no se puede vender."""
+        # bool es int: True no es una cantidad
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+            raise PricingError("La cantidad debe ser un entero mayor a 0")
+        entry = self._entries.get(str(product_id))
+        if entry is None:
+            raise PricingError("Producto no encontrado", 404)
+        product, category_name, is_pizza, table = entry
+        size = (size or "").lower()
+
+        # Precio base según categoría y tamaño
+        if is_pizza and size:
+            base_cents = table.get(size)
+            if not base_cents:
+                raise PricingError(f"Tamaño {size} no disponible")
+        else:
+            base_cents = table.get("")
+            if not base_cents:
+                raise PricingError("Precio no disponible")
+
+        division = bool(division) and is_pizza
+        orilla_queso = bool(orilla_queso) and is_pizza
+        second_half_name = None
+        if division and second_half_id:
+            second = self._entries.get(str(second_half_id))
+            if second is None:
+                raise PricingError("Segunda mitad no encontrada", 404)
+            if size and not second[3].get(size):
+                raise PricingError(f"Tamaño {size} no disponible para segunda mitad")
+            second_half_name = second[0].get("name", "")
+
+        # Extras de pizza (NO se cobra la segunda mitad, solo el costo de división)
+        orilla_cents = ORILLA_QUESO_CENTS.get(size, 0) if orilla_queso else 0
+        unit_cents = base_cents + (DIVISION_CENTS if division else 0) + orilla_cents
+
+        # cart_key único incluyendo opciones para pizzas
+        if is_pizza:
+            options_key = f"{'D' if division else ''}{'O' if orilla_queso else ''}"
+            if division and second_half_id:
+                cart_key = f"{product_id}_{second_half_id}_{size}_{options_key}"
+            else:
+                cart_key = f"{product_id}_{size}_{options_key}" if options_key else f"{product_id}_{size}"
+        else:
+            cart_key = f"{product_id}_{size}" if size else str(product_id)
+
+        name = product.get("name", "")
+        if second_half_name:
+            name = f"{name} / {second_half_name}"
+
+        return {
+            "cart_key": cart_key,
+            "product_id": str(product_id),
+            "name": name,
+            "category_name": category_name,
+            "quantity": quantity,
+            "size": size,
+            "division": division,
+            "orilla_queso": orilla_queso,
+            "second_half_id": str(second_half_id) if division and second_half_id else None,
+            "second_half_name": second_half_name,
+            "unit_cents": unit_cents,
+            "orilla_queso_cents": orilla_cents,
+            "subtotal_cents": unit_cents * quantity,
+        }
+
+    def price_cart(self, cart):
+        """Recotiza todas las líneas de un carrito en una pasada.
+
+        Devuelve (líneas cotizadas, errores {cart_key: mensaje}, total en centavos).
+        """
+        lines, errors = [], {}
+        for cart_key, item in cart.items():
+            try:
+                line = self.quote(
+                    item["product_id"],
+                    quantity=item["quantity"],
+                    size=item.get("size", ""),
+                    division=item.get("division", False),
+                    second_half_id=item.get("second_half_id") or "",
+                    orilla_queso=item.get("orilla_queso", False),
+                )
+            except PricingError as e:
+                errors[cart_key] = e.message
+                continue
+            lines.append(line)
+        return lines, errors, sum(line["subtotal_cents"] for line in lines)
@@ -0,0 +1,118 @@
+"""
+Códigos QR de las mesas.
+
+Lo usan la app (imagen por mesa y hoja para imprimir desde el admin) y
+`generate_all_qr.py`. Cada QR se genera una sola vez por (URL base, mesa) y
+queda en memoria; la generación en lote reparte las mesas en varios procesos.
+"""
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import qrcode
+import qrcode.image.svg
+from PIL import Image, ImageDraw, ImageFont
+
+BOX_SIZE = 10
+BORDER = 5
+
+# Hoja para imprimir: A4 a 150 dpi, 3 x 4 mesas por página
+SHEET_SIZE = (1240, 1754)
+SHEET_COLUMNS = 3
+SHEET_ROWS = 4
+SHEET_MARGIN = 60
+LABEL_HEIGHT = 60
+
+
+def table_url(base_url, mesa_num):
+    return f"{base_url.rstrip('/')}/mesa/{mesa_num}"
+
+
+def _make_qr(base_url, mesa_num, image_factory=None):
+    qr = qrcode.QRCode(version=1, box_size=BOX_SIZE, border=BORDER, image_factory=image_factory)
+    qr.add_data(table_url(base_url, mesa_num))
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white")
+
+
+def render_png(base_url, mesa_num):
+    """PNG del QR de una mesa (sin caché; es lo que corre en el pool de procesos)."""
+    buffer = io.BytesIO()
+    _make_qr(base_url, mesa_num).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=256)
+def qr_png(base_url, mesa_num):
+    return render_png(base_url, mesa_num)
+
+
+@lru_cache(maxsize=256)
+def qr_svg(base_url, mesa_num):
+    return _make_qr(base_url, mesa_num, qrcode.image.svg.SvgPathImage).to_string()
+
+
+def _write_png(args):
+    base_url, mesa_num, folder = args
+    path = os.path.join(folder, f"mesa_{mesa_num}.png")
+    with open(path, "wb") as f:
+        f.write(render_png(base_url, mesa_num))
+    return mesa_num, path
+
+
+def generate_all(base_url, tables, folder, workers=None):
+    """Escribe mesa_N.png de todas las mesas en paralelo; devuelve [(mesa, ruta)]."""
+    os.makedirs(folder, exist_ok=True)
+    jobs = [(base_url, mesa_num, folder) for mesa_num in tables]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_write_png, jobs))
+
+
+def _sheet_pages(base_url, tables, rows_per_page, page_height=None):
+    """Páginas de la hoja con las mesas en cuadrícula y su número debajo."""
+    width = SHEET_SIZE[0]
+    cell_w = (width - 2 * SHEET_MARGIN) // SHEET_COLUMNS
+    qr_side = cell_w - 80
+    cell_h = qr_side + LABEL_HEIGHT + 30
+    font = ImageFont.load_default(size=40)
+    per_page = SHEET_COLUMNS * rows_per_page
+
+    pages = []
+    for start in range(0, len(tables), per_page):
+        chunk = tables[start:start + per_page]
+        rows = math.ceil(len(chunk) / SHEET_COLUMNS)
+        height = page_height or 2 * SHEET_MARGIN + rows * cell_h
+        page = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(page)
+        for index, mesa_num in enumerate(chunk):
+            col, row = index % SHEET_COLUMNS, index // SHEET_COLUMNS
+            x = SHEET_MARGIN + col * cell_w
+            y = SHEET_MARGIN + row * cell_h
+            with Image.open(io.BytesIO(qr_png(base_url, mesa_num))) as qr_image:
+                page.paste(qr_image.convert("RGB").resize((qr_side, qr_side), Image.NEAREST), (x + 40, y))
+            label = f"Mesa {mesa_num}"
+            label_w = draw.textlength(label, font=font)
+            draw.text((x + (cell_w - label_w) / 2, y + qr_side + 10), label, fill="black", font=font)
+        pages.append(page)
+    return pages
+
+
+def qr_sheet(base_url, tables, fmt="pdf"):
+    """Hoja imprimible con los QR de `tables`.
+
+    PDF: una página A4 por cada 12 mesas. PNG: una sola imagen con todas.
+    ValueError si no hay mesas.
+    """
+    tables = list(tables)
+    if not tables:
+        raise ValueError("No hay mesas para la hoja de QR")
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        pages = _sheet_pages(base_url, tables, SHEET_ROWS, SHEET_SIZE[1])
+        pages[0].save(buffer, format="PDF", resolution=150, save_all=True, append_images=pages[1:])
+    else:
+        rows = max(1, math.ceil(len(tables) / SHEET_COLUMNS))
+        _sheet_pages(base_url, tables, rows)[0].save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,171 @@
+"""
+Ventas agregadas por día (colección `daily_sales`).
+
+Un documento por día con contadores por estado y por producto:
+
+    {"_id": "2026-10-18", "date": datetime,
+     "status": {"completado": {"orders": 12, "cents": 345000}, ...},
+     "products": {"<product_id>": {"name": "Hawaiana", "quantity": 7, "cents": 91000}}}
+
+Además el documento "total" lleva los contadores por estado de todo el
+historial (pedidos activos del dashboard). Se actualizan con $inc al enviar
+un pedido y al cambiar su estado; `rebuild_rollups` los recalcula desde
+los pedidos con una agregación. Cualquier reporte por rango es una sola lectura
+por `_id`.
+"""
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne
+
+from pricing import to_cents
+
+TOTAL_ID = "total"
+
+
+def day_key(moment):
+    return moment.strftime("%Y-%m-%d")
+
+
+def _order_cents(order):
+    return to_cents(order.get("total")) or 0
+
+
+def _product_name(name, second_half_name):
+    """Nombre del producto sin la segunda mitad ("Hawaiana / Pepperoni" -> "Hawaiana")."""
+    suffix = f" / {second_half_name}"
+    return name[:-len(suffix)] if second_half_name and name.endswith(suffix) else name
+
+
+def _status_inc(status, orders, cents):
+    return {f"status.{status}.orders": orders, f"status.{status}.cents": cents}
+
+
+def record_order(col, order):
+    """Suma un pedido nuevo al día en que se creó."""
+    created_at = order["created_at"]
+    cents = _order_cents(order)
+    inc = _status_inc(order["status"], 1, cents)
+    names = {}
+    for item in order.get("items", []):
+        key = f"products.{item['product_id']}"
+        inc[f"{key}.quantity"] = inc.get(f"{key}.quantity", 0) + item["quantity"]
+        inc[f"{key}.cents"] = inc.get(f"{key}.cents", 0) + (to_cents(item.get("subtotal")) or 0)
+        names[f"{key}.name"] = _product_name(item.get("product_name", ""), item.get("second_half_name"))
+    col.update_one(
+        {"_id": day_key(created_at)},
+        {"$inc": inc, "$set": names,
+         "$setOnInsert": {"date": datetime.combine(created_at.date(), datetime.min.time())}},
+        upsert=True,
+    )
+    col.update_one({"_id": TOTAL_ID}, {"$inc": _status_inc(order["status"], 1, cents)}, upsert=True)
+
+
+def move_order(col, order, old_status, new_status):
+    """Pasa un pedido de un estado a otro en los contadores."""
+    cents = _order_cents(order)
+    inc = {**_status_inc(old_status, -1, -cents), **_status_inc(new_status, 1, cents)}
+    col.update_one({"_id": day_key(order["created_at"])}, {"$inc": inc})
+    col.update_one({"_id": TOTAL_ID}, {"$inc": inc}, upsert=True)
+
+
+def sales_between(col, start, end):
+    """Documentos de los días en [start, end) (fechas), ordenados."""
+    return list(col.find({"_id": {"$gte": day_key(start), "$lt": day_key(end)}}).sort("_id", 1))
+
+
+def sales_for_day(col, date):
+    return col.find_one({"_id": day_key(date)}) or {}
+
+
+def sales_totals(col):
+    return col.find_one({"_id": TOTAL_ID}) or {}
+
+
+def status_sum(doc, statuses=None):
+    """(pedidos, centavos) de un documento, solo de `statuses` si se indica."""
+    orders = cents = 0
+    for status, counters in doc.get("status", {}).items():
+        if statuses is None or status in statuses:
+            orders += counters.get("orders", 0)
+            cents += counters.get("cents", 0)
+    return orders, cents
+
+
+def top_products(docs, limit=10):
+    """Productos más vendidos sumando varios días: [(nombre, cantidad, centavos)]."""
+    merged = {}
+    for doc in docs:
+        for product_id, counters in doc.get("products", {}).items():
+            name, quantity, cents = merged.get(product_id, ("", 0, 0))
+            merged[product_id] = (
+                counters.get("name") or name,
+                quantity + counters.get("quantity", 0),
+                cents + counters.get("cents", 0),
+            )
+    return sorted(merged.values(), key=lambda p: (-p[1], -p[2], p[0]))[:limit]
+
+
+def rebuild_rollups(orders_cols, col, since=None):
+    """Recalcula los días desde `since` (todo el historial si es None).
+
+    `orders_cols` son las colecciones con pedidos: `orders` y, si hay pedidos
+    archivados, sus particiones (ver archive.py). Reemplaza los documentos de
+    esos días; conviene correrlo con el local cerrado para no pisar
+    incrementos de pedidos que llegan mientras tanto.
+    """
+    match = {"created_at": {"$gte": since}} if since else {}
+    day_expr = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+
+    docs = {}
+    total = {"_id": TOTAL_ID, "status": {}}
+    for orders_col in orders_cols:
+        for row in orders_col.aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"day": day_expr, "status": "$status"},
+                        "orders": {"$sum": 1}, "total": {"$sum": "$total"}}},
+        ]):
+            key = row["_id"]["day"]
+            doc = docs.setdefault(key, {"_id": key, "date": datetime.strptime(key, "%Y-%m-%d"),
+                                        "status": {}, "products": {}})
+            _add(doc["status"], row["_id"]["status"], orders=row["orders"], cents=round(row["total"] * 100))
+
+        for row in orders_col.aggregate([
+            {"$match": match},
+            {"$unwind": "$items"},
+            {"$group": {"_id": {"day": day_expr, "product": "$items.product_id"},
+                        "name": {"$last": "$items.product_name"}, "half": {"$last": "$items.second_half_name"},
+                        "quantity": {"$sum": "$items.quantity"}, "subtotal": {"$sum": "$items.subtotal"}}},
+        ]):
+            products = docs[row["_id"]["day"]]["products"]
+            product = _add(products, str(row["_id"]["product"]),
+                           quantity=row["quantity"], cents=round(row["subtotal"] * 100))
+            product["name"] = _product_name(row["name"], row["half"])
+
+        # El total de todo el historial siempre se recalcula completo
+        for row in orders_col.aggregate([
+            {"$group": {"_id": "$status", "orders": {"$sum": 1}, "total": {"$sum": "$total"}}},
+        ]):
+            _add(total["status"], row["_id"], orders=row["orders"], cents=round(row["total"] * 100))
+
+    stale = {"_id": {"$gte": day_key(since), "$ne": TOTAL_ID}} if since else {"_id": {"$ne": TOTAL_ID}}
+    col.delete_many(stale)
+    if docs:
+        col.bulk_write([ReplaceOne({"_id": key}, doc, upsert=True) for key, doc in docs.items()], ordered=False)
+    col.replace_one({"_id": TOTAL_ID}, total, upsert=True)
+    return len(docs)
+
+
+def _add(counters, key, **values):
+    """Suma `values` a counters[key] (un mismo día puede estar en varias colecciones)."""
+    entry = counters.setdefault(key, {})
+    for name, value in values.items():
+        entry[name] = entry.get(name, 0) + value
+    return entry
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(date):
+    return (date.replace(day=28) + timedelta(days=4)).replace(day=1)
@@ -0,0 +1,91 @@
+"""
+Búsqueda de productos del menú.
+
+Los productos guardan un campo `search_text` (nombre e ingredientes en
+minúsculas y sin acentos) que se recalcula en el CRUD del admin. A partir de
+él se arma un índice invertido en memoria junto con la caché del catálogo, así
+que una búsqueda no toca Mongo.
+"""
+import bisect
+import re
+import unicodedata
+
+# Peso de una coincidencia según el campo donde aparece el término
+NAME_WEIGHT = 3.0
+INGREDIENT_WEIGHT = 1.0
+# Una coincidencia por prefijo ("bolo" -> "bolonesa") vale menos que una exacta
+PREFIX_FACTOR = 0.5
+# Bonus cuando el nombre completo empieza con la búsqueda
+NAME_PREFIX_BONUS = 2.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text):
+    """Minúsculas y sin acentos: "Boloñesa" -> "bolonesa"."""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def search_text(product):
+    """Valor del campo `search_text` que se guarda con cada producto."""
+    return " ".join(tokenize(product.get("name", "")) + tokenize(product.get("ingredients", "")))
+
+
+class SearchIndex:
+    """Índice invertido token -> {producto: peso} con búsqueda por prefijo."""
+
+    def __init__(self, products):
+        self._postings = {}
+        self._products = {}
+        self._names = {}
+        for product in products:
+            product_id = product["_id"]
+            self._products[product_id] = product
+            self._names[product_id] = " ".join(tokenize(product.get("name", "")))
+            name_tokens = set(tokenize(product.get("name", "")))
+            text = product.get("search_text") or search_text(product)
+            for token in set(text.split()):
+                weight = NAME_WEIGHT if token in name_tokens else INGREDIENT_WEIGHT
+                self._postings.setdefault(token, {})[product_id] = weight
+        self._tokens = sorted(self._postings)
+
+    def _term_scores(self, term):
+        """Mejor puntaje por producto para un término (exacto o por prefijo)."""
+        scores = dict(self._postings.get(term, {}))
+        start = bisect.bisect_left(self._tokens, term)
+        for token in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            if token == term:
+                continue
+            for product_id, weight in self._postings[token].items():
+                scores[product_id] = max(scores.get(product_id, 0), weight * PREFIX_FACTOR)
+        return scores
+
+    def search(self, query, limit=None):
+        """Productos que contienen todos los términos, del más al menos relevante."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            term_scores = self._term_scores(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pid: scores[pid] + s for pid, s in term_scores.items() if pid in scores}
+            if not scores:
+                return []
+        folded_query = " ".join(terms)
+        for product_id in scores:
+            if self._names[product_id].startswith(folded_query):
+                scores[product_id] += NAME_PREFIX_BONUS
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], self._names[pid]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self._products[pid] for pid in ranked]
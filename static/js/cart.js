@@ -0,0 +1,82 @@
+// cart.js: cantidades y totales del carrito (cart.html)
+document.addEventListener('DOMContentLoaded', function() {
+    const table = document.getElementById('cart-table');
+    if (!table) {
+        return;
+    }
+    const quantityInputs = table.querySelectorAll('.quantity-input');
+    
+    quantityInputs.forEach(input => {
+        let timeout;
+        
+        input.addEventListener('change', function() {
+            const cartKey = this.getAttribute('data-cart-key');
+            const price = parseFloat(this.getAttribute('data-price'));
+            const quantity = parseInt(this.value);
+            
+            if (quantity < 1) {
+                this.value = 1;
+                return;
+            }
+            
+            // Actualizar subtotal inmediatamente en la UI
+            const subtotalCell = document.querySelector(`.subtotal-cell[data-cart-key="${cartKey}"]`);
+            const newSubtotal = price * quantity;
+            subtotalCell.textContent = '$' + newSubtotal.toFixed(2);
+            
+            // Actualizar total
+            updateTotal();
+            
+            // Enviar actualización al servidor
+            const formData = new FormData();
+            formData.append('cart_key', cartKey);
+            formData.append('quantity', quantity);
+            
+            fetch(table.dataset.updateUrl, {
+                method: 'POST',
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                },
+                body: formData
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data && data.success) {
+                    // Actualizar total desde el servidor si está disponible
+                    if (data.total !== undefined) {
+                        document.getElementById('cart-total').textContent = '$' + parseFloat(data.total).toFixed(2);
+                    }
+                    // Actualizar subtotal desde el servidor
+                    if (data.subtotal !== undefined) {
+                        subtotalCell.textContent = '$' + parseFloat(data.subtotal).toFixed(2);
+                    }
+                } else {
+                    // Si hay error, recargar la página
+                    window.location.reload();
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                // Recargar la página en caso de error
+                window.location.reload();
+            });
+        });
+        
+        // También actualizar cuando se usa el teclado (flechas arriba/abajo)
+        input.addEventListener('input', function() {
+            clearTimeout(timeout);
+            timeout = setTimeout(() => {
+                this.dispatchEvent(new Event('change'));
+            }, 300);
+        });
+    });
+    
+    function updateTotal() {
+        let total = 0;
+        document.querySelectorAll('.subtotal-cell').forEach(cell => {
+            const subtotalText = cell.textContent.replace('$', '');
+            total += parseFloat(subtotalText) || 0;
+        });
+        document.getElementById('cart-total').textContent = '$' + total.toFixed(2);
+    }
+});
@@ -0,0 +1,218 @@
+// category.js: tarjetas de producto y agregar al carrito (category_view.html y offline.html)
+
+// `view` lleva la URL de agregar al carrito y los precios de orilla; `root` contiene las tarjetas
+function initProductGrid(view, root) {
+    // Precios de orilla de queso por tamaño
+    const orillaPrices = JSON.parse(view.dataset.orillaPrices);
+    
+    // Mostrar/ocultar selector de segunda mitad cuando se marca división
+    root.querySelectorAll('input[id^="division_"]').forEach(checkbox => {
+        checkbox.addEventListener('change', function(e) {
+            e.stopPropagation();
+            const productId = this.id.replace('division_', '');
+            const secondHalfContainer = root.querySelector('#second_half_container_' + productId);
+            const secondHalfSelect = document.getElementById('second_half_' + productId);
+            
+            if (this.checked) {
+                secondHalfContainer.style.display = 'block';
+            } else {
+                secondHalfContainer.style.display = 'none';
+                if (secondHalfSelect) {
+                    secondHalfSelect.value = '';
+                }
+            }
+        });
+    });
+    
+    // Actualizar precio de orilla de queso cuando cambia el tamaño
+    root.querySelectorAll('select[id^="size_"]').forEach(select => {
+        select.addEventListener('change', function(e) {
+            e.stopPropagation();
+            const productId = this.id.replace('size_', '');
+            const selectedSize = this.value;
+            const orillaLabel = document.getElementById('orilla_queso_label_' + productId);
+            
+            if (orillaLabel && selectedSize in orillaPrices) {
+                orillaLabel.textContent = `Orilla de queso (+$${orillaPrices[selectedSize]})`;
+            }
+        });
+        
+        // Actualizar precio inicial
+        const productId = select.id.replace('size_', '');
+        const selectedSize = select.value;
+        const orillaLabel = document.getElementById('orilla_queso_label_' + productId);
+        if (orillaLabel && selectedSize in orillaPrices) {
+            orillaLabel.textContent = `Orilla de queso (+$${orillaPrices[selectedSize]})`;
+        }
+    });
+    
+    // Prevenir que los elementos interactivos activen el zoom de la card
+    root.querySelectorAll('.zoom-card select, .zoom-card input[type="checkbox"], .zoom-card label, .zoom-card button').forEach(element => {
+        element.addEventListener('click', function(e) {
+            e.stopPropagation(); // Evitar que se active el zoom
+        });
+        // También prevenir en el evento change para los selects
+        if (element.tagName === 'SELECT') {
+            element.addEventListener('change', function(e) {
+                e.stopPropagation();
+            });
+        }
+    });
+    
+    root.querySelectorAll('.add-to-cart-btn').forEach(btn => {
+        btn.addEventListener('click', function(e) {
+            e.stopPropagation(); // Evitar que se active el zoom
+            
+            const productId = this.getAttribute('data-product-id');
+            const hasSize = this.getAttribute('data-has-size') === 'true';
+            let size = '';
+            
+            if (hasSize) {
+                const sizeSelect = document.getElementById('size_' + productId);
+                if (sizeSelect) {
+                    size = sizeSelect.value;
+                }
+            }
+            
+            // Obtener opciones de división y orilla de queso para pizzas
+            let division = '';
+            let orilla_queso = '';
+            let second_half_id = '';
+            if (hasSize) {
+                const divisionCheck = document.getElementById('division_' + productId);
+                const orillaQuesoCheck = document.getElementById('orilla_queso_' + productId);
+                if (divisionCheck && divisionCheck.checked) {
+                    division = '1';
+                    // Obtener segunda mitad si está seleccionada
+                    const secondHalfSelect = document.getElementById('second_half_' + productId);
+                    if (secondHalfSelect && secondHalfSelect.value) {
+                        second_half_id = secondHalfSelect.value;
+                    }
+                }
+                if (orillaQuesoCheck && orillaQuesoCheck.checked) {
+                    orilla_queso = '1';
+                }
+            }
+            
+            // Validar que si hay división, se haya seleccionado segunda mitad
+            if (division && !second_half_id) {
+                alert('Por favor selecciona la segunda mitad de la pizza para la división.');
+                return;
+            }
+            
+            const formData = new FormData();
+            formData.append('product_id', productId);
+            formData.append('quantity', '1');
+            if (size) {
+                formData.append('size', size);
+            }
+            if (division) {
+                formData.append('division', division);
+                if (second_half_id) {
+                    formData.append('second_half_id', second_half_id);
+                }
+            }
+            if (orilla_queso) {
+                formData.append('orilla_queso', orilla_queso);
+            }
+            
+            // Deshabilitar botón mientras se procesa
+            this.disabled = true;
+            const originalText = this.innerHTML;
+            this.innerHTML = '<span class="spinner-border spinner-border-sm" role="status"></span>';
+            
+            fetch(view.dataset.addToCartUrl, {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success || data.queued) {
+                    // Mostrar notificación; sin red el service worker lo deja en cola (ver sw.js)
+                    const alert = document.createElement('div');
+                    alert.className = `alert alert-${data.queued ? 'warning' : 'success'} alert-dismissible fade show position-fixed top-0 start-50 translate-middle-x mt-3`;
+                    alert.style.zIndex = '9999';
+                    alert.innerHTML = `
+                        <strong>${data.queued ? 'Sin conexión.' : '¡Agregado!'}</strong> ${data.message}
+                        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+                    `;
+                    document.body.appendChild(alert);
+                    
+                    // Actualizar contadores del carrito
+                    if (data.cart_count !== undefined) {
+                        document.querySelectorAll('[data-cart-count]').forEach(badge => {
+                            badge.textContent = data.cart_count || '';
+                        });
+                    }
+                    
+                    // Remover alerta después de 3 segundos
+                    setTimeout(() => {
+                        alert.remove();
+                    }, 3000);
+                } else {
+                    alert('Error: ' + data.message);
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                alert('Error al agregar al carrito. Por favor, intenta de nuevo.');
+            })
+            .finally(() => {
+                this.disabled = false;
+                this.innerHTML = originalText;
+            });
+        });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const view = document.getElementById('category-view');
+    if (view) {
+        initProductGrid(view, document);
+        initLoadMore(view);
+    }
+});
+
+// "Ver más": pide las tarjetas que siguen a la última mostrada (cursor) y las agrega debajo
+function initLoadMore(view) {
+    const loadMore = document.getElementById('load-more');
+    if (!loadMore) {
+        return;
+    }
+    const button = loadMore.querySelector('button');
+    loadMore.classList.remove('d-none');
+
+    button.addEventListener('click', function() {
+        button.disabled = true;
+        const url = `${loadMore.dataset.moreUrl}?after=${encodeURIComponent(loadMore.dataset.cursor)}`;
+        fetch(url, { credentials: 'same-origin' })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.message);
+            }
+            const chunk = document.createElement('div');
+            chunk.className = 'mt-3';
+            chunk.innerHTML = data.html;
+            loadMore.before(chunk);
+            initProductGrid(view, chunk);
+            // Con las tarjetas seguidas, los números de página ya no corresponden
+            const pagination = document.getElementById('category-pagination');
+            if (pagination) {
+                pagination.remove();
+            }
+            if (data.next) {
+                loadMore.dataset.cursor = data.next;
+            } else {
+                loadMore.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('No se pudieron cargar más productos. Por favor, intenta de nuevo.');
+        })
+        .finally(() => {
+            button.disabled = false;
+        });
+    });
+}
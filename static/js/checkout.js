@@ -0,0 +1,97 @@
+// checkout.js: envío del pedido con llave de idempotencia (checkout.html)
+// Una llave por pedido: los reintentos y los dobles toques no crean otro ticket en cocina
+function newIdempotencyKey() {
+    const bytes = new Uint8Array(16);
+    crypto.getRandomValues(bytes);
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+const submitBtn = document.getElementById('submitOrderBtn');
+const idempotencyKey = newIdempotencyKey();
+const MAX_ATTEMPTS = 4;
+
+function postOrder(attempt) {
+    return fetch(submitBtn.dataset.submitUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Idempotency-Key': idempotencyKey
+        }
+    }).catch(error => {
+        // Red inestable: se reintenta con la misma llave
+        if (attempt >= MAX_ATTEMPTS) {
+            throw error;
+        }
+        return new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt))
+            .then(() => postOrder(attempt + 1));
+    });
+}
+
+function showLineErrors(errors) {
+    const box = document.getElementById('lineErrors');
+    const list = box.querySelector('ul');
+    list.innerHTML = '';
+    errors.forEach(error => {
+        const li = document.createElement('li');
+        li.textContent = `${error.product_name}: ${error.message}`;
+        list.appendChild(li);
+    });
+    box.style.display = 'block';
+}
+
+function showQueued(message) {
+    const box = document.getElementById('queuedNotice');
+    box.textContent = message;
+    box.style.display = 'block';
+}
+
+window.addEventListener('outbox-sent', event => {
+    if (event.detail.path !== new URL(submitBtn.dataset.submitUrl, window.location.href).pathname) {
+        return;
+    }
+    const data = event.detail.data;
+    if (data.success) {
+        window.location.href = submitBtn.dataset.confirmationUrl;
+        return;
+    }
+    document.getElementById('queuedNotice').style.display = 'none';
+    document.getElementById('loadingSpinner').style.display = 'none';
+    if (data.errors) {
+        showLineErrors(data.errors);
+    } else {
+        alert('Error: ' + data.message);
+        submitBtn.disabled = false;
+    }
+});
+
+submitBtn.addEventListener('click', function() {
+    const btn = this;
+    const spinner = document.getElementById('loadingSpinner');
+    
+    btn.disabled = true;
+    spinner.style.display = 'block';
+    
+    postOrder(1)
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            window.location.href = btn.dataset.confirmationUrl;
+        } else if (data.queued) {
+            // Sin red: el service worker lo manda al volver la señal (con la misma llave)
+            showQueued(data.message);
+        } else if (data.errors) {
+            showLineErrors(data.errors);
+            spinner.style.display = 'none';
+        } else {
+            alert('Error: ' + data.message);
+            btn.disabled = false;
+            spinner.style.display = 'none';
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error al enviar el pedido. Por favor, intenta de nuevo.');
+        btn.disabled = false;
+        spinner.style.display = 'none';
+    });
+});
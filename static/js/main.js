@@ -36,4 +36,103 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Ejecutar al cargar la página
     setActiveNavItem();
+
+    // Mesa y contador del carrito: el HTML del menú se cachea igual para todas las mesas
+    const statusUrl = document.querySelector('main').dataset.tableStatusUrl;
+    function loadTableStatus() {
+        if (!statusUrl || !document.querySelector('[data-mesa-num], [data-cart-count]')) {
+            return;
+        }
+        fetch(statusUrl, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(data => {
+                document.querySelectorAll('[data-mesa-num]').forEach(el => {
+                    el.textContent = data.mesa_num || '';
+                });
+                document.querySelectorAll('[data-cart-count]').forEach(el => {
+                    el.textContent = data.cart_count || '';
+                });
+            })
+            .catch(() => {});
+    }
+    loadTableStatus();
+    // Al volver con el botón "atrás" la página sale de la caché del navegador
+    window.addEventListener('pageshow', event => {
+        if (event.persisted) {
+            loadTableStatus();
+        }
+    });
+
+    // Menú sin conexión: el service worker guarda el catálogo y encola carrito y pedidos (ver sw.js)
+    const serviceWorkerUrl = document.querySelector('main').dataset.serviceWorkerUrl;
+    if (serviceWorkerUrl && 'serviceWorker' in navigator) {
+        navigator.serviceWorker.register(serviceWorkerUrl).catch(error => console.error('Service worker:', error));
+        // Al volver la señal se manda lo que quedó en cola
+        window.addEventListener('online', () => {
+            if (navigator.serviceWorker.controller) {
+                navigator.serviceWorker.controller.postMessage({ type: 'flush-outbox' });
+            }
+        });
+        navigator.serviceWorker.addEventListener('message', event => {
+            if (!event.data || event.data.type !== 'outbox-sent') {
+                return;
+            }
+            if (event.data.data.cart_count !== undefined) {
+                document.querySelectorAll('[data-cart-count]').forEach(el => {
+                    el.textContent = event.data.data.cart_count || '';
+                });
+            }
+            // Las páginas que esperan su envío (checkout.js) escuchan este evento
+            window.dispatchEvent(new CustomEvent('outbox-sent', { detail: event.data }));
+        });
+    }
+
+    // Búsqueda mientras se escribe
+    const searchForm = document.getElementById('menu-search');
+    if (searchForm) {
+        const searchInput = searchForm.querySelector('input[name="q"]');
+        const suggestionsBox = document.getElementById('menu-search-suggestions');
+        let searchTimeout;
+        let lastQuery = '';
+
+        searchInput.addEventListener('input', function() {
+            clearTimeout(searchTimeout);
+            const query = this.value.trim();
+            if (!query) {
+                suggestionsBox.classList.remove('show');
+                return;
+            }
+            searchTimeout = setTimeout(() => {
+                lastQuery = query;
+                fetch(searchForm.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                    .then(response => response.json())
+                    .then(data => {
+                        // Ignorar respuestas de búsquedas anteriores
+                        if (data.query !== lastQuery) return;
+                        suggestionsBox.innerHTML = '';
+                        data.results.forEach(item => {
+                            const link = document.createElement('a');
+                            link.className = 'dropdown-item';
+                            link.href = item.url;
+                            link.textContent = item.name;
+                            if (item.category) {
+                                const small = document.createElement('small');
+                                small.className = 'text-muted ms-2';
+                                small.textContent = item.category;
+                                link.appendChild(small);
+                            }
+                            suggestionsBox.appendChild(link);
+                        });
+                        suggestionsBox.classList.toggle('show', data.results.length > 0);
+                    })
+                    .catch(error => console.error('Error:', error));
+            }, 150);
+        });
+
+        document.addEventListener('click', function(e) {
+            if (!searchForm.contains(e.target)) {
+                suggestionsBox.classList.remove('show');
+            }
+        });
+    }
 });
@@ -0,0 +1,173 @@
+// offline.js: arma en el navegador la página del menú pedida cuando no hay red (offline.html)
+document.addEventListener('DOMContentLoaded', function() {
+    const menu = document.getElementById('offline-menu');
+    const content = document.getElementById('offline-content');
+    if (!menu || !content) {
+        return;
+    }
+    const statusUrl = document.querySelector('main').dataset.tableStatusUrl;
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value === undefined || value === null ? '' : String(value);
+        return div.innerHTML;
+    }
+
+    function image(item) {
+        return `<img src="${escapeHtml(item.image || menu.dataset.defaultImage)}" class="card-img-top" alt="${escapeHtml(item.name)}" loading="lazy">`;
+    }
+
+    function renderIndex(catalog) {
+        content.innerHTML = `
+            <div class="row g-3 justify-content-center">
+                ${catalog.categories.map(category => `
+                <div class="col-12 col-sm-6 col-md-3">
+                    <a href="${escapeHtml(category.url)}" class="text-decoration-none">
+                        <div class="card card-category h-100 text-white">
+                            <div class="card-img-wrap">${image(category)}</div>
+                            <div class="card-img-overlay d-flex flex-column justify-content-end p-3 overlay-dark">
+                                <h5 class="card-title text-white">${escapeHtml(category.name)}</h5>
+                            </div>
+                        </div>
+                    </a>
+                </div>`).join('')}
+            </div>`;
+    }
+
+    // Mismas tarjetas que _product_grid.html
+    function productDetails(category, product) {
+        if (category.pizza) {
+            const prices = Object.entries(product.prices).map(([size, price]) =>
+                `<li class="mb-1">${escapeHtml(size.charAt(0).toUpperCase() + size.slice(1))}: <strong class="text-neon">$${escapeHtml(price)}</strong></li>`
+            ).join('');
+            return `
+                <div class="mb-3">
+                    <h6 class="text-neon text-center mb-2">Precios por Tamaño:</h6>
+                    <ul class="list-unstyled small">${prices}</ul>
+                </div>
+                ${product.ingredients ? `<p class="small mb-2 text-center">${escapeHtml(product.ingredients)}</p>` : ''}`;
+        }
+        return `
+            <div class="mb-3 text-center">
+                <h6 class="text-neon mb-2">Precio:</h6>
+                <p class="fs-3 mb-2"><strong class="text-neon">$${escapeHtml(product.price)}</strong></p>
+                ${product.ml ? `<p class="mb-0"><strong>Contenido:</strong> ${escapeHtml(product.ml)} ml</p>` : ''}
+                ${product.grams ? `<p class="mb-0"><strong>Peso:</strong> ${escapeHtml(product.grams)} g</p>` : ''}
+            </div>
+            ${product.ingredients ? `<p class="small mb-2 text-center">${escapeHtml(product.ingredients)}</p>` : ''}`;
+    }
+
+    function pizzaOptions(category, product) {
+        const id = escapeHtml(product.id);
+        const sizes = Object.entries(product.prices).map(([size, price]) =>
+            `<option value="${escapeHtml(size)}">${escapeHtml(size.charAt(0).toUpperCase() + size.slice(1))} - $${escapeHtml(price)}</option>`
+        ).join('');
+        const halves = category.products.filter(other => other.id !== product.id).map(other =>
+            `<option value="${escapeHtml(other.id)}">${escapeHtml(other.name)}</option>`
+        ).join('');
+        return `
+            <div class="mb-2"><select class="form-select form-select-sm" id="size_${id}">${sizes}</select></div>
+            <div class="mb-2 text-start small">
+                <div class="form-check mb-2">
+                    <input class="form-check-input" type="checkbox" id="division_${id}" value="1">
+                    <label class="form-check-label text-white" for="division_${id}">División (+$10)</label>
+                </div>
+                <div id="second_half_container_${id}" style="display: none;" class="mb-2">
+                    <label class="form-label text-white small">Segunda mitad:</label>
+                    <select class="form-select form-select-sm" id="second_half_${id}">
+                        <option value="">Selecciona otra pizza</option>${halves}
+                    </select>
+                </div>
+                <div class="form-check">
+                    <input class="form-check-input" type="checkbox" id="orilla_queso_${id}" value="1">
+                    <label class="form-check-label text-white" for="orilla_queso_${id}" id="orilla_queso_label_${id}">Orilla de queso</label>
+                </div>
+            </div>`;
+    }
+
+    function productCard(category, product, hasTable) {
+        const addButton = hasTable ? `
+            <div class="mt-3 text-center">
+                ${category.pizza ? pizzaOptions(category, product) : ''}
+                <button class="btn btn-success btn-sm add-to-cart-btn" data-product-id="${escapeHtml(product.id)}"
+                        data-product-name="${escapeHtml(product.name)}"${category.pizza ? ' data-has-size="true"' : ''}>Agregar</button>
+            </div>` : '';
+        return `
+            <div class="col-4 col-md-4 col-lg-3">
+                <div class="zoom-card-container">
+                    <div class="zoom-card card card-category text-white h-100" onclick="this.classList.toggle('zoomed')">
+                        <div class="zoom-card-front">
+                            <div class="card-img-wrap">${image(product)}</div>
+                            <div class="card-img-overlay d-flex flex-column justify-content-end p-3 overlay-dark">
+                                <h5 class="card-title text-white mb-0">${escapeHtml(product.name)}</h5>
+                            </div>
+                        </div>
+                        <div class="zoom-card-back">
+                            <h5 class="card-title text-center mb-3">${escapeHtml(product.name)}</h5>
+                            ${productDetails(category, product)}
+                            ${addButton}
+                            <p class="text-center small text-muted mt-auto mb-0" style="font-size: 0.75rem;">Click para ampliar</p>
+                        </div>
+                    </div>
+                </div>
+            </div>`;
+    }
+
+    function pagination(category, page, totalPages) {
+        if (totalPages <= 1) {
+            return '';
+        }
+        const link = (p, label, disabled, active) => disabled || active
+            ? `<li class="page-item${active ? ' active' : ' disabled'}"><span class="page-link">${label}</span></li>`
+            : `<li class="page-item"><a class="page-link" href="${escapeHtml(category.url)}/page/${p}">${label}</a></li>`;
+        let items = link(page - 1, '&laquo; Anterior', page <= 1, false);
+        for (let p = 1; p <= totalPages; p++) {
+            items += link(p, p, false, p === page);
+        }
+        items += link(page + 1, 'Siguiente &raquo;', page >= totalPages, false);
+        return `
+            <nav aria-label="Navegación de páginas" class="mt-4">
+                <ul class="pagination justify-content-center pagination-custom">${items}</ul>
+            </nav>`;
+    }
+
+    function renderCategory(catalog, category, pageParam, hasTable) {
+        const perPage = catalog.per_page;
+        const totalPages = Math.max(1, Math.ceil(category.products.length / perPage));
+        // /category/<id>/page/<n> o, en links viejos, ?page=n
+        const requested = parseInt(pageParam || new URLSearchParams(window.location.search).get('page'), 10) || 1;
+        const page = Math.min(Math.max(requested, 1), totalPages);
+        const products = category.products.slice((page - 1) * perPage, page * perPage);
+        content.innerHTML = `
+            <div class="category-nav d-flex justify-content-between align-items-center gap-3 mb-4">
+                <h2 class="text-white mb-0">${escapeHtml(category.name)}</h2>
+                <a href="${escapeHtml(menu.dataset.homeUrl)}" class="btn btn-outline-light">Inicio</a>
+            </div>
+            <div class="row g-3">${products.map(product => productCard(category, product, hasTable)).join('')}</div>
+            ${products.length ? '' : '<div class="alert alert-info text-center"><p class="mb-0">No hay productos disponibles en esta categoría.</p></div>'}
+            ${pagination(category, page, totalPages)}`;
+        if (hasTable) {
+            menu.dataset.orillaPrices = JSON.stringify(catalog.orilla_prices);
+            initProductGrid(menu, content);
+        }
+    }
+
+    // El service worker responde las dos desde su caché
+    Promise.all([
+        fetch(menu.dataset.catalogUrl).then(response => response.json()),
+        fetch(statusUrl, { credentials: 'same-origin' }).then(response => response.json()).catch(() => ({}))
+    ])
+    .then(([catalog, status]) => {
+        const match = window.location.pathname.match(/\/category\/([^/]+)(?:\/page\/(\d+))?$/);
+        const category = match && catalog.categories.find(c => c.id === match[1]);
+        if (category) {
+            renderCategory(catalog, category, match[2], Boolean(status.mesa_num));
+        } else {
+            renderIndex(catalog);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        content.innerHTML = '<div class="alert alert-danger">El menú todavía no se ha guardado en este teléfono. Conéctate para cargarlo.</div>';
+    });
+});
@@ -0,0 +1,285 @@
+// sw.js: menú sin conexión (ver offline.py). Se sirve desde /sw.js para cubrir todo el sitio.
+
+// Mismas rutas que app.py
+const CATALOG_URL = '/menu/catalog.json';
+const OFFLINE_URL = '/offline';
+const TABLE_STATUS_URL = '/mesa/estado';
+const QUEUED_PATHS = ['/cart/add', '/order/submit'];
+const MENU_PAGES = [/^\/$/, /^\/category\/[^/]+(\/page\/\d+)?$/];
+
+const SHELL_CACHE = 'menu-shell';
+const PAGES_CACHE = 'menu-pages';
+const IMAGES_CACHE = 'menu-images';
+// Cada cuánto se pregunta al servidor si cambió el catálogo (un 304 si no)
+const CATALOG_CHECK_MS = 60 * 1000;
+
+let catalogState = null;  // {data, checked}
+
+self.addEventListener('install', event => {
+    self.skipWaiting();
+    event.waitUntil(loadCatalog(true));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim().then(flushOutbox));
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        // Bootstrap del CDN mientras no esté copiado localmente
+        if (request.method === 'GET') {
+            event.respondWith(caches.match(request).then(cached => cached || fetch(request)));
+        }
+        return;
+    }
+    if (request.method === 'POST' && QUEUED_PATHS.includes(url.pathname)) {
+        event.respondWith(sendOrQueue(request));
+        return;
+    }
+    if (request.method !== 'GET') {
+        return;
+    }
+    if (url.pathname === CATALOG_URL) {
+        event.respondWith(loadCatalog(false).then(() => caches.match(CATALOG_URL)).then(cached => cached || fetch(request)));
+    } else if (url.pathname === TABLE_STATUS_URL) {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    } else if (request.mode === 'navigate' && MENU_PAGES.some(pattern => pattern.test(url.pathname))) {
+        event.respondWith(menuPage(request));
+    } else if (request.mode === 'navigate' && url.pathname === OFFLINE_URL) {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    } else if (url.pathname.startsWith('/uploads/') || url.pathname.startsWith('/static/uploads/')) {
+        event.respondWith(cacheFirst(request, IMAGES_CACHE));
+    } else if (url.pathname.startsWith('/static/dist/')) {
+        // El nombre lleva el hash del contenido: nunca cambia
+        event.respondWith(cacheFirst(request, SHELL_CACHE));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    }
+});
+
+// ---------------------------------
+// Catálogo y precache
+// ---------------------------------
+async function loadCatalog(force) {
+    if (!force && catalogState && Date.now() - catalogState.checked < CATALOG_CHECK_MS) {
+        return catalogState.data;
+    }
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(CATALOG_URL);
+    try {
+        const headers = {};
+        if (cached && cached.headers.get('ETag')) {
+            headers['If-None-Match'] = cached.headers.get('ETag');
+        }
+        // no-store: el 304 llega hasta aquí en lugar de resolverlo la caché HTTP
+        const response = await fetch(CATALOG_URL, { headers, cache: 'no-store', credentials: 'same-origin' });
+        if (response.status === 200) {
+            await cache.put(CATALOG_URL, response.clone());
+            const data = await response.json();
+            catalogState = { data, checked: Date.now() };
+            // Catálogo nuevo: las páginas guardadas ya no sirven
+            await caches.delete(PAGES_CACHE);
+            await precache(data);
+            return data;
+        }
+    } catch (error) {
+        // Sin red: se usa lo guardado
+    }
+    if (!cached) {
+        return null;
+    }
+    const data = catalogState ? catalogState.data : await cached.json();
+    catalogState = { data, checked: Date.now() };
+    return data;
+}
+
+async function precache(data) {
+    const shell = await caches.open(SHELL_CACHE);
+    await Promise.all(data.shell.map(url => shell.add(url).catch(() => {})));
+    const images = await caches.open(IMAGES_CACHE);
+    const wanted = new Set(data.images.map(url => new URL(url, self.location.origin).href));
+    for (const request of await images.keys()) {
+        if (!wanted.has(request.url)) {
+            await images.delete(request);
+        }
+    }
+    await Promise.all(data.images.map(async url => {
+        if (!(await images.match(url))) {
+            await images.add(url).catch(() => {});
+        }
+    }));
+}
+
+// ---------------------------------
+// Estrategias de caché
+// ---------------------------------
+async function tableFlag() {
+    // Igual que el sufijo del ETag del menú: "m" si la sesión tiene mesa
+    const cached = await caches.match(TABLE_STATUS_URL);
+    if (!cached) {
+        return 'n';
+    }
+    const data = await cached.json().catch(() => ({}));
+    return data.mesa_num ? 'm' : 'n';
+}
+
+async function menuPage(request) {
+    const [catalog, table] = await Promise.all([loadCatalog(false), tableFlag()]);
+    const pages = await caches.open(PAGES_CACHE);
+    const cached = await pages.match(request);
+    // Misma versión del menú y misma mesa sí/no: la página guardada es la que mandaría el servidor
+    if (cached && catalog && cached.headers.get('ETag') === `"${catalog.version}-${table}"`) {
+        return cached;
+    }
+    try {
+        const response = await fetch(request);
+        // Sin ETag (mensajes flash) la página es única: no se guarda
+        if (response.ok && response.headers.get('ETag')) {
+            await pages.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return cached || (await caches.match(OFFLINE_URL)) || Response.error();
+    }
+}
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request, cacheName) {
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            const cache = await caches.open(cacheName);
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (await caches.match(request)) || Response.error();
+    }
+}
+
+// ---------------------------------
+// Cola de pedidos y carrito sin conexión
+// ---------------------------------
+function openOutbox() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open('menu-outbox', 1);
+        open.onupgradeneeded = () => open.result.createObjectStore('requests', { keyPath: 'id', autoIncrement: true });
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+async function outbox(mode, callback) {
+    const db = await openOutbox();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction('requests', mode);
+        const request = callback(transaction.objectStore('requests'));
+        transaction.oncomplete = () => resolve(request.result);
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+async function notifyClients(message) {
+    const windows = await self.clients.matchAll({ type: 'window' });
+    windows.forEach(client => client.postMessage(message));
+}
+
+function queuedResponse(pathname) {
+    const message = pathname === '/order/submit'
+        ? 'Tu pedido se enviará en cuanto vuelva la señal.'
+        : 'Se agregará al carrito en cuanto vuelva la señal.';
+    return new Response(JSON.stringify({ success: false, queued: true, message }), {
+        status: 202,
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+async function sendOrQueue(request) {
+    const url = new URL(request.url);
+    const entry = {
+        url: request.url,
+        method: request.method,
+        headers: [...request.headers],
+        body: await request.clone().arrayBuffer(),
+        queued_at: Date.now()
+    };
+    // Lo que ya estaba en cola va primero (p. ej. agregar al carrito antes de enviar el pedido)
+    if (!(await flushOutbox())) {
+        await outbox('readwrite', store => store.add(entry));
+        return queuedResponse(url.pathname);
+    }
+    try {
+        return await fetch(request);
+    } catch (error) {
+        await outbox('readwrite', store => store.add(entry));
+        if (self.registration.sync) {
+            self.registration.sync.register('outbox').catch(() => {});
+        }
+        return queuedResponse(url.pathname);
+    }
+}
+
+let flushing = null;
+
+function flushOutbox() {
+    // Un solo envío a la vez: la cola se manda en orden
+    if (!flushing) {
+        flushing = sendQueued().finally(() => { flushing = null; });
+    }
+    return flushing;
+}
+
+// true si la cola quedó vacía; false si se cortó por falta de red
+async function sendQueued() {
+    const entries = await outbox('readonly', store => store.getAll());
+    for (const entry of entries) {
+        let response;
+        try {
+            // submit_order lleva su Idempotency-Key: reenviarlo no duplica el pedido
+            response = await fetch(entry.url, {
+                method: entry.method,
+                headers: entry.headers,
+                body: entry.body,
+                credentials: 'same-origin'
+            });
+        } catch (error) {
+            return false;
+        }
+        await outbox('readwrite', store => store.delete(entry.id));
+        const data = await response.json().catch(() => ({}));
+        await notifyClients({ type: 'outbox-sent', path: new URL(entry.url).pathname, status: response.status, data });
+    }
+    return true;
+}
+
+self.addEventListener('sync', event => {
+    if (event.tag === 'outbox') {
+        event.waitUntil(flushOutbox().then(sent => {
+            if (!sent) {
+                // El navegador vuelve a intentar más tarde
+                throw new Error('Sin conexión');
+            }
+        }));
+    }
+});
+
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'flush-outbox') {
+        event.waitUntil(flushOutbox());
+    }
+});
@@ -0,0 +1,78 @@
+"""
+Exportación del menú público a archivos estáticos.
+
+Las páginas del menú (inicio, cada categoría con sus páginas y la búsqueda
+vacía) solo dependen del catálogo, así que se pueden escribir a disco y
+servir desde el proxy sin pasar por Flask ni Mongo. Hay dos variantes del
+HTML: sin mesa (`publico/`) y con mesa (`mesa/`); el número de mesa y el
+carrito llegan por JS, así que la variante con mesa sirve a todas las mesas.
+
+Cada página se escribe como `<ruta>/index.html` con sus versiones .gz y .br
+(ver assets.precompressed). Los archivos se reemplazan de forma atómica: el
+proxy nunca lee una página a medio escribir.
+"""
+import json
+import os
+import shutil
+
+from assets import precompressed
+
+# Carpeta -> la sesión tiene mesa
+VARIANTS = {"publico": False, "mesa": True}
+STATE_NAME = "export.json"
+
+
+def page_file(folder, path):
+    """Archivo de una ruta del menú: "/category/x/page/2" -> folder/category/x/page/2/index.html."""
+    parts = [part for part in path.split("/") if part]
+    return os.path.join(folder, *parts, "index.html")
+
+
+def _replace(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_page(folder, path, html):
+    target = page_file(folder, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Primero las comprimidas: el proxy las busca junto al .html
+    for suffix, compressed in precompressed(html).items():
+        _replace(target + suffix, compressed)
+    _replace(target, html)
+
+
+def prune_pages(folder, category_path, total_pages):
+    """Borra las páginas de una categoría que ya no existen (quedó con menos productos)."""
+    pages_dir = os.path.join(page_file(folder, category_path).rsplit(os.sep, 1)[0], "page")
+    if not os.path.isdir(pages_dir):
+        return
+    for name in os.listdir(pages_dir):
+        if not name.isdigit() or int(name) > total_pages:
+            shutil.rmtree(os.path.join(pages_dir, name), ignore_errors=True)
+
+
+def prune_categories(folder, keep_ids):
+    """Borra las carpetas de categorías eliminadas del catálogo."""
+    categories_dir = os.path.join(folder, "category")
+    if not os.path.isdir(categories_dir):
+        return
+    for name in os.listdir(categories_dir):
+        if name not in keep_ids:
+            shutil.rmtree(os.path.join(categories_dir, name), ignore_errors=True)
+
+
+def load_state(root):
+    """Versión de templates y assets con la que se hizo la última exportación completa."""
+    try:
+        with open(os.path.join(root, STATE_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(root, state):
+    os.makedirs(root, exist_ok=True)
+    _replace(os.path.join(root, STATE_NAME), json.dumps(state, indent=2, sort_keys=True).encode("utf-8"))
@@ -0,0 +1,105 @@
+"""
+Almacenamiento de imágenes subidas, direccionado por contenido.
+
+Cada archivo se guarda con el hash SHA-256 de sus bytes como nombre: subir
+dos veces la misma foto no ocupa espacio extra y el contenido detrás de una
+URL nunca cambia, así que se puede cachear para siempre.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from werkzeug.utils import secure_filename
+
+HASH_LENGTH = 32  # caracteres hex del SHA-256 que se usan en el nombre
+CHUNK_SIZE = 64 * 1024
+
+# Variantes de images.py: foto_w320.webp, foto_w640.jpg
+VARIANT_RE = re.compile(r"^(.+)_w\d+\.(webp|jpg)$")
+# <hash>.jpg y sus variantes <hash>_w320.webp
+BLOB_RE = re.compile(r"^([0-9a-f]{%d})(_w\d+)?\.[a-z0-9]+$" % HASH_LENGTH)
+
+
+def is_blob(filename):
+    return bool(BLOB_RE.match(filename))
+
+
+def _is_retired(filename, retired):
+    """El archivo es uno de `retired` o una de sus variantes (foto.jpg -> foto_w320.webp)."""
+    if filename in retired:
+        return True
+    match = VARIANT_RE.match(filename)
+    return bool(match) and match.group(1) in {os.path.splitext(name)[0] for name in retired}
+
+
+def blob_key(filename):
+    """Hash al que pertenece un archivo (original o variante); None si no es blob."""
+    match = BLOB_RE.match(filename)
+    return match.group(1) if match else None
+
+
+class UploadStorage:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def save(self, file):
+        """Escribe el archivo subido a disco mientras calcula su hash.
+
+        Devuelve (nombre, ruta). Si ya existía un archivo idéntico, se
+        descarta la copia temporal y se reutiliza el existente.
+        """
+        return self._store(file.stream, file.filename)
+
+    def save_path(self, source_path):
+        """Igual que save() pero desde un archivo que ya está en disco."""
+        with open(source_path, "rb") as stream:
+            return self._store(stream, os.path.basename(source_path))
+
+    def _store(self, stream, filename):
+        ext = os.path.splitext(secure_filename(filename))[1].lower()
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+            name = f"{digest.hexdigest()[:HASH_LENGTH]}{ext}"
+            path = os.path.join(self.folder, name)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name, path
+
+    def gc(self, referenced_names, dry_run=False, min_age=3600, retired_names=()):
+        """Borra blobs (y sus variantes) que ningún documento referencia.
+
+        Los archivos con nombre tradicional (logo, fondos, subidas viejas) no
+        se tocan, salvo los de `retired_names` que ya nadie referencia: subidas
+        viejas copiadas al almacenamiento por hash con `flask uploads-migrate`.
+        Tampoco los blobs con menos de `min_age` segundos (una subida cuyo
+        documento aún no se guarda). Devuelve la lista de archivos borrados.
+        """
+        keep = {blob_key(name) for name in referenced_names} - {None}
+        retired = set(retired_names) - set(referenced_names)
+        cutoff = time.time() - min_age
+        removed = []
+        for name in sorted(os.listdir(self.folder)):
+            path = os.path.join(self.folder, name)
+            key = blob_key(name)
+            if key is None:
+                if not _is_retired(name, retired):
+                    continue
+            elif key in keep or os.path.getmtime(path) > cutoff:
+                continue
+            removed.append(name)
+            if not dry_run:
+                os.remove(path)
+        return removed
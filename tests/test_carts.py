@@ -0,0 +1,97 @@
+"""Carritos por mesa: las dos implementaciones se comportan igual."""
+import time
+
+import mongomock
+import pytest
+
+from carts import MemoryCartStore, MongoCartStore, compact_line, expand_line, item_count
+
+COCA = {"product_id": "coca", "name": "Coca", "price": 25, "quantity": 2}
+PIZZA = {"product_id": "pizza", "name": "Hawaiana", "price": 150, "size": "chica",
+         "orilla_queso": True, "orilla_queso_price": 30, "quantity": 1}
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def store(request):
+    if request.param == "memory":
+        return MemoryCartStore(ttl=60)
+    return MongoCartStore(mongomock.MongoClient()["mh"]["carts"])
+
+
+def test_compact_line_round_trip():
+    line = compact_line(PIZZA)
+
+    assert "d" not in line and "h" not in line  # valores por defecto no se guardan
+    item = expand_line(line)
+    assert item["size"] == "chica" and item["orilla_queso"] is True
+    assert item["subtotal"] == 150
+
+
+def test_table_keeps_its_cart_until_closed(store):
+    cart_id = store.cart_id_for_table(1)
+
+    assert store.cart_id_for_table(1) == cart_id
+    assert store.cart_id_for_table(2) != cart_id
+
+    store.close(cart_id)
+    assert store.cart_id_for_table(1) != cart_id
+    assert store.get(cart_id) == {}
+
+
+def test_add_line_sums_quantities(store):
+    cart_id = store.cart_id_for_table(1)
+
+    store.add_line(cart_id, "coca", COCA)
+    cart = store.add_line(cart_id, "coca", dict(COCA, quantity=3))
+    cart = store.add_line(cart_id, "pizza", PIZZA)
+
+    assert cart["coca"]["quantity"] == 5
+    assert cart["coca"]["subtotal"] == 125
+    assert item_count(cart) == 6
+
+
+def test_set_quantity_remove_and_clear(store):
+    cart_id = store.cart_id_for_table(1)
+    store.add_line(cart_id, "coca", COCA)
+    store.add_line(cart_id, "pizza", PIZZA)
+
+    assert store.set_quantity(cart_id, "coca", 4)["coca"]["quantity"] == 4
+    assert store.set_quantity(cart_id, "no-existe", 4) is None
+
+    store.remove(cart_id, "coca")
+    assert list(store.get(cart_id)) == ["pizza"]
+
+    store.clear(cart_id)
+    assert store.get(cart_id) == {}
+
+
+def test_closed_or_unknown_cart_rejects_changes(store):
+    cart_id = store.cart_id_for_table(1)
+    store.close(cart_id)
+
+    assert store.add_line(cart_id, "coca", COCA) is None
+    assert store.add_line("no-existe", "coca", COCA) is None
+    assert store.set_quantity(cart_id, "coca", 1) is None
+
+
+@pytest.mark.parametrize("cart_key", ["", "a.b", "$set"])
+def test_mongo_rejects_unsafe_cart_keys(cart_key):
+    store = MongoCartStore(mongomock.MongoClient()["mh"]["carts"])
+    cart_id = store.cart_id_for_table(1)
+
+    assert store.add_line(cart_id, cart_key, COCA) is None
+    assert store.set_quantity(cart_id, cart_key, 1) is None
+    store.remove(cart_id, cart_key)
+    assert store.get(cart_id) == {}
+
+
+def test_memory_cart_expires(monkeypatch):
+    store = MemoryCartStore(ttl=60)
+    cart_id = store.cart_id_for_table(1)
+    store.add_line(cart_id, "coca", COCA)
+
+    clock = time.monotonic() + 61
+    monkeypatch.setattr("carts.time.monotonic", lambda: clock)
+
+    assert store.get(cart_id) == {}
+    assert store.cart_id_for_table(1) != cart_id
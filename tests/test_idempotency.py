@@ -0,0 +1,80 @@
+"""submit_order: la llave de idempotencia vale solo para la mesa que la mandó, y un carrito inválido no crea pedido."""
+import mongomock
+import pytest
+
+import app as menu_app
+from bench.datagen import generate_catalog
+
+
+@pytest.fixture
+def client_for_table():
+    mongo_client = mongomock.MongoClient()
+    db = mongo_client["mh"]
+    _categories, products = generate_catalog(db, products=4)
+    menu_app.init_db(mongo_client)
+    menu_app.catalog_cache.invalidate()
+    menu_app.fragment_cache.clear()
+    menu_app.app.config["TESTING"] = True
+    drink = next(p for p in products if "price" in p)
+
+    def make(mesa_num):
+        client = menu_app.app.test_client()
+        client.get(f"/mesa/{mesa_num}")
+        client.post("/cart/add", data={"product_id": str(drink["_id"]), "quantity": "1"})
+        return client
+
+    yield make, db
+
+
+def submit(client, key):
+    return client.post("/order/submit", headers={"Idempotency-Key": key})
+
+
+def test_same_key_from_two_tables_creates_two_orders(client_for_table):
+    make, db = client_for_table
+    table_1, table_2 = make(1), make(2)
+
+    first = submit(table_1, "llave-compartida")
+    second = submit(table_2, "llave-compartida")
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert first.json["order_id"] != second.json["order_id"]
+    assert not second.json["replayed"]
+    assert {o["mesa_num"] for o in db.orders.find()} == {1, 2}
+
+
+def test_retry_from_same_table_replays_order(client_for_table):
+    make, db = client_for_table
+    table = make(3)
+
+    first = submit(table, "reintento")
+    retry = submit(table, "reintento")
+
+    assert retry.status_code == 200
+    assert retry.json["replayed"]
+    assert retry.json["order_id"] == first.json["order_id"]
+    assert db.orders.count_documents({}) == 1
+
+
+def test_key_of_another_cart_is_rejected(client_for_table):
+    make, db = client_for_table
+    table, other_phone = make(4), make(4)
+    submit(table, "usada")
+    # Otro teléfono de la mesa, con su carrito nuevo y la llave ya usada: no recibe el pedido anterior
+    other_phone.post("/cart/add", data={"product_id": str(db.products.find_one({"price": {"$exists": True}})["_id"]), "quantity": "1"})
+    assert submit(other_phone, "usada").status_code == 409
+
+
+def test_cart_with_negative_quantity_creates_no_order(client_for_table):
+    make, db = client_for_table
+    table = make(5)
+    drink_key = str(db.products.find_one({"price": {"$exists": True}})["_id"])
+    cart_id = menu_app.cart_store.cart_id_for_table(5)
+    menu_app.cart_store.set_quantity(cart_id, drink_key, -3)
+
+    response = submit(table, "negativa")
+
+    assert response.status_code == 409
+    assert response.json["errors"][0]["line"] == drink_key
+    assert db.orders.count_documents({}) == 0
+    assert db.daily_sales.count_documents({}) == 0
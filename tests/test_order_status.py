@@ -0,0 +1,100 @@
+"""Máquina de estados de pedidos: transiciones permitidas y compare-and-set por versión."""
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from order_status import TransitionError, change_many, change_status, new_order_fields, sources_for
+
+
+@pytest.fixture
+def orders():
+    return mongomock.MongoClient()["mh"]["orders"]
+
+
+def new_order(orders, **fields):
+    doc = {"mesa_num": 1, **new_order_fields(datetime(2026, 1, 1, 12)), **fields}
+    return orders.insert_one(doc).inserted_id
+
+
+def test_sources_for():
+    assert sources_for("pendiente") == []
+    assert sources_for("listo") == ["pendiente", "en_preparacion"]
+
+
+def test_change_status_moves_forward_and_records_history(orders):
+    order_id = new_order(orders)
+    now = datetime(2026, 1, 1, 12, 5)
+
+    order = change_status(orders, order_id, "en_preparacion", version=1, now=now)
+
+    assert order["status"] == "en_preparacion"
+    assert order["previous_status"] == "pendiente"
+    assert order["version"] == 2
+    assert order["status_times"]["en_preparacion"] == now
+    assert order["updated_at"] == now
+
+
+def test_orders_can_skip_steps(orders):
+    order_id = new_order(orders)
+
+    assert change_status(orders, order_id, "listo")["status"] == "listo"
+
+
+def test_orders_never_go_back(orders):
+    order_id = new_order(orders, status="listo")
+
+    with pytest.raises(TransitionError) as error:
+        change_status(orders, order_id, "pendiente")
+    assert error.value.status == 409
+    assert error.value.current["status"] == "listo"
+    assert orders.find_one({"_id": order_id})["version"] == 1
+
+
+def test_stale_version_is_rejected(orders):
+    order_id = new_order(orders)
+    change_status(orders, order_id, "en_preparacion", version=1)
+
+    # Otra pantalla todavía vio la versión 1
+    with pytest.raises(TransitionError) as error:
+        change_status(orders, order_id, "listo", version=1)
+    assert "Otra pantalla" in error.value.message
+    assert error.value.current["version"] == 2
+
+
+def test_order_without_version_counts_as_zero(orders):
+    order_id = orders.insert_one({"mesa_num": 1, "status": "pendiente"}).inserted_id
+
+    order = change_status(orders, order_id, "listo", version=0)
+
+    assert order["version"] == 1
+
+
+@pytest.mark.parametrize("order_id, new_status, status", [
+    (None, "listo", 404),
+    ("existing", "cancelado", 400),
+])
+def test_missing_order_and_unknown_status(orders, order_id, new_status, status):
+    if order_id == "existing":
+        order_id = new_order(orders)
+    with pytest.raises(TransitionError) as error:
+        change_status(orders, order_id, new_status)
+    assert error.value.status == status
+
+
+def test_change_many_splits_updated_and_rejected(orders):
+    fresh = new_order(orders)
+    stale = new_order(orders, version=3)
+    done = new_order(orders, status="completado")
+    unversioned = new_order(orders)
+
+    updated, rejected = change_many(orders, [(fresh, 1), (stale, 2), (done, None), (unversioned, None)], "listo")
+
+    assert {order["_id"] for order in updated} == {fresh, unversioned}
+    assert all(order["status"] == "listo" and order["previous_status"] == "pendiente" for order in updated)
+    assert rejected == [stale, done]
+    assert orders.find_one({"_id": stale})["status"] == "pendiente"
+
+
+def test_change_many_without_targets(orders):
+    assert change_many(orders, [], "listo") == ([], [])
@@ -0,0 +1,51 @@
+"""Cursor de "Ver más": límites de start_after sobre las llaves de orden."""
+import pytest
+from bson import ObjectId
+
+from pagination import decode_cursor, encode_cursor, sort_key, start_after
+
+IDS = sorted(ObjectId() for _ in range(4))
+PRODUCTS = [
+    {"_id": IDS[0], "name": "Alitas"},
+    {"_id": IDS[1], "name": "Hawaiana"},
+    {"_id": IDS[2], "name": "Hawaiana"},  # mismo nombre: desempata el _id
+    {"_id": IDS[3], "name": "Ñandú \"x\""},
+]
+KEYS = [sort_key(product) for product in PRODUCTS]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(PRODUCTS[3])) == ("Ñandú \"x\"", IDS[3])
+
+
+def test_no_cursor_starts_at_the_beginning():
+    assert start_after(KEYS, "") == 0
+    assert start_after(KEYS, None) == 0
+
+
+@pytest.mark.parametrize("index", range(len(PRODUCTS)))
+def test_cursor_continues_after_its_product(index):
+    assert start_after(KEYS, encode_cursor(PRODUCTS[index])) == index + 1
+
+
+def test_cursor_of_a_deleted_product_keeps_its_place():
+    # El producto del cursor ya no existe: se sigue con el siguiente en orden
+    keys = KEYS[:1] + KEYS[2:]
+    assert start_after(keys, encode_cursor(PRODUCTS[1])) == 1
+
+
+def test_cursor_before_first_and_after_last():
+    assert start_after(KEYS, encode_cursor({"_id": ObjectId(), "name": "Aaa"})) == 0
+    # Orden binario como Mongo sin collation: "Ñ" va después de "Z"
+    assert start_after(KEYS, encode_cursor({"_id": ObjectId(), "name": "Zzz"})) == len(KEYS) - 1
+    assert start_after(KEYS, encode_cursor({"_id": ObjectId(), "name": "Ño"})) == len(KEYS)
+
+
+def test_empty_category():
+    assert start_after([], encode_cursor(PRODUCTS[0])) == 0
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "W10", encode_cursor({"_id": "x" * 24, "name": "a"})])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        start_after(KEYS, cursor)
@@ -0,0 +1,136 @@
+"""PriceBook: precios en centavos, extras de pizza y validación de cantidades."""
+import mongomock
+import pytest
+from bson import ObjectId
+
+import app as menu_app
+from bench.datagen import generate_catalog
+from pricing import DIVISION_CENTS, ORILLA_QUESO_CENTS, PriceBook, PricingError, to_cents
+
+PIZZAS, BEBIDAS = ObjectId(), ObjectId()
+HAWAIANA = {"_id": ObjectId(), "name": "Hawaiana", "category_id": PIZZAS, "price_chica": 150, "price_grande": "250.50"}
+PEPPERONI = {"_id": ObjectId(), "name": "Pepperoni", "category_id": PIZZAS, "price_chica": 160}
+COCA = {"_id": ObjectId(), "name": "Coca", "category_id": BEBIDAS, "price": 25}
+SIN_PRECIO = {"_id": ObjectId(), "name": "Agua", "category_id": BEBIDAS, "price": ""}
+
+
+@pytest.fixture
+def book():
+    categories = {PIZZAS: {"_id": PIZZAS, "name": "Pizzas"}, BEBIDAS: {"_id": BEBIDAS, "name": "Bebidas"}}
+    return PriceBook([HAWAIANA, PEPPERONI, COCA, SIN_PRECIO], categories)
+
+
+def test_to_cents_rounds_and_rejects_invalid_values():
+    assert to_cents("120") == 12000
+    assert to_cents("120.505") == 12051
+    assert to_cents(0.1) == 10
+    assert to_cents("") is None
+    assert to_cents("abc") is None
+    assert to_cents("-5") is None
+
+
+def test_plain_product_uses_price_and_quantity(book):
+    line = book.quote(COCA["_id"], quantity=3)
+
+    assert line["unit_cents"] == 2500
+    assert line["subtotal_cents"] == 7500
+    assert line["cart_key"] == str(COCA["_id"])
+    assert line["category_name"] == "Bebidas"
+
+
+def test_pizza_size_division_and_orilla(book):
+    line = book.quote(HAWAIANA["_id"], quantity=2, size="Chica", division=True,
+                      second_half_id=PEPPERONI["_id"], orilla_queso=True)
+
+    unit = 15000 + DIVISION_CENTS + ORILLA_QUESO_CENTS["chica"]
+    assert line["unit_cents"] == unit
+    assert line["subtotal_cents"] == unit * 2
+    assert line["name"] == "Hawaiana / Pepperoni"
+    assert line["cart_key"] == f"{HAWAIANA['_id']}_{PEPPERONI['_id']}_chica_DO"
+
+
+def test_decimal_prices_are_exact(book):
+    assert book.quote(HAWAIANA["_id"], size="grande")["unit_cents"] == 25050
+
+
+@pytest.mark.parametrize("kwargs, message, status", [
+    ({"product_id": ObjectId()}, "Producto no encontrado", 404),
+    ({"product_id": HAWAIANA["_id"], "size": "mediana"}, "Tamaño mediana no disponible", 400),
+    ({"product_id": SIN_PRECIO["_id"]}, "Precio no disponible", 400),
+    ({"product_id": HAWAIANA["_id"], "size": "grande", "division": True, "second_half_id": PEPPERONI["_id"]},
+     "Tamaño grande no disponible para segunda mitad", 400),
+    ({"product_id": HAWAIANA["_id"], "size": "chica", "division": True, "second_half_id": ObjectId()},
+     "Segunda mitad no encontrada", 404),
+])
+def test_unsellable_lines_raise(book, kwargs, message, status):
+    with pytest.raises(PricingError) as error:
+        book.quote(**kwargs)
+    assert error.value.message == message
+    assert error.value.status == status
+
+
+@pytest.mark.parametrize("quantity", [0, -3, True, "2", 1.5])
+def test_quantity_must_be_a_positive_integer(book, quantity):
+    with pytest.raises(PricingError):
+        book.quote(COCA["_id"], quantity=quantity)
+
+
+def test_price_cart_reports_bad_lines_and_totals_the_rest(book):
+    cart = {
+        "coca": {"product_id": str(COCA["_id"]), "quantity": 2},
+        "negativa": {"product_id": str(COCA["_id"]), "quantity": -3},
+        "borrada": {"product_id": str(ObjectId()), "quantity": 1},
+    }
+
+    lines, errors, total = book.price_cart(cart)
+
+    assert [line["quantity"] for line in lines] == [2]
+    assert total == 5000
+    assert set(errors) == {"negativa", "borrada"}
+
+
+@pytest.fixture
+def table_client():
+    mongo_client = mongomock.MongoClient()
+    _categories, products = generate_catalog(mongo_client["mh"], products=4)
+    menu_app.init_db(mongo_client)
+    menu_app.catalog_cache.invalidate()
+    menu_app.fragment_cache.clear()
+    menu_app.app.config["TESTING"] = True
+    client = menu_app.app.test_client()
+    client.get("/mesa/1")
+    drink = next(p for p in products if "price" in p)
+    return client, str(drink["_id"])
+
+
+@pytest.mark.parametrize("quantity", ["-3", "0", "abc", "1.5"])
+def test_add_to_cart_rejects_invalid_quantity(table_client, quantity):
+    client, product_id = table_client
+
+    response = client.post("/cart/add", data={"product_id": product_id, "quantity": quantity})
+
+    assert response.status_code == 400
+    assert not response.json["success"]
+    assert client.get("/mesa/estado").json["cart_count"] == 0
+
+
+def test_add_to_cart_defaults_to_one_and_counts_pieces(table_client):
+    client, product_id = table_client
+
+    client.post("/cart/add", data={"product_id": product_id})
+    response = client.post("/cart/add", data={"product_id": product_id, "quantity": "2"})
+
+    assert response.json["cart_count"] == 3
+    assert client.get("/mesa/estado").json["cart_count"] == 3
+
+
+@pytest.mark.parametrize("quantity", ["-1", "x", ""])
+def test_update_cart_rejects_invalid_quantity(table_client, quantity):
+    client, product_id = table_client
+    client.post("/cart/add", data={"product_id": product_id, "quantity": "2"})
+
+    response = client.post("/cart/update", data={"cart_key": product_id, "quantity": quantity},
+                           headers={"X-Requested-With": "XMLHttpRequest"})
+
+    assert response.status_code == 400
+    assert client.get("/mesa/estado").json["cart_count"] == 2